@@ -23,11 +23,15 @@
 #######################################################################
 
 
-import gzip
 import os
 import shutil
+import subprocess
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
+from typing import BinaryIO, List, Optional, Tuple
 from urllib import request
+from urllib.error import HTTPError
 
 from Classes.API.ensembl_mod.EnsemblUtils import (
     ping_ensembl,
@@ -37,6 +41,9 @@ from Classes.API.ensembl_mod.EnsemblUtils import (
 )
 
 class LocalEnsembl:
+    chunk_size: int = 1 << 20
+    timeout: int = 60
+
     def __init__(
         self,
         raw_species: str,
@@ -151,40 +158,140 @@ class LocalEnsembl:
     def get_taxon_id(self) -> str:
         return self.taxon_id
 
-    def download(self, test_url=None) -> str:
+    def download(self, test_url=None, verify: bool = True) -> str:
         if not self.is_downloaded():
-            download_url = test_url or self.ftp_address
-            print(f"\tDownloading {download_url}")
-            with closing(request.urlopen(download_url)) as r:
-                with open(os.path.join(self.goal_directory, self.local_zipname), 'wb') as f:
-                    shutil.copyfileobj(r, f)
-
-            with gzip.open(os.path.join(self.goal_directory, self.local_zipname), 'rb') as f_in:
-                with open(os.path.join(self.goal_directory, self.local_filename), "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-
-            os.remove(os.path.join(self.goal_directory, self.local_zipname))
+            LocalEnsembl.fetch(test_url or self.ftp_address, os.path.join(self.goal_directory, self.local_filename),
+                               verify)
         else:
             print(f"GTF already downloaded: {self.local_filename}")
         return os.path.join(self.goal_directory, self.local_filename)
 
-    def download_pep(self, test_url=None) -> str:
+    def download_pep(self, test_url=None, verify: bool = True) -> str:
         if not self.is_pep_downloaded():
-            download_url = test_url or self.ftp_pep_address
-            print(f"\tDownloading {download_url}")
-            with closing(request.urlopen(download_url)) as r:
-                with open(os.path.join(self.goal_directory, self.local_pep_zipname), 'wb') as f:
-                    shutil.copyfileobj(r, f)
-
-            with gzip.open(os.path.join(self.goal_directory, self.local_pep_zipname), 'rb') as f_in:
-                with open(os.path.join(self.goal_directory, self.local_pep_filename), "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-
-            os.remove(os.path.join(self.goal_directory, self.local_pep_zipname))
+            LocalEnsembl.fetch(test_url or self.ftp_pep_address,
+                               os.path.join(self.goal_directory, self.local_pep_filename), verify)
         else:
             print(f"PEP already downloaded: {self.local_pep_filename}")
         return os.path.join(self.goal_directory, self.local_pep_filename)
 
+    def download_all(self, verify: bool = True) -> Tuple[str, str]:
+        """
+        Download the GTF and the peptide FASTA concurrently. Returns both paths.
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            gtf_future = executor.submit(self.download, verify=verify)
+            pep_future = executor.submit(self.download_pep, verify=verify)
+            return gtf_future.result(), pep_future.result()
+
+    @staticmethod
+    def fetch(url: str, out_path: str, verify: bool = True) -> None:
+        """
+        Download a gzip file and decompress it on the fly to out_path.
+
+        The compressed bytes are kept in out_path.gz.part until the archive is verified against the CHECKSUMS file
+        of its directory. An interrupted download is resumed with an HTTP Range request, after the kept bytes were
+        replayed through the decompressor. out_path only appears once the download is complete.
+        """
+        part_path: str = out_path + ".gz.part"
+        temp_path: str = out_path + ".part"
+        offset: int = 0
+        with open(temp_path, "wb") as f_out:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if os.path.isfile(part_path):
+                with open(part_path, "rb") as f_part:
+                    for chunk in iter(lambda: f_part.read(LocalEnsembl.chunk_size), b""):
+                        decompressor = LocalEnsembl.gunzip_chunk(decompressor, chunk, f_out)
+                        offset += len(chunk)
+                print(f"\tResuming {url} at byte {offset}")
+            else:
+                print(f"\tDownloading {url}")
+
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                response = request.urlopen(request.Request(url, headers=headers), timeout=LocalEnsembl.timeout)
+            except HTTPError as error:
+                # 416: the kept part already holds the whole file
+                if not offset or error.code != 416:
+                    raise
+                response = None
+            if response is not None:
+                with closing(response) as r, open(part_path, "ab") as f_part:
+                    if offset and r.status != 206:
+                        # The server ignored the range, start over
+                        f_part.truncate(0)
+                        f_out.seek(0)
+                        f_out.truncate()
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    for chunk in iter(lambda: r.read(LocalEnsembl.chunk_size), b""):
+                        f_part.write(chunk)
+                        decompressor = LocalEnsembl.gunzip_chunk(decompressor, chunk, f_out)
+            f_out.write(decompressor.flush())
+
+        if not decompressor.eof:
+            os.remove(temp_path)
+            raise ValueError(f"Download of {url} is truncated, {part_path} is kept to resume")
+        if verify:
+            expected: Optional[Tuple[int, int]] = LocalEnsembl.read_checksum(url)
+            if expected is not None and LocalEnsembl.bsd_sum(part_path) != expected:
+                os.remove(temp_path)
+                os.remove(part_path)
+                raise ValueError(f"Checksum of {url} does not match its CHECKSUMS entry {expected}")
+        os.replace(temp_path, out_path)
+        os.remove(part_path)
+
+    @staticmethod
+    def gunzip_chunk(decompressor, data: bytes, f_out: BinaryIO):
+        """
+        Decompress a chunk of a (possibly multi member) gzip stream to f_out. Returns the decompressor to use next.
+        """
+        while data:
+            if decompressor.eof:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            f_out.write(decompressor.decompress(data))
+            data = decompressor.unused_data
+        return decompressor
+
+    @staticmethod
+    def read_checksum(url: str) -> Optional[Tuple[int, int]]:
+        """
+        (checksum, blocks) of a file in the CHECKSUMS file of its Ensembl directory, None if there is none.
+        """
+        directory, file_name = url.rsplit("/", 1)
+        try:
+            with closing(request.urlopen(directory + "/CHECKSUMS", timeout=LocalEnsembl.timeout)) as r:
+                lines = r.read().decode("utf-8").splitlines()
+        except HTTPError as error:
+            if error.code != 404:
+                raise
+            print(f"\tNo CHECKSUMS for {url}, skipping verification")
+            return None
+        for line in lines:
+            fields = line.split()
+            if len(fields) >= 3 and fields[-1] == file_name:
+                return int(fields[0]), int(fields[1])
+        print(f"\t{file_name} is not listed in CHECKSUMS, skipping verification")
+        return None
+
+    @staticmethod
+    def bsd_sum(path: str) -> Tuple[int, int]:
+        """
+        BSD checksum and 1 KiB block count of a file, as listed in the Ensembl CHECKSUMS files.
+        """
+        if shutil.which("sum") is not None:
+            result = subprocess.run(["sum", "-r", path], stdout=subprocess.PIPE, universal_newlines=True)
+            fields = result.stdout.split()
+            if result.returncode == 0 and len(fields) >= 2:
+                return int(fields[0]), int(fields[1])
+        # The rotate-then-add steps carry into each other and cannot be vectorised, the rotation is looked up
+        print(f"\t'sum' is not available, computing the checksum of {path} in Python, this is slow for large files")
+        rotated: List[int] = [(value >> 1) | ((value & 1) << 15) for value in range(65536)]
+        checksum: int = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(LocalEnsembl.chunk_size), b""):
+                for byte in chunk:
+                    checksum = (rotated[checksum] + byte) & 0xffff
+        return checksum, (os.path.getsize(path) + 1023) // 1024
+
     def is_downloaded(self) -> bool:
         return os.path.isfile(os.path.join(self.goal_directory, self.local_filename))
 
@@ -0,0 +1,173 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+
+class AssemblyTables:
+    """
+    Columnar transcript and transcript pair tables of a library, the data behind the AssemblyVisualizer plots.
+
+    The transcript table holds one row per transcript in library order with its attributes, a boolean column
+    per tag and the index of its gene. The pair table holds all ordered pairs of distinct transcripts of a gene
+    without nonsense_mediated_decay transcripts, as row indices into the transcript table plus the FAS score.
+    Both directions are kept because FAS scores are not symmetric. Pair and transcript attributes are derived
+    with NumPy, and the tables can be stored in a .npz file so repeated plotting skips the extraction.
+    """
+
+    string_columns: List[str] = ["_id", "transcript_name", "feature", "gene_id", "taxon_id", "biotype"]
+    excluded_biotype: str = "nonsense_mediated_decay"
+
+    def __init__(self, transcripts: Dict[str, np.ndarray], pairs: Dict[str, np.ndarray], tags: List[str]):
+        self.transcripts: Dict[str, np.ndarray] = transcripts
+        self.pairs: Dict[str, np.ndarray] = pairs
+        self.tags: List[str] = tags
+
+    @staticmethod
+    def from_gene_assembler(gene_assembler: GeneAssembler) -> "AssemblyTables":
+        tags: List[str] = sorted(gene_assembler.extract_tags())
+        tag_index: Dict[str, int] = {tag: i for i, tag in enumerate(tags)}
+        columns: Dict[str, List[str]] = {column: list() for column in AssemblyTables.string_columns}
+        tsl: List[int] = list()
+        gene_index: List[int] = list()
+        tag_rows: List[int] = list()
+        tag_columns: List[int] = list()
+        first: List[np.ndarray] = list()
+        second: List[np.ndarray] = list()
+        fas_scores: List[float] = list()
+
+        offset: int = 0
+        for g, gene in enumerate(gene_assembler.get_genes()):
+            transcripts = gene.get_transcripts()
+            for t, transcript in enumerate(transcripts):
+                columns["_id"].append(transcript.get_id())
+                columns["transcript_name"].append(transcript.get_name())
+                columns["feature"].append(transcript.get_feature())
+                columns["gene_id"].append(transcript.get_id_gene())
+                columns["taxon_id"].append(str(transcript.get_id_taxon()))
+                columns["biotype"].append(transcript.get_biotype())
+                tsl.append(transcript.get_transcript_support_level())
+                gene_index.append(g)
+                for tag in transcript.get_tags():
+                    tag_rows.append(offset + t)
+                    tag_columns.append(tag_index[tag])
+
+            # Ordered pairs i != j of the included transcripts in row-major order
+            included: np.ndarray = np.array([i for i, transcript in enumerate(transcripts)
+                                             if transcript.get_biotype() != AssemblyTables.excluded_biotype],
+                                            dtype=np.int64)
+            if len(included) > 1:
+                rows, cols = np.nonzero(~np.eye(len(included), dtype=bool))
+                ids: List[str] = [transcripts[i].get_id() for i in included]
+                fas_dict: Dict[str, Dict[str, float]] = gene.get_fas_dict()
+                fas_scores += [fas_dict[ids[i]][ids[j]] for i, j in zip(rows.tolist(), cols.tolist())]
+                first.append(included[rows] + offset)
+                second.append(included[cols] + offset)
+            offset += len(transcripts)
+
+        tag_matrix: np.ndarray = np.zeros((offset, len(tags)), dtype=bool)
+        tag_matrix[tag_rows, tag_columns] = True
+        transcript_table: Dict[str, np.ndarray] = {column: np.array(values, dtype=str)
+                                                   for column, values in columns.items()}
+        transcript_table["tsl"] = np.array(tsl, dtype=np.int64)
+        transcript_table["gene_index"] = np.array(gene_index, dtype=np.int64)
+        transcript_table["tags"] = tag_matrix
+        pair_table: Dict[str, np.ndarray] = {
+            "first": np.concatenate(first) if first else np.zeros(0, dtype=np.int64),
+            "second": np.concatenate(second) if second else np.zeros(0, dtype=np.int64),
+            "fas_score": np.array(fas_scores, dtype=float)}
+        return AssemblyTables(transcript_table, pair_table, tags)
+
+    def get_incomplete(self, incomplete_tags: List[str]) -> np.ndarray:
+        """
+        Whether each transcript carries one of the incomplete_tags.
+        """
+        columns: List[int] = [i for i, tag in enumerate(self.tags) if tag in incomplete_tags]
+        return self.transcripts["tags"][:, columns].any(axis=1)
+
+    def get_included_counts(self) -> np.ndarray:
+        """
+        Number of transcripts per gene that take part in the pair table.
+        """
+        included: np.ndarray = self.transcripts["biotype"] != AssemblyTables.excluded_biotype
+        gene_count: int = int(self.transcripts["gene_index"].max()) + 1 if len(included) else 0
+        return np.bincount(self.transcripts["gene_index"][included], minlength=gene_count)
+
+    def transcript_dataframe(self, incomplete_tags: List[str]) -> pandas.DataFrame:
+        data_dict: Dict[str, np.ndarray] = {column: self.transcripts[column] for column in
+                                            ["_id", "transcript_name", "feature", "gene_id", "taxon_id", "tsl",
+                                             "biotype"]}
+        data_dict["complete_status"] = np.where(self.get_incomplete(incomplete_tags), "incomplete", "complete")
+        for i, tag in enumerate(self.tags):
+            data_dict[tag] = self.transcripts["tags"][:, i]
+        return pandas.DataFrame(data_dict)
+
+    def fas_comparison_dataframe(self, incomplete_tags: List[str]) -> pandas.DataFrame:
+        first, second = self.pairs["first"], self.pairs["second"]
+        tsl: np.ndarray = self.transcripts["tsl"]
+        incomplete: np.ndarray = self.get_incomplete(incomplete_tags).astype(np.int64)
+        status_labels: np.ndarray = np.array(["both complete", "one incomplete", "both incomplete"])
+        return pandas.DataFrame({"fas_score": self.pairs["fas_score"],
+                                 "tsl_dist": np.abs(tsl[first] - tsl[second]),
+                                 "complete_status": status_labels[incomplete[first] + incomplete[second]]})
+
+    def fas_diversity_dataframe(self, group_list: List[int]) -> pandas.DataFrame:
+        """
+        FAS scores with the transcript count group of their gene.
+        """
+        groups: np.ndarray = np.array(group_list)
+        counts: np.ndarray = self.get_included_counts()[self.transcripts["gene_index"][self.pairs["first"]]]
+        return pandas.DataFrame({"transcript_count": groups[np.minimum(counts, len(groups) - 1)],
+                                 "fas_score": self.pairs["fas_score"]})
+
+    def save(self, path: str, key: str = "") -> None:
+        """
+        Store the tables in a .npz file. key identifies the library state, e.g. a hash of its files.
+        """
+        arrays: Dict[str, np.ndarray] = {"key": np.array(key), "tags": np.array(self.tags, dtype=str)}
+        arrays.update({"transcript_" + column: values for column, values in self.transcripts.items()})
+        arrays.update({"pair_" + column: values for column, values in self.pairs.items()})
+        with JSONBoy.atomic_open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def load(path: str, key: Optional[str] = None) -> Optional["AssemblyTables"]:
+        """
+        Load tables stored by save, None if the file does not exist or was stored for another key.
+        """
+        try:
+            data = np.load(path)
+        except FileNotFoundError:
+            return None
+        with data:
+            if key is not None and str(data["key"]) != key:
+                return None
+            transcripts: Dict[str, np.ndarray] = {name[len("transcript_"):]: data[name] for name in data.files
+                                                  if name.startswith("transcript_")}
+            pairs: Dict[str, np.ndarray] = {name[len("pair_"):]: data[name] for name in data.files
+                                            if name.startswith("pair_")}
+            return AssemblyTables(transcripts, pairs, data["tags"].tolist())
@@ -20,11 +20,13 @@
 #
 #######################################################################
 
+from Classes.AssemblyVisualizer.AssemblyTables import AssemblyTables
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 
-import json
 import math
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import argparse
 import numpy as np
 import os
@@ -38,116 +40,85 @@ import pandas
 class AssemblyVisualizer:
 
     incomplete_tags: List[str] = ['mRNA_end_NF', 'cds_end_NF', 'mRNA_start_NF', 'cds_start_NF']
+    figures: List[str] = ["fas_diversity_among_genes_boxplot", "incomplete_fas_distribution", "tsl_biotype_histogram",
+                          "tsl_complete_status_histogram"]
 
-    def __init__(self, gene_assembler: GeneAssembler, output_path: str):
+    def __init__(self, gene_assembler: Optional[GeneAssembler], output_path: str,
+                 cache_path: Optional[str] = None, cache_key: str = ""):
         self.gene_assembler = gene_assembler
         self.output_path = output_path
+        self.cache_path = cache_path
+        self.cache_key = cache_key
+        self.tables: Optional[AssemblyTables] = None
+
+    def get_tables(self) -> AssemblyTables:
+        """
+        Transcript and pair tables of the library, extracted once and stored in cache_path if given.
+        cache_key identifies the library state; a cache written for another key is rebuilt.
+        Without a gene_assembler the tables must already be cached.
+        """
+        if self.tables is None:
+            if self.cache_path is not None:
+                self.tables = AssemblyTables.load(self.cache_path, self.cache_key)
+            if self.tables is None:
+                self.tables = AssemblyTables.from_gene_assembler(self.gene_assembler)
+                if self.cache_path is not None:
+                    self.tables.save(self.cache_path, self.cache_key)
+        return self.tables
 
     def generate_fas_diversity_among_genes_boxplot(self) -> None:
-        dataframe: pandas.DataFrame = self.generate_fas_diversity_among_genes()
-        fig = px.box(dataframe, x="transcript_count", y="fas_score")
-        fig.show()
+        self.make_fas_diversity_among_genes_boxplot().show()
         # fig.write_image(os.path.join(self.output_path, "fas_diversity_among_genes.png"))
 
+    def make_fas_diversity_among_genes_boxplot(self):
+        dataframe: pandas.DataFrame = self.generate_fas_diversity_among_genes()
+        return px.box(dataframe, x="transcript_count", y="fas_score")
+
     def generate_fas_diversity_among_genes(self) -> pandas.DataFrame:
         group_list: List[int] = [0]
         for entry in [[value] * 5 for value in [5, 10, 15, 20, 25, 30, 35, 40, 45, 50]]:
             group_list += entry
         group_list += [50] * 100
-
-        data_dict: Dict[str, List[Any]] = {"transcript_count": [],
-                                           "fas_score": []}
-        for gene in self.gene_assembler.get_genes():
-            count: int = 0
-            fas_scores_count: int = 0
-            for transcript1 in gene.get_transcripts():
-                if transcript1.get_biotype() != "nonsense_mediated_decay":
-                    count += 1
-                    for transcript2 in gene.get_transcripts():
-                        if transcript1 != transcript2 and transcript2.get_biotype() != "nonsense_mediated_decay":
-                            data_dict["fas_score"].append(gene.fas_dict[transcript1.get_id()][transcript2.get_id()])
-                            fas_scores_count += 1
-            if count == 1:
-                continue
-            else:
-                data_dict["transcript_count"] += [group_list[count]] * fas_scores_count
-        return pandas.DataFrame(data_dict)
+        return self.get_tables().fas_diversity_dataframe(group_list)
 
     def generate_incomplete_fas_distribution(self) -> None:
+        self.make_incomplete_fas_distribution().show()
+
+    def make_incomplete_fas_distribution(self):
         dataframe: pandas.DataFrame = self.generate_fas_comparison_dataframe()
-        fig = px.histogram(dataframe, x="fas_score", color="complete_status", barmode="group", nbins=20)
-        fig.show()
+        return px.histogram(dataframe, x="fas_score", color="complete_status", barmode="group", nbins=20)
 
     def generate_fas_comparison_dataframe(self) -> pandas.DataFrame:
-        data_dict: Dict[str, List[Any]] = {"fas_score": [],
-                                           "tsl_dist": [],
-                                           "complete_status": []}
-        for gene in self.gene_assembler.get_genes():
-            for transcript1 in gene.get_transcripts():
-                if transcript1.get_biotype() == "nonsense_mediated_decay":
-                    continue
-                for transcript2 in gene.get_transcripts():
-                    if transcript1 == transcript2 or transcript2.get_biotype() == "nonsense_mediated_decay":
-                        continue
-                    else:
-                        data_dict["fas_score"].append(gene.fas_dict[transcript1.get_id()][transcript2.get_id()])
-                        tsl1: int = transcript1.get_transcript_support_level()
-                        tsl2: int = transcript2.get_transcript_support_level()
-                        data_dict["tsl_dist"].append(abs(tsl1 - tsl2))
-                        status1: bool = any([tag in self.incomplete_tags for tag in transcript1.get_tags()])
-                        status2: bool = any([tag in self.incomplete_tags for tag in transcript2.get_tags()])
-                        if status1 and status2:
-                            data_dict["complete_status"].append("both incomplete")
-                        elif status1 and not status2 or not status1 and status2:
-                            data_dict["complete_status"].append("one incomplete")
-                        else:
-                            data_dict["complete_status"].append("both complete")
-        return pandas.DataFrame(data_dict)
+        return self.get_tables().fas_comparison_dataframe(self.incomplete_tags)
 
     def generate_tsl_biotype_histogram(self) -> None:
-        dataframe: pandas.DataFrame = self.generate_transcript_dataframe()
-        fig = px.histogram(dataframe, x='tsl', color='biotype', barmode='group')
-        fig.show()
+        self.make_tsl_biotype_histogram().show()
         # fig.write_image(os.path.join(self.output_path, "tsl_biotype_histogram.png"))
 
-    def generate_tsl_complete_status_histogram(self) -> None:
+    def make_tsl_biotype_histogram(self):
         dataframe: pandas.DataFrame = self.generate_transcript_dataframe()
-        fig = px.histogram(dataframe, x='tsl', color='complete_status', barmode='group')
-        fig.show()
+        return px.histogram(dataframe, x='tsl', color='biotype', barmode='group')
+
+    def generate_tsl_complete_status_histogram(self) -> None:
+        self.make_tsl_complete_status_histogram().show()
         # fig.write_image(os.path.join(self.output_path, "tsl_complete_status_histogram.png"))
 
+    def make_tsl_complete_status_histogram(self):
+        dataframe: pandas.DataFrame = self.generate_transcript_dataframe()
+        return px.histogram(dataframe, x='tsl', color='complete_status', barmode='group')
+
     def generate_transcript_dataframe(self) -> pandas.DataFrame:
-        tags: List[str] = self.gene_assembler.extract_tags()
-        data_dict: Dict[str, List[Any]] = {"_id": [],
-                                           "transcript_name": [],
-                                           "feature": [],
-                                           "gene_id": [],
-                                           "taxon_id": [],
-                                           "tsl": [],
-                                           "biotype": [],
-                                           "complete_status": []}
-        for tag in tags:
-            data_dict[tag] = []
-
-        for transcript in self.gene_assembler.get_transcripts():
-            data_dict["_id"].append(transcript.get_id())
-            data_dict["transcript_name"].append(transcript.get_name())
-            data_dict["feature"].append(transcript.get_feature())
-            data_dict["gene_id"].append(transcript.get_id_gene())
-            data_dict["taxon_id"].append(transcript.get_id_taxon())
-            data_dict["tsl"].append(transcript.get_transcript_support_level())
-            data_dict["biotype"].append(transcript.get_biotype())
-            for tag in tags:
-                if tag in transcript.get_tags():
-                    data_dict[tag].append(True)
-                else:
-                    data_dict[tag].append(False)
-
-            if any(tag in self.incomplete_tags for tag in transcript.get_tags()):
-                data_dict["complete_status"].append("incomplete")
-            else:
-                data_dict["complete_status"].append("complete")
-        return pandas.DataFrame(data_dict)
+        return self.get_tables().transcript_dataframe(self.incomplete_tags)
+
+    def write_figure(self, figure_name: str, outfile: str) -> None:
+        """
+        Write one of the figures as standalone HTML without opening a browser, for batch rendering.
+        """
+        if figure_name not in AssemblyVisualizer.figures:
+            raise ValueError(f"Unknown figure {figure_name}, choose from {', '.join(AssemblyVisualizer.figures)}")
+        fig = getattr(self, "make_" + figure_name)()
+        with JSONBoy.atomic_open(outfile) as f:
+            fig.write_html(f, include_plotlyjs="cdn")
 
 
 class ResultVisualizer:
@@ -158,10 +129,16 @@ class ResultVisualizer:
     def simulate_transcript(self, gene_id: str,
                             transcript_1: str,
                             transcript_2: str) -> float:
-        with open(os.path.join(self.library_path, "fas_data", "fas_index.json"), "r") as f:
-            file_name: str = json.load(f)[gene_id]
-        with open(os.path.join(self.library_path, "fas_data", "fas_scores", file_name), "r") as f:
-            fas_adjacency_dict: Dict[str, Dict[str, float]] = json.load(f)[gene_id]
+        fas_adjacency_dict: Dict[str, Dict[str, float]]
+        library_db: Optional[LibraryDB] = LibraryDB.open_library(self.library_path)
+        if library_db is not None:
+            with library_db:
+                fas_adjacency_dict = library_db.get_fas_matrix(gene_id)
+        else:
+            with open(os.path.join(self.library_path, "fas_data", "fas_index.json"), "r") as f:
+                file_name: str = JSONBoy.load(f)[gene_id]
+            with open(os.path.join(self.library_path, "fas_data", "fas_scores", file_name), "r") as f:
+                fas_adjacency_dict = JSONBoy.load(f)[gene_id]
 
         fas_adjacency_matrix: np.array = ResultVisualizer.distance_dict_to_matrix(fas_adjacency_dict)
 
@@ -251,6 +228,24 @@ class ResultVisualizer:
 
         rank_entries, rank_max = ResultVisualizer.import_rmsd_ranks(result_directory, max_rmsd_dict, rank_count)
 
+        ResultVisualizer.render_rmsd_distribution(rank_entries, rank_max, max_rmsd_stats, sim_switch_stats,
+                                                  filter_tag, outfile, library_name, switch_label_flag)
+        print(outfile)
+
+    @staticmethod
+    def render_rmsd_distribution(rank_entries: List[List[float]],
+                                 rank_max: List[float],
+                                 max_rmsd_stats: List[Tuple[float, str, str]],
+                                 sim_switch_stats: List[Tuple[float, str, str]],
+                                 filter_tag: str,
+                                 outfile: str,
+                                 library_name: str,
+                                 switch_label_flag: bool) -> None:
+        """
+        Draw the RMSD by rank boxplot from already imported data, so several figures can share one import.
+        """
+        rank_count: int = len(rank_entries)
+
         # General setup
         fig, ax = plt.subplots()
         positions = range(1, rank_count+1)
@@ -323,8 +318,8 @@ class ResultVisualizer:
 
         ax.plot(np.linspace(1, rank_count, 13), line_smooth, color='royalblue', label=r'Mean $RMSD_{EWFD}$ Max')
 
-        plt.savefig(outfile, format='svg')
-        print(outfile)
+        fig.savefig(outfile, format='svg')
+        plt.close(fig)
 
     @staticmethod
     def import_rmsd_ranks(result_directory: str, max_rmsd_dict: Dict[str, float], rank_count: int):
@@ -21,75 +21,183 @@
 #######################################################################
 
 import numpy as np
-from typing import Dict, List, Any, Set
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Set, Tuple
 from scipy.optimize import minimize
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import argparse
-import copy
-import json
 import os
 import random
 
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+# Genes per worker task, the output table is extended after every task
+GENES_PER_TASK: int = 256
+
 
 class RMSDOptimizer:
+    """
+    Maximum RMSD of the FAS matrix of a gene for the four transcript filters of the output table.
+
+    The matrix is built once per gene; the filters only select rows and columns through boolean masks.
+    Filters are applied with pre_ewfd_flag only, otherwise all four variants use all transcripts.
+    """
+
+    # Output column: (protein_coding_flag, complete_flag)
+    variants: List[Tuple[str, bool, bool]] = [("all", False, False),
+                                              ("no_incomplete", False, True),
+                                              ("no_non_coding", True, False),
+                                              ("no_both", True, True)]
 
     def __init__(self,
                  distance_dict: Dict[str, Dict[str, float]],
                  info_dict: Dict[str, Any],
-                 protein_coding_flag: bool = True,
-                 complete_flag: bool = True,
                  pre_ewfd_flag: bool = False):
+        self.protein_ids, self.matrix = RMSDOptimizer.distance_dict_to_matrix(distance_dict)
+        self.complete_mask: Optional[np.ndarray] = None
+        self.coding_mask: Optional[np.ndarray] = None
+        if pre_ewfd_flag:
+            transcripts: Dict[str, Any] = info_dict["transcripts"]
+            self.complete_mask = np.array(["incomplete" not in transcripts[protein_id]["tags"]
+                                           for protein_id in self.protein_ids], dtype=bool)
+            self.coding_mask = np.array([transcripts[protein_id]["biotype"] == "protein_coding"
+                                         for protein_id in self.protein_ids], dtype=bool)
 
-        self.matrix = RMSDOptimizer.distance_dict_to_matrix(distance_dict,
-                                                            protein_coding_flag,
-                                                            complete_flag,
-                                                            pre_ewfd_flag,
-                                                            info_dict)
-
-        if info_dict["_id"] == "ENSG00000163081":
-            print(self.matrix)
-            print(distance_dict)
+    def get_mask(self, protein_coding_flag: bool, complete_flag: bool) -> np.ndarray:
+        mask: np.ndarray = np.ones(len(self.protein_ids), dtype=bool)
+        if complete_flag and self.complete_mask is not None:
+            mask &= self.complete_mask
+        if protein_coding_flag and self.coding_mask is not None:
+            mask &= self.coding_mask
+        return mask
 
-        self.max_rmsd: float = RMSDOptimizer.extract_max_rmsd(self.matrix)
+    def get_max_rmsd(self, protein_coding_flag: bool = False, complete_flag: bool = False) -> float:
+        return RMSDOptimizer.extract_max_rmsd(self.matrix, self.get_mask(protein_coding_flag, complete_flag))
 
-        if info_dict["_id"] == "ENSG00000163081":
-            print(self.max_rmsd)
-            print("---")
+    def get_max_rmsds(self) -> List[float]:
+        """
+        Maximum RMSD for every filter variant, in the column order of the output table.
+        """
+        return [self.get_max_rmsd(protein_coding_flag, complete_flag)
+                for _, protein_coding_flag, complete_flag in RMSDOptimizer.variants]
 
     @staticmethod
-    def extract_max_rmsd(matrix):
-        vector: List[float] = list()
-        for i, _ in enumerate(matrix):
-            for j, _ in enumerate(matrix[i]):
-                if i != j:
-                    vector.append((matrix[i][j] + matrix[j][i]) / 2)
-        complement: List[float] = [1-entry for entry in vector]
-        if len(complement) == 0:
+    def extract_max_rmsd(matrix: np.ndarray, mask: Optional[np.ndarray] = None) -> float:
+        """
+        Largest 1 - (FAS(i, j) + FAS(j, i)) / 2 over all pairs i != j of the transcripts in mask.
+        """
+        if mask is not None:
+            matrix = matrix[np.ix_(mask, mask)]
+        if len(matrix) < 2:
             return 0.0
-        else:
-            return max(complement)
+        complement: np.ndarray = 1 - (matrix + matrix.T)[~np.eye(len(matrix), dtype=bool)] / 2
+        if np.isnan(complement).all():
+            return 0.0
+        # Kept as np.float64, the table has always been rounded the NumPy way
+        return np.nanmax(complement)
 
     @staticmethod
-    def distance_dict_to_matrix(distance_dict: Dict[str, Dict[str, float]],
-                                protein_coding_flag: bool,
-                                complete_flag: bool,
-                                pre_ewfd_flag: bool,
-                                info_dict: Dict[str, Any]) -> np.array:
-        raw_matrix: List[List[float]] = list()
-        complete_flag = complete_flag and pre_ewfd_flag
-        protein_coding_flag = protein_coding_flag and pre_ewfd_flag
-        for protein_id_outer in distance_dict.keys():
-            if complete_flag and "incomplete" in info_dict["transcripts"][protein_id_outer]["tags"]:
-                continue
-            elif protein_coding_flag and info_dict["transcripts"][protein_id_outer]["biotype"] != "protein_coding":
-                continue
-            raw_matrix.append(list())
-            for protein_id_inner in distance_dict[protein_id_outer].keys():
-                if complete_flag and "incomplete" in info_dict["transcripts"][protein_id_inner]["tags"]:
-                    continue
-                elif protein_coding_flag and info_dict["transcripts"][protein_id_inner]["biotype"] != "protein_coding":
-                    continue
-                raw_matrix[-1].append(distance_dict[protein_id_outer][protein_id_inner])
-        return np.array(raw_matrix)
+    def distance_dict_to_matrix(distance_dict: Dict[str, Dict[str, float]]) -> Tuple[List[str], np.ndarray]:
+        """
+        Square matrix of a gene's FAS dictionary in the order of its outer keys. Missing pairs are NaN.
+        """
+        protein_ids: List[str] = list(distance_dict.keys())
+        matrix: np.ndarray = np.array([[distance_dict[protein_id_outer].get(protein_id_inner, np.nan)
+                                        for protein_id_inner in protein_ids]
+                                       for protein_id_outer in protein_ids], dtype=float).reshape(len(protein_ids),
+                                                                                                 len(protein_ids))
+        return protein_ids, matrix
+
+
+def process_genes(task: Tuple[Dict[str, Dict[str, Dict[str, float]]], Dict[str, Any], bool]) -> List[List[str]]:
+    """
+    Output rows of a batch of genes from their FAS matrices and transcript info.
+    """
+    distance_dicts, info_dict, pre_ewfd_flag = task
+    rows: List[List[str]] = list()
+    for gene_id, gene_info in info_dict.items():
+        optimizer = RMSDOptimizer(distance_dicts[gene_id], gene_info, pre_ewfd_flag)
+        rows.append([gene_id] + [str(round(max_rmsd, 2)) for max_rmsd in optimizer.get_max_rmsds()])
+    return rows
+
+
+def iter_tasks(pass_path: PassPath, gene_ids: List[str],
+               pre_ewfd_flag: bool) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any], bool]]:
+    """
+    Batches of the FAS matrices and transcript info of the given genes, built only when the batch is needed.
+    Database libraries load gene by gene, JSON libraries keep the transcript info and one fas_scores shard.
+    """
+    if LibraryDB.is_db_library(pass_path):
+        for start in range(0, len(gene_ids), GENES_PER_TASK):
+            genes = [GeneAssembler.load_gene(pass_path, gene_id) for gene_id in gene_ids[start:start + GENES_PER_TASK]]
+            yield ({gene.get_id(): gene.to_dict("fas") for gene in genes},
+                   {gene.get_id(): gene.to_dict("info") for gene in genes},
+                   pre_ewfd_flag)
+        return
+    missing: Set[str] = set(gene_ids)
+    with open(pass_path["transcript_info"], "r") as f:
+        info_dict: Dict[str, Any] = JSONBoy.load(f)
+    with open(pass_path["fas_index"], "r") as f:
+        fas_index: Dict[str, str] = JSONBoy.load(f)
+    for fas_file in sorted(set(fas_index.values())):
+        with open(os.path.join(pass_path["fas_scores"], fas_file), "r") as f:
+            distance_dicts: Dict[str, Any] = JSONBoy.load(f)
+        shard_genes: List[str] = [gene_id for gene_id in distance_dicts.keys() if gene_id in missing]
+        for start in range(0, len(shard_genes), GENES_PER_TASK):
+            batch: List[str] = shard_genes[start:start + GENES_PER_TASK]
+            yield ({gene_id: distance_dicts[gene_id] for gene_id in batch},
+                   {gene_id: info_dict[gene_id] for gene_id in batch},
+                   pre_ewfd_flag)
+
+
+def run_tasks(tasks: Iterable[Tuple[Dict[str, Any], Dict[str, Any], bool]], workers: int) -> Iterator[List[List[str]]]:
+    """
+    Output rows of every task in task order. At most workers tasks are submitted at a time, so only
+    their batches are held in memory.
+    """
+    if workers <= 1:
+        yield from map(process_genes, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(process_genes, task))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def read_finished_genes(path: str) -> Tuple[Set[str], List[str]]:
+    """
+    Genes and complete rows of an output table of a previous (possibly interrupted) run. A last line
+    without a line break was cut off while writing and does not count as finished.
+    """
+    with open(path, "r") as f:
+        lines: List[str] = f.read().split("\n")[:-1]
+    rows: List[str] = [line for line in lines[1:] if len(line.split("\t")) == len(RMSDOptimizer.variants) + 1]
+    return {row.split("\t")[0] for row in rows}, rows
+
+
+def open_checkpoint(path: str, header: List[str], carried_rows: List[str]):
+    """
+    Open the output table for appending. A new table gets the header and the carried rows, an existing one
+    loses a last line that was cut off by an interruption.
+    """
+    if os.path.isfile(path) and os.path.getsize(path) > 0:
+        with open(path, "r+") as f:
+            content: str = f.read()
+            if not content.endswith("\n"):
+                f.seek(0)
+                f.truncate(len(content[:content.rfind("\n") + 1].encode()))
+        return open(path, "a")
+    f = open(path, "w")
+    f.write("\n".join(["\t".join(header)] + carried_rows) + "\n")
+    f.flush()
+    return f
 
 
 def main():
@@ -103,7 +211,7 @@ def main():
                         "--outfile",
                         type=str,
                         action="store",
-                        help="Name of the output file.")
+                        help="Name of the output file. An existing file is resumed, rows are appended per batch of genes.")
     parser.add_argument("-a",
                         "--already",
                         type=str,
@@ -114,70 +222,45 @@ def main():
                         action="store_true",
                         help="""Alternative version that truly reduces the library by non_coding and incomplete
                         transcript.""")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=1,
+                        help="Number of processes handling batches of genes in parallel.")
 
     argument_dict: Dict[str, Any] = vars(parser.parse_args())
 
     if argument_dict["mode"] is None:
         argument_dict["mode"] = False
 
+    header: List[str] = ["geneid"] + [name for name, _, _ in RMSDOptimizer.variants]
     already_calced: Set[str] = set()
+    carried_rows: List[str] = list()
 
     if argument_dict["already"] is not None:
-        with open(argument_dict["already"], "r") as f:
-            output_file: List[str] = f.read().split("\n")
-            output_list: List[List[str]] = [entry.split("\t") for entry in output_file]
-            for entry in output_list[1:]:
-                already_calced.add(entry[0])
+        already_calced, carried_rows = read_finished_genes(argument_dict["already"])
+    if os.path.isfile(argument_dict["outfile"]):
+        already_calced |= read_finished_genes(argument_dict["outfile"])[0]
+
+    # Only the gene IDs are read up front, the batches are loaded while the table is written
+    with open(os.path.join(argument_dict["library"], "paths.json"), "r") as f:
+        pass_path: PassPath = PassPath(dict(JSONBoy.load(f), root=argument_dict["library"]))
+    if LibraryDB.is_db_library(pass_path):
+        with LibraryDB(pass_path["library_db"]) as library_db:
+            library_gene_ids: List[str] = library_db.get_gene_ids()
     else:
-        output_list: List[List[str]] = [["geneid", "all", "no_incomplete", "no_non_coding", "no_both"]]
-
-    with open(os.path.join(argument_dict["library"], "transcript_data", "transcript_info.json"), "r") as f:
-        info_dict = json.load(f)
-
-    with open(os.path.join(argument_dict["library"], "fas_data", "fas_index.json"), "r") as f:
-        fas_file_list = list(set(json.load(f).values()))
-
-    total: int = len(fas_file_list)
-
-    for i, fas_file in enumerate(fas_file_list):
-        print(str(i) + "/" + str(total), fas_file)
-        with open(os.path.join(argument_dict["library"], "fas_data", "fas_scores", fas_file), "r") as f:
-            distance_dicts: Dict[str, Any] = json.load(f)
-        for gene_id in distance_dicts.keys():
-            if gene_id not in already_calced:
-                stages: List[bool] = [False, False, False, False]
-
-                optimizer = RMSDOptimizer(copy.deepcopy(distance_dicts[gene_id]),
-                                          info_dict[gene_id],
-                                          False,
-                                          False,
-                                          argument_dict["mode"])
-                stages[0] = True
-                optimizer_no_incomplete = RMSDOptimizer(copy.deepcopy(distance_dicts[gene_id]),
-                                                        info_dict[gene_id], False, True,
-                                                        argument_dict["mode"])
-                stages[1] = True
-                optimizer_no_non_coding = RMSDOptimizer(copy.deepcopy(distance_dicts[gene_id]),
-                                                        info_dict[gene_id], True, False,
-                                                        argument_dict["mode"])
-                stages[2] = True
-                optimizer_both = RMSDOptimizer(copy.deepcopy(distance_dicts[gene_id]),
-                                               info_dict[gene_id],
-                                               True,
-                                               True,
-                                               argument_dict["mode"])
-                stages[3] = True
-                output_list.append([gene_id,
-                                    str(round(optimizer.max_rmsd, 2)),
-                                    str(round(optimizer_no_incomplete.max_rmsd, 2)),
-                                    str(round(optimizer_no_non_coding.max_rmsd, 2)),
-                                    str(round(optimizer_both.max_rmsd, 2))])
-
-        with open(argument_dict["outfile"], "w") as f:
-            f.write("\n".join(["\t".join(entry) for entry in output_list]))
-    #  print("\n".join(["\t".join(entry) for entry in output_list]))
-    with open(argument_dict["outfile"], "w") as f:
-        f.write("\n".join(["\t".join(entry) for entry in output_list]))
+        with open(pass_path["fas_index"], "r") as f:
+            library_gene_ids: List[str] = list(JSONBoy.load(f).keys())
+    gene_ids: List[str] = [gene_id for gene_id in library_gene_ids if gene_id not in already_calced]
+
+    total: int = len(gene_ids)
+    done: int = 0
+    with open_checkpoint(argument_dict["outfile"], header, carried_rows) as f:
+        for rows in run_tasks(iter_tasks(pass_path, gene_ids, argument_dict["mode"]), argument_dict["workers"]):
+            done += len(rows)
+            print(str(done) + "/" + str(total) + " genes")
+            f.write("".join("\t".join(row) + "\n" for row in rows))
+            f.flush()
 
 
 if __name__ == "__main__":
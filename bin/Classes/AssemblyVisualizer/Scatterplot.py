@@ -21,18 +21,23 @@
 #######################################################################
 
 import argparse
+import itertools
 import os
-from typing import Dict, List, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Set, Tuple
 import numpy as np
 
 from matplotlib import pyplot as plt
 
+# Gene ID to buffer index map of extract_median_ranks, set in every worker process
+shared_gene_map: Dict[str, int] = dict()
+
 
 class Scatterplot:
 
-    def __init__(self, path1: str, path2: str, outpath: str, label1: str, label2: str):
-        self.median_rank_1: Dict[str, int] = Scatterplot.extract_median_ranks(path1)
-        self.median_rank_2: Dict[str, int] = Scatterplot.extract_median_ranks(path2)
+    def __init__(self, path1: str, path2: str, outpath: str, label1: str, label2: str, workers: int = 1):
+        self.median_rank_1: Dict[str, int] = Scatterplot.extract_median_ranks(path1, workers)
+        self.median_rank_2: Dict[str, int] = Scatterplot.extract_median_ranks(path2, workers)
 
         self.data_1_median_ranks, self.data_2_median_ranks = self.__fuse_median_ranks__()
 
@@ -64,22 +69,78 @@ class Scatterplot:
         return data_1_median_ranks, data_2_median_ranks
 
     @staticmethod
-    def extract_median_ranks(path):
-        filenames = os.listdir(path)
-        median_rank_dict: Dict[str, List[int]] = dict()
-        for filename in filenames:
-            with open(os.path.join(path, filename), "r") as f:
-                lines = f.read().split("\n")
-                for i, line in enumerate(lines[1:]):
-                    gene_id = line.split(",")[0]
-                    if gene_id not in median_rank_dict.keys():
-                        median_rank_dict[gene_id] = list()
-                    median_rank_dict[gene_id].append(i)
-        median_rank: Dict[str, int] = dict()
-        for key in median_rank_dict.keys():
-            median_rank_dict[key].sort()
-            median_rank[key] = median_rank_dict[key][int(len(median_rank_dict[key]) / 2)]
-        return median_rank
+    def read_gene_ids(file_path: str) -> List[str]:
+        """
+        Gene IDs of a result file in rank order, the first column of every line after the header.
+        """
+        with open(file_path, "r") as f:
+            next(f, None)
+            return [line.split(",", 1)[0] for line in f if line.strip()]
+
+    @staticmethod
+    def read_gene_indices(file_path: str) -> Tuple[np.ndarray, List[str]]:
+        """
+        Indices of the gene IDs of a result file in the shared gene map, -1 for genes missing in the map.
+        The missing gene IDs are returned in rank order.
+        """
+        gene_ids: List[str] = Scatterplot.read_gene_ids(file_path)
+        indices: np.ndarray = np.fromiter(map(shared_gene_map.get, gene_ids, itertools.repeat(-1)),
+                                          dtype=np.int32, count=len(gene_ids))
+        return indices, [gene_id for gene_id in gene_ids if gene_id not in shared_gene_map]
+
+    @staticmethod
+    def extract_median_ranks(path: str, workers: int = 1) -> Dict[str, int]:
+        """
+        Median rank of every gene over all result files of a directory (the upper median for even counts).
+
+        The gene map is built from the first file and shared with the worker processes, which return the
+        gene indices of the other files. Indices and ranks are streamed into flat NumPy buffers and the
+        medians of all genes are taken at once from the buffers sorted by gene and rank.
+        """
+        file_paths: List[str] = [os.path.join(path, filename) for filename in os.listdir(path)]
+        if not file_paths:
+            return dict()
+        gene_map: Dict[str, int] = dict()
+        for gene_id in Scatterplot.read_gene_ids(file_paths[0]):
+            gene_map.setdefault(gene_id, len(gene_map))
+        set_shared_gene_map(gene_map)
+
+        gene_buffer: np.ndarray = np.zeros(max(1, len(file_paths) * len(gene_map)), dtype=np.int32)
+        rank_buffer: np.ndarray = np.zeros(len(gene_buffer), dtype=np.int32)
+        size: int = 0
+        if workers > 1 and len(file_paths) > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=set_shared_gene_map, initargs=(gene_map,))
+            results: Iterator[Tuple[np.ndarray, List[str]]] = executor.map(Scatterplot.read_gene_indices, file_paths,
+                                                                            chunksize=8)
+        else:
+            executor = None
+            results = map(Scatterplot.read_gene_indices, file_paths)
+        try:
+            for indices, missing_ids in results:
+                if missing_ids:
+                    # The shared map only knows the first file, later genes are numbered here
+                    indices[indices < 0] = [gene_map.setdefault(gene_id, len(gene_map)) for gene_id in missing_ids]
+                if size + len(indices) > len(gene_buffer):
+                    gene_buffer = np.resize(gene_buffer, max(2 * len(gene_buffer), size + len(indices)))
+                    rank_buffer = np.resize(rank_buffer, len(gene_buffer))
+                gene_buffer[size:size + len(indices)] = indices
+                rank_buffer[size:size + len(indices)] = np.arange(len(indices), dtype=np.int32)
+                size += len(indices)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        genes: np.ndarray = gene_buffer[:size]
+        ranks: np.ndarray = rank_buffer[:size]
+        sorted_ranks: np.ndarray = ranks[np.lexsort((ranks, genes))]
+        counts: np.ndarray = np.bincount(genes, minlength=len(gene_map))
+        starts: np.ndarray = np.cumsum(counts) - counts
+        return dict(zip(gene_map, sorted_ranks[starts + counts // 2].tolist()))
+
+
+def set_shared_gene_map(gene_map: Dict[str, int]) -> None:
+    global shared_gene_map
+    shared_gene_map = gene_map
 
 
 def main():
@@ -101,14 +162,21 @@ def main():
                         type=str,
                         action="store",
                         help="Path to output file.")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        action="store",
+                        default=1,
+                        help="Number of processes reading the result files.")
 
-    argument_dict: Dict[str, str] = vars(parser.parse_args())
+    argument_dict: Dict[str, Any] = vars(parser.parse_args())
 
     scatterplot: Scatterplot = Scatterplot(argument_dict["input"][0],
                                            argument_dict["input"][1],
                                            argument_dict["output"],
                                            argument_dict["label"][0],
-                                           argument_dict["label"][1])
+                                           argument_dict["label"][1],
+                                           argument_dict["workers"])
 
 
 if __name__ == "__main__":
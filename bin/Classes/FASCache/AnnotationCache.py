@@ -0,0 +1,170 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import hashlib
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+
+class AnnotationCache:
+    """
+    Content-addressed store of fas.doAnno results in a SQLite file, shared between libraries.
+
+    The annotation of a protein ("feature" entry of annotations.json) is stored under the SHA-256 of its
+    sequence and a configuration key built from the annotation tool file and the fas.doAnno options.
+    The tool versions reported by fas.doAnno are part of the configuration key and are recorded once per
+    configuration; results of other tool versions are refused, so a cache never mixes annotations of different
+    tool releases.
+    """
+
+    # Per feature metadata of annotations.json, "count" is derived from the instances instead
+    feature_info_keys: List[str] = ["interproID", "clan", "length"]
+
+    schema: List[str] = [
+        "CREATE TABLE IF NOT EXISTS versions (config TEXT PRIMARY KEY, version TEXT)",
+        "CREATE TABLE IF NOT EXISTS proteins (config TEXT, seq_hash TEXT, feature TEXT, "
+        "PRIMARY KEY (config, seq_hash)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS feature_info (config TEXT, feature_id TEXT, info TEXT, "
+        "PRIMARY KEY (config, feature_id)) WITHOUT ROWID",
+    ]
+
+    def __init__(self, cache_path: str, config_key: str):
+        self.cache_path: str = cache_path
+        self.config_key: str = config_key
+        self.connection = sqlite3.connect(cache_path, timeout=600)
+        for statement in AnnotationCache.schema:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    @staticmethod
+    def make_config_key(anno_tools_file: str, options: str = "", tool_versions: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Hash the annotation tools, the fas.doAnno options and the installed tool versions ("version" entry of an
+        annotations.json written by them), so annotations of other tool releases are never looked up.
+        """
+        with open(anno_tools_file, "r") as f:
+            tools: List[str] = [line.strip() for line in f if line.strip()]
+        config = json.dumps({"tools": tools, "options": options.strip(), "tool_versions": tool_versions or dict()},
+                            sort_keys=True)
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()
+
+    def get_version(self) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT version FROM versions WHERE config = ?", (self.config_key,)).fetchone()
+        return JSONBoy.loads(row[0]) if row is not None else None
+
+    def lookup(self, hashes: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Build an annotations.json dictionary for all headers whose sequence hash is cached.
+        """
+        features: Dict[str, Any] = dict()
+        for header, seq_hash in hashes.items():
+            row = self.connection.execute("SELECT feature FROM proteins WHERE config = ? AND seq_hash = ?",
+                                          (self.config_key, seq_hash)).fetchone()
+            if row is not None:
+                features[header] = JSONBoy.loads(row[0])
+
+        annotations: Dict[str, Any] = {"feature": features}
+        for key in AnnotationCache.feature_info_keys:
+            annotations[key] = dict()
+        used_features = {feature_id for entry in features.values() for feature_id in AnnotationCache.iter_feature_ids(entry)}
+        for feature_id, info in self.connection.execute("SELECT feature_id, info FROM feature_info WHERE config = ?",
+                                                        (self.config_key,)):
+            if feature_id in used_features:
+                for key, value in JSONBoy.loads(info).items():
+                    annotations[key][feature_id] = value
+        annotations["count"] = AnnotationCache.count_features(features)
+        annotations["version"] = self.get_version() or dict()
+        return annotations
+
+    def add(self, annotations: Dict[str, Any], hashes: Dict[str, str]) -> int:
+        """
+        Add the annotations of fas.doAnno (or a previous library) for all proteins with a known sequence hash.
+        Returns the number of newly cached sequences.
+        """
+        version = annotations.get("version", dict())
+        cached_version = self.get_version()
+        if cached_version is None:
+            self.connection.execute("INSERT INTO versions VALUES (?, ?)", (self.config_key, JSONBoy.dumps(version)))
+        elif cached_version != version:
+            raise ValueError(f"Annotation tool versions {version} differ from the versions {cached_version} "
+                             f"cached in {self.cache_path}. Use a new annotation cache for new tool versions.")
+
+        rows: List[Tuple[str, str, str]] = [(self.config_key, hashes[header], JSONBoy.dumps(entry))
+                                            for header, entry in annotations["feature"].items() if header in hashes]
+        before = self.connection.total_changes
+        self.connection.executemany("INSERT OR IGNORE INTO proteins VALUES (?, ?, ?)", rows)
+        added = self.connection.total_changes - before
+
+        info: Dict[str, Dict[str, Any]] = dict()
+        for key in AnnotationCache.feature_info_keys:
+            for feature_id, value in annotations.get(key, dict()).items():
+                info.setdefault(feature_id, dict())[key] = value
+        self.connection.executemany("INSERT OR REPLACE INTO feature_info VALUES (?, ?, ?)",
+                                    [(self.config_key, feature_id, JSONBoy.dumps(value))
+                                     for feature_id, value in info.items()])
+        self.connection.commit()
+        return added
+
+    @staticmethod
+    def iter_feature_ids(entry: Dict[str, Any]) -> Iterable[str]:
+        for tool, tool_features in entry.items():
+            if tool != "length":
+                yield from tool_features.keys()
+
+    @staticmethod
+    def count_features(features: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Number of instances of every feature over all proteins, the "count" entry of annotations.json.
+        """
+        count: Dict[str, int] = dict()
+        for entry in features.values():
+            for tool, tool_features in entry.items():
+                if tool == "length":
+                    continue
+                for feature_id, feature in tool_features.items():
+                    count[feature_id] = count.get(feature_id, 0) + len(feature["instance"])
+        return count
+
+    @staticmethod
+    def merge(cached: Dict[str, Any], fresh: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Combine cached and freshly computed annotations into one annotations.json dictionary.
+        """
+        merged: Dict[str, Any] = {"feature": dict(cached["feature"])}
+        merged["feature"].update(fresh.get("feature", dict()))
+        for key in AnnotationCache.feature_info_keys:
+            merged[key] = dict(cached.get(key, dict()))
+            merged[key].update(fresh.get(key, dict()))
+        merged["count"] = AnnotationCache.count_features(merged["feature"])
+        merged["version"] = fresh.get("version") or cached.get("version", dict())
+        return merged
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,211 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.LibraryInfo import LibraryInfo
+from Classes.SequenceHandling.Protein import Protein
+
+
+class FASCache:
+    """
+    Content-addressed store of FAS results in a SQLite file, shared between libraries.
+
+    A protein pair is identified by the SHA-256 of its seed and query sequence and a configuration key
+    (FAS mode, annotation tool versions and FAS scoring options). Besides the two scores, the domain
+    lines of forward.domains and reverse.domains are kept, so that cached pairs get their architectures
+    without being scored again. Domain lines are stored without pairID and orthoID and are restored
+    with the headers of the library that requests them.
+    """
+
+    phyloprofile_header: str = "geneID\tncbiID\torthoID\tFAS_F\tFAS_B\n"
+
+    schema: List[str] = [
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+        "CREATE TABLE IF NOT EXISTS scores (config TEXT, seed TEXT, query TEXT, fas_f REAL, fas_b REAL, "
+        "PRIMARY KEY (config, seed, query)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS domains (config TEXT, seed TEXT, query TEXT, direction TEXT, "
+        "ortho_is_seed INTEGER, fields TEXT)",
+        "CREATE INDEX IF NOT EXISTS domains_pair ON domains (config, seed, query, direction)",
+    ]
+
+    def __init__(self, cache_path: str, config_key: str):
+        self.cache_path: str = cache_path
+        self.config_key: str = config_key
+        self.connection = sqlite3.connect(cache_path, timeout=600)
+        for statement in FASCache.schema:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    @staticmethod
+    def make_config_key(fas_mode: str, tool_versions: Dict[str, Any], score_options: str = "") -> str:
+        """
+        Hash everything besides the sequences that influences a FAS score.
+        """
+        config = json.dumps({"fas_mode": str(fas_mode), "tool_versions": tool_versions,
+                             "score_options": score_options}, sort_keys=True)
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def open_library(library_dir: str) -> PassPath:
+        with open(os.path.join(library_dir, "paths.json"), "r") as f:
+            path_dict: Dict[str, str] = JSONBoy.load(f)
+        path_dict["root"] = library_dir
+        return PassPath(path_dict)
+
+    @staticmethod
+    def library_config_key(library_dir: str, score_options: str = "") -> str:
+        """
+        Configuration key of a library from its FAS mode and the tool versions stored in annotations.json.
+        """
+        pass_path: PassPath = FASCache.open_library(library_dir)
+        fas_mode: str = LibraryInfo(pass_path["info"])["info"]["fas_mode"]
+        with open(os.path.join(pass_path["fas_data"], "annotations.json"), "r") as f:
+            tool_versions: Dict[str, Any] = JSONBoy.load(f).get("version", dict())
+        return FASCache.make_config_key(fas_mode, tool_versions, score_options)
+
+    @staticmethod
+    def hash_fasta(fasta_path: str) -> Dict[str, str]:
+        """
+        Map every header of a FASTA file to the SHA-256 of its sequence.
+        """
+        hashes: Dict[str, str] = dict()
+        header: Optional[str] = None
+        sequence: List[str] = list()
+        with open(fasta_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith(">"):
+                    if header is not None:
+                        hashes[header] = Protein.hash_sequence("".join(sequence))
+                    header = line[1:]
+                    sequence = list()
+                elif line:
+                    sequence.append(line)
+        if header is not None:
+            hashes[header] = Protein.hash_sequence("".join(sequence))
+        return hashes
+
+    def get_meta(self, key: str, default: str = "") -> str:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def get_scores(self, seed_hash: str, query_hash: str) -> Optional[Tuple[float, float]]:
+        return self.connection.execute(
+            "SELECT fas_f, fas_b FROM scores WHERE config = ? AND seed = ? AND query = ?",
+            (self.config_key, seed_hash, query_hash)).fetchone()
+
+    def get_domain_lines(self, seed_hash: str, query_hash: str, direction: str, seed: str, query: str,
+                         swapped: bool = False) -> List[str]:
+        """
+        Restore the domain lines of a cached pair with the given seed and query headers.
+        With swapped, the pair is cached as (query, seed) and the orthoIDs refer to the cached seed.
+        """
+        rows = self.connection.execute(
+            "SELECT ortho_is_seed, fields FROM domains WHERE config = ? AND seed = ? AND query = ? "
+            "AND direction = ? ORDER BY rowid",
+            (self.config_key, seed_hash, query_hash, direction))
+        return [f"{seed}#{query}\t{seed if bool(ortho_is_seed) != swapped else query}\t{fields}\n"
+                for ortho_is_seed, fields in rows]
+
+    def get_pair(self, seed_hash: str, query_hash: str, seed: str,
+                 query: str) -> Optional[Tuple[Tuple[float, float], List[str], List[str]]]:
+        """
+        Look up the scores and the forward and reverse domain lines of a pair in either orientation.
+        A pair cached as (query, seed) has its forward and backward results swapped.
+        Returns None if the pair is not cached.
+        """
+        scores = self.get_scores(seed_hash, query_hash)
+        if scores is not None:
+            return (scores,
+                    self.get_domain_lines(seed_hash, query_hash, "forward", seed, query),
+                    self.get_domain_lines(seed_hash, query_hash, "reverse", seed, query))
+        scores = self.get_scores(query_hash, seed_hash)
+        if scores is not None:
+            return ((scores[1], scores[0]),
+                    self.get_domain_lines(query_hash, seed_hash, "reverse", seed, query, swapped=True),
+                    self.get_domain_lines(query_hash, seed_hash, "forward", seed, query, swapped=True))
+        return None
+
+    def add_results(self, phyloprofile_path: str, forward_path: str, reverse_path: str,
+                    hashes: Dict[str, str]) -> int:
+        """
+        Add the FAS results of a library. Pairs that are already cached are left untouched.
+        Returns the number of newly cached pairs.
+        """
+        new_pairs: Set[Tuple[str, str]] = set()
+        with open(phyloprofile_path, "r") as f:
+            next(f, "")
+            rows = list()
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 5 or fields[0] not in hashes or fields[2] not in hashes:
+                    continue
+                key = (hashes[fields[0]], hashes[fields[2]])
+                if key in new_pairs or self.get_scores(*key) is not None:
+                    continue
+                new_pairs.add(key)
+                rows.append((self.config_key, key[0], key[1], float(fields[3]), float(fields[4])))
+            self.connection.executemany("INSERT OR IGNORE INTO scores VALUES (?, ?, ?, ?, ?)", rows)
+
+        for direction, domains_path in (("forward", forward_path), ("reverse", reverse_path)):
+            with open(domains_path, "r") as f:
+                # Only a comment line is a header, otherwise the first line is already a domain line
+                header = next(f, "")
+                lines: Iterable[str] = f
+                if header.startswith("#"):
+                    self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (direction + "_header", header))
+                else:
+                    lines = itertools.chain([header], f)
+                self.connection.executemany(
+                    "INSERT INTO domains VALUES (?, ?, ?, ?, ?, ?)",
+                    self.iter_domain_rows(lines, direction, hashes, new_pairs))
+        self.connection.commit()
+        return len(new_pairs)
+
+    def iter_domain_rows(self, lines: Iterable[str], direction: str, hashes: Dict[str, str],
+                         new_pairs: Set[Tuple[str, str]]):
+        for line in lines:
+            if not line.strip() or line.startswith("#"):
+                continue
+            pair_id, ortho_id, fields = line.rstrip("\n").split("\t", 2)
+            seed, query = pair_id.split("#")
+            if seed not in hashes or query not in hashes:
+                continue
+            key = (hashes[seed], hashes[query])
+            if key in new_pairs:
+                yield self.config_key, key[0], key[1], direction, int(ortho_id == seed), fields
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
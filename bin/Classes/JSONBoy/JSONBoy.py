@@ -0,0 +1,289 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import json
+import os
+import re
+import stat
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, TextIO, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONBoy:
+    """
+    Streaming reader and writer for the JSON files of a library.
+
+    A JSON object is written key by key from an iterable of (key, value) pairs, so the complete nested
+    dictionary never has to exist in memory. A value that is itself an iterator of (key, value) pairs is
+    streamed as a nested object. Output is compact by default; with an indent the file is identical to
+    json.dump(..., indent=indent). Files are written to a temporary file next to the target and renamed
+    once complete, so an interrupted run never leaves a truncated file behind.
+
+    All library JSON is parsed and serialized through JSONBoy. If orjson is installed it is used as
+    backend, otherwise the standard library json module. The environment variable SPICE_JSON_BACKEND
+    ("orjson" or "json") overrides the choice. Indented output is always produced by json, so it stays
+    identical to json.dump. Note that orjson writes NaN and infinity as null.
+
+    iter_object reads a JSON object file entry by entry, so large files like annotations.json can be
+    processed without holding the raw text and the parsed dictionary at once.
+    """
+
+    compact_separators: Tuple[str, str] = (",", ":")
+    # Characters read per chunk by iter_object
+    stream_chunk_size: int = 1024 * 1024
+    backends: Tuple[str, ...] = ("orjson", "json") if orjson is not None else ("json",)
+    backend: str = os.environ.get("SPICE_JSON_BACKEND", backends[0])
+    if backend not in backends:
+        backend = "json"
+
+    @staticmethod
+    def set_backend(backend: str) -> None:
+        if backend not in JSONBoy.backends:
+            raise ValueError(f"JSON backend {backend} is not available, choose from {', '.join(JSONBoy.backends)}")
+        JSONBoy.backend = backend
+
+    @staticmethod
+    def loads(data: Union[str, bytes]) -> Any:
+        if JSONBoy.backend == "orjson":
+            return orjson.loads(data)
+        return json.loads(data)
+
+    @staticmethod
+    def load(f: IO) -> Any:
+        return JSONBoy.loads(f.read())
+
+    @staticmethod
+    def read(path: str) -> Any:
+        with open(path, "rb") as f:
+            return JSONBoy.loads(f.read())
+
+    @staticmethod
+    def iter_object(path: str, nested: Iterable[str] = (), chunk_size: int = stream_chunk_size) -> Iterator[Tuple[Any, Any]]:
+        """
+        Stream the top-level (key, value) entries of a JSON object file. The members of top-level keys in
+        nested are streamed one by one as ((key, member_key), value) instead, e.g. the proteins of the
+        "feature" object of annotations.json. Only one entry is decoded at a time.
+
+        The end of a value is found by tracking strings and bracket depth over the chunks, so each value is
+        decoded once when complete. A value spanning several chunks doubles the read size, which keeps
+        reading a single large value linear.
+        """
+        nested = set(nested)
+        decoder = json.JSONDecoder()
+        # Characters that end a number or literal, and the characters to track inside and outside of strings
+        scalar_end = re.compile(r'[\s,\]}]')
+        string_chars = re.compile(r'["\\]')
+        structure_chars = re.compile(r'["{}\[\]]')
+        with open(path, "r", encoding="utf-8") as f:
+            buf = ""
+            pos = 0
+            eof = False
+
+            def more():
+                nonlocal buf, pos, eof
+                chunk = f.read(max(chunk_size, len(buf) - pos))
+                if not chunk:
+                    eof = True
+                buf = buf[pos:] + chunk
+                pos = 0
+
+            def more_from(index):
+                # Read the next chunk and return index shifted to the new buffer
+                if eof:
+                    raise ValueError(f"Unexpected end of file in {path}")
+                offset = index - pos
+                more()
+                return pos + offset
+
+            def next_char():
+                nonlocal pos
+                while True:
+                    while pos < len(buf) and buf[pos].isspace():
+                        pos += 1
+                    if pos < len(buf) or eof:
+                        break
+                    more()
+                if pos >= len(buf):
+                    raise ValueError(f"Unexpected end of file in {path}")
+                return buf[pos]
+
+            def value_end():
+                if next_char() not in "{[\"":
+                    index = pos
+                    while True:
+                        match = scalar_end.search(buf, index)
+                        if match is not None:
+                            return match.start()
+                        if eof:
+                            return len(buf)
+                        index = more_from(len(buf))
+                index = pos
+                depth = 0
+                in_string = False
+                while True:
+                    match = (string_chars if in_string else structure_chars).search(buf, index)
+                    if match is None:
+                        index = more_from(len(buf))
+                        continue
+                    char = match.group()
+                    index = match.end()
+                    if char == "\\":
+                        # Skip the escaped character, it might still be in the next chunk
+                        if index >= len(buf):
+                            index = more_from(match.start())
+                            continue
+                        index += 1
+                    elif char == "\"":
+                        in_string = not in_string
+                        if not in_string and depth == 0:
+                            return index
+                    elif char in "{[":
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            return index
+
+            def next_value():
+                nonlocal pos
+                end = value_end()
+                value, decoded_end = decoder.raw_decode(buf, pos)
+                if decoded_end != end:
+                    raise ValueError(f"Malformed JSON value in {path}")
+                pos = end
+                return value
+
+            def iter_members(parent):
+                nonlocal pos
+                if next_char() != "{":
+                    raise ValueError(f"{path} does not contain a JSON object")
+                pos += 1
+                if next_char() == "}":
+                    pos += 1
+                    return
+                while True:
+                    key = next_value()
+                    if next_char() != ":":
+                        raise ValueError(f"Malformed JSON object in {path}")
+                    pos += 1
+                    if parent is None and key in nested and next_char() == "{":
+                        yield from iter_members(key)
+                    else:
+                        yield (key if parent is None else (parent, key)), next_value()
+
+                    separator = next_char()
+                    pos += 1
+                    if separator == "}":
+                        return
+                    if separator != ",":
+                        raise ValueError(f"Malformed JSON object in {path}")
+
+            yield from iter_members(None)
+
+    @staticmethod
+    def dump(value: Any, f: TextIO, indent: Optional[int] = None) -> None:
+        f.write(JSONBoy.dumps(value, indent))
+
+    @staticmethod
+    def file_mode(path: str) -> int:
+        """
+        Permissions of an existing file at path, otherwise the default of a new file under the current umask.
+        """
+        if os.path.exists(path):
+            return stat.S_IMODE(os.stat(path).st_mode)
+        umask: int = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+    @staticmethod
+    @contextmanager
+    def atomic_open(path: str, mode: str = "w") -> Iterator[TextIO]:
+        directory: str = os.path.dirname(os.path.abspath(path))
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".",
+                                                      suffix=".tmp")
+        try:
+            # mkstemp creates the file with mode 0600, keep the permissions open() would have given it
+            os.fchmod(file_descriptor, JSONBoy.file_mode(path))
+            with os.fdopen(file_descriptor, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def dumps(value: Any, indent: Optional[int] = None, level: int = 0) -> str:
+        if indent is None:
+            if JSONBoy.backend == "orjson":
+                return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+            return json.dumps(value, separators=JSONBoy.compact_separators)
+        return json.dumps(value, indent=indent).replace("\n", "\n" + " " * (indent * level))
+
+    @staticmethod
+    def write_object(f: TextIO, items: Iterable[Tuple[str, Any]], indent: Optional[int] = None, level: int = 0) -> int:
+        """
+        Write the (key, value) pairs as one JSON object. Returns the number of written keys.
+        """
+        if indent is None:
+            opening, separator, key_separator, closing = "{", ",", ":", "}"
+        else:
+            inner: str = "\n" + " " * (indent * (level + 1))
+            opening, separator, key_separator, closing = "{" + inner, "," + inner, ": ", "\n" + " " * (indent * level) + "}"
+
+        count: int = 0
+        for key, value in items:
+            f.write(opening if count == 0 else separator)
+            f.write(JSONBoy.dumps(key) + key_separator)
+            if isinstance(value, Iterator):
+                JSONBoy.write_object(f, value, indent, level + 1)
+            else:
+                f.write(JSONBoy.dumps(value, indent, level + 1))
+            count += 1
+        f.write(closing if count > 0 else "{}")
+        return count
+
+    @staticmethod
+    def stream_data(assembly: Dict[str, Any], data_key: str = "data") -> Iterator[Tuple[str, Any]]:
+        """
+        Items of a result assembly with its per gene "data" object streamed gene by gene.
+        """
+        for key, value in assembly.items():
+            if key == data_key and isinstance(value, dict):
+                yield key, iter(value.items())
+            else:
+                yield key, value
+
+    @staticmethod
+    def save(path: str, items: Iterable[Tuple[str, Any]], indent: Optional[int] = None) -> int:
+        """
+        Atomically write the (key, value) pairs as JSON object to path. Returns the number of written keys.
+        """
+        with JSONBoy.atomic_open(path) as f:
+            return JSONBoy.write_object(f, items, indent)
@@ -0,0 +1,271 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.PassPath.PassPath import PassPath
+from Classes.ShardPlan.ShardPlan import ShardPlan
+
+
+class LibraryDB:
+    """
+    SQLite backend of a SPICE library (library.sqlite).
+
+    Genes, transcripts, protein sequences, pairwise FAS scores and domain architectures are stored in one
+    indexed file, so a single gene is read without parsing the JSON files of the whole library. A library
+    uses this backend if its paths.json has a "library_db" entry and the file exists; GeneAssembler.load and
+    the GeneAssembler.save_* methods then read and write the database instead of the JSON files, as do
+    restructure_anno.py and parse_domain_out.py for the architectures. Rows are read back in insertion
+    order, so exported JSON files keep the order of genes and transcripts.
+    """
+
+    file_name: str = "library.sqlite"
+
+    schema: List[str] = [
+        "CREATE TABLE IF NOT EXISTS genes (gene_id TEXT UNIQUE, name TEXT, chromosome TEXT, biotype TEXT, "
+        "info TEXT)",
+        "CREATE TABLE IF NOT EXISTS transcripts (gene_id TEXT, transcript_id TEXT, biotype TEXT, info TEXT, "
+        "UNIQUE (gene_id, transcript_id))",
+        "CREATE INDEX IF NOT EXISTS transcripts_id ON transcripts (transcript_id)",
+        "CREATE TABLE IF NOT EXISTS sequences (gene_id TEXT, protein_id TEXT, sequence TEXT, "
+        "UNIQUE (gene_id, protein_id))",
+        "CREATE INDEX IF NOT EXISTS sequences_id ON sequences (protein_id)",
+        "CREATE TABLE IF NOT EXISTS fas_scores (gene_id TEXT, seed TEXT, query TEXT, score REAL, "
+        "UNIQUE (gene_id, seed, query))",
+        "CREATE TABLE IF NOT EXISTS architectures (gene_id TEXT PRIMARY KEY, shard INTEGER, features TEXT, "
+        "paths TEXT)",
+    ]
+
+    def __init__(self, db_path: str):
+        self.db_path: str = db_path
+        self.connection = sqlite3.connect(db_path, timeout=600)
+        for statement in LibraryDB.schema:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    @staticmethod
+    def is_db_library(pass_path: PassPath) -> bool:
+        return "library_db" in pass_path and os.path.isfile(pass_path["library_db"])
+
+    @staticmethod
+    def library_db_path(library_dir: str) -> Optional[str]:
+        """
+        Path of the database of the library in library_dir, None if the library only has JSON files.
+        """
+        with open(os.path.join(library_dir, "paths.json"), "r") as f:
+            path_dict: Dict[str, str] = JSONBoy.load(f)
+        path_dict["root"] = library_dir
+        pass_path: PassPath = PassPath(path_dict)
+        return pass_path["library_db"] if LibraryDB.is_db_library(pass_path) else None
+
+    @staticmethod
+    def open_library(library_dir: str) -> Optional["LibraryDB"]:
+        db_path: Optional[str] = LibraryDB.library_db_path(library_dir)
+        return LibraryDB(db_path) if db_path is not None else None
+
+    def save_info(self, info_items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Replace genes and transcripts with the (gene_id, Gene.to_dict("info")) items.
+        """
+        self.connection.execute("DELETE FROM genes")
+        self.connection.execute("DELETE FROM transcripts")
+        for gene_id, info in info_items:
+            transcripts: Dict[str, Dict[str, Any]] = info["transcripts"]
+            gene_info: Dict[str, Any] = {key: value for key, value in info.items() if key != "transcripts"}
+            self.connection.execute("INSERT INTO genes VALUES (?, ?, ?, ?, ?)",
+                                    (gene_id, info["name"], info["chromosome"], info["biotype"],
+                                     JSONBoy.dumps(gene_info)))
+            self.connection.executemany("INSERT INTO transcripts VALUES (?, ?, ?, ?)",
+                                        [(gene_id, transcript_id, transcript["biotype"], JSONBoy.dumps(transcript))
+                                         for transcript_id, transcript in transcripts.items()])
+        self.connection.commit()
+
+    def save_seq(self, seq_items: Iterable[Tuple[str, Dict[str, str]]]) -> None:
+        self.connection.execute("DELETE FROM sequences")
+        for gene_id, sequences in seq_items:
+            self.connection.executemany("INSERT INTO sequences VALUES (?, ?, ?)",
+                                        [(gene_id, protein_id, sequence) for protein_id, sequence in sequences.items()])
+        self.connection.commit()
+
+    def save_fas(self, fas_items: Iterable[Tuple[str, Dict[str, Dict[str, float]]]]) -> None:
+        self.connection.execute("DELETE FROM fas_scores")
+        for gene_id, fas_dict in fas_items:
+            self.connection.executemany("INSERT INTO fas_scores VALUES (?, ?, ?, ?)",
+                                        [(gene_id, seed, query, score)
+                                         for seed, scores in fas_dict.items() for query, score in scores.items()])
+        self.connection.commit()
+
+    def get_gene_ids(self) -> List[str]:
+        return [gene_id for gene_id, in self.connection.execute("SELECT gene_id FROM genes ORDER BY rowid")]
+
+    def get_info(self, gene_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT info FROM genes WHERE gene_id = ?", (gene_id,)).fetchone()
+        if row is None:
+            return None
+        info: Dict[str, Any] = JSONBoy.loads(row[0])
+        info["transcripts"] = {transcript_id: JSONBoy.loads(transcript) for transcript_id, transcript in
+                               self.connection.execute("SELECT transcript_id, info FROM transcripts "
+                                                       "WHERE gene_id = ? ORDER BY rowid", (gene_id,))}
+        return info
+
+    def get_transcript(self, transcript_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT info FROM transcripts WHERE transcript_id = ?",
+                                      (transcript_id,)).fetchone()
+        return JSONBoy.loads(row[0]) if row is not None else None
+
+    def get_sequences(self, gene_id: str) -> Dict[str, str]:
+        return dict(self.connection.execute("SELECT protein_id, sequence FROM sequences WHERE gene_id = ? "
+                                            "ORDER BY rowid", (gene_id,)))
+
+    def get_sequence(self, protein_id: str) -> Optional[str]:
+        row = self.connection.execute("SELECT sequence FROM sequences WHERE protein_id = ?", (protein_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def get_fas_matrix(self, gene_id: str) -> Dict[str, Dict[str, float]]:
+        fas_dict: Dict[str, Dict[str, float]] = dict()
+        for seed, query, score in self.connection.execute("SELECT seed, query, score FROM fas_scores "
+                                                          "WHERE gene_id = ? ORDER BY rowid", (gene_id,)):
+            fas_dict.setdefault(seed, dict())[query] = score
+        return fas_dict
+
+    def iter_dicts(self) -> Iterable[Tuple[str, Dict[str, Any], Dict[str, str], Dict[str, Dict[str, float]]]]:
+        """
+        Yield (gene_id, info, sequences, FAS matrix) for all genes, the input of Gene.from_dict.
+        """
+        for gene_id in self.get_gene_ids():
+            yield gene_id, self.get_info(gene_id), self.get_sequences(gene_id), self.get_fas_matrix(gene_id)
+
+    def save_architectures(self, architecture_items: Iterable[Tuple[str, int, Dict[str, Any]]]) -> None:
+        """
+        Replace the architectures with the (gene_id, shard, features per protein) items of restructure_anno.py.
+        The feature paths are filled in afterwards by save_architecture_paths.
+        """
+        self.connection.execute("DELETE FROM architectures")
+        self.connection.executemany("INSERT INTO architectures VALUES (?, ?, ?, NULL)",
+                                    ((gene_id, shard, JSONBoy.dumps(features))
+                                     for gene_id, shard, features in architecture_items))
+        self.connection.commit()
+
+    def save_architecture_paths(self, path_items: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Set the feature paths per protein pair of parse_domain_out.py, None for a gene without paths.
+        """
+        self.connection.executemany("UPDATE architectures SET paths = ? WHERE gene_id = ?",
+                                    ((LibraryDB.dumps_optional(paths), gene_id) for gene_id, paths in path_items))
+        self.connection.commit()
+
+    def get_architecture_shards(self) -> Dict[str, int]:
+        """
+        Shard of every gene with an architecture, the "genes" entry of the architectures index.
+        """
+        return dict(self.connection.execute("SELECT gene_id, shard FROM architectures ORDER BY rowid"))
+
+    def get_architecture_features(self, shard: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Features per protein of the genes of a shard, the content of <shard>.json.
+        """
+        return {gene_id: JSONBoy.loads(features) for gene_id, features in
+                self.connection.execute("SELECT gene_id, features FROM architectures WHERE shard = ? "
+                                        "ORDER BY rowid", (shard,))}
+
+    def get_architecture(self, gene_id: str) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        (features per protein, feature paths per protein pair) of a gene.
+        """
+        row = self.connection.execute("SELECT features, paths FROM architectures WHERE gene_id = ?",
+                                      (gene_id,)).fetchone()
+        return (JSONBoy.loads(row[0]), LibraryDB.loads_optional(row[1])) if row is not None else None
+
+    @staticmethod
+    def dumps_optional(value: Any) -> Optional[str]:
+        return JSONBoy.dumps(value) if value is not None else None
+
+    @staticmethod
+    def loads_optional(value: Optional[str]) -> Any:
+        return JSONBoy.loads(value) if value is not None else None
+
+    def import_architectures(self, architectures_dir: str) -> int:
+        """
+        Store the architecture shards (index.json, <shard>.json and <shard>_paths.json) of a library.
+        Returns the number of stored genes.
+        """
+        index_path: str = os.path.join(architectures_dir, "index.json")
+        if not os.path.isfile(index_path):
+            return 0
+        shard_plan: ShardPlan = ShardPlan.load(index_path)
+        shards: List[List[str]] = shard_plan.get_shards()
+
+        def iter_features() -> Iterable[Tuple[str, int, Dict[str, Any]]]:
+            for shard, genes in enumerate(shards):
+                features: Dict[str, Dict[str, Any]] = LibraryDB.load_optional_json(
+                    os.path.join(architectures_dir, ShardPlan.get_shard_name(shard) + ".json"))
+                for gene_id in genes:
+                    if gene_id in features:
+                        yield gene_id, shard, features[gene_id]
+
+        self.save_architectures(iter_features())
+        for shard in range(len(shards)):
+            self.save_architecture_paths(LibraryDB.load_optional_json(
+                os.path.join(architectures_dir, ShardPlan.get_shard_name(shard) + "_paths.json")).items())
+        return len(shard_plan)
+
+    @staticmethod
+    def load_optional_json(path: str) -> Dict[str, Any]:
+        if not os.path.isfile(path):
+            return dict()
+        with open(path, "r", encoding="utf-8") as f:
+            return JSONBoy.load(f)
+
+    def export_architectures(self, architectures_dir: str) -> int:
+        """
+        Write the stored architectures back into the sharded layout. Returns the number of written genes.
+        The _paths.json files are only written if parse_domain_out.py stored feature paths.
+        """
+        shard_plan: ShardPlan = ShardPlan(self.get_architecture_shards())
+        if not len(shard_plan):
+            return 0
+        has_paths: bool = self.connection.execute("SELECT 1 FROM architectures WHERE paths IS NOT NULL "
+                                                  "LIMIT 1").fetchone() is not None
+        os.makedirs(architectures_dir, exist_ok=True)
+        for shard in range(shard_plan.get_file_count() + 1):
+            rows = list(self.connection.execute("SELECT gene_id, features, paths FROM architectures "
+                                                "WHERE shard = ? ORDER BY rowid", (shard,)))
+            shard_name: str = ShardPlan.get_shard_name(shard)
+            JSONBoy.save(os.path.join(architectures_dir, shard_name + ".json"),
+                         ((gene_id, JSONBoy.loads(features)) for gene_id, features, _ in rows))
+            if has_paths:
+                JSONBoy.save(os.path.join(architectures_dir, shard_name + "_paths.json"),
+                             ((gene_id, JSONBoy.loads(paths)) for gene_id, _, paths in rows if paths is not None))
+        JSONBoy.save(os.path.join(architectures_dir, "index.json"),
+                     [("genes", shard_plan.gene_shards), ("#files", shard_plan.get_file_count())])
+        return len(shard_plan)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,137 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import struct
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+
+class PairBoy:
+    """
+    Binary store of the isoform pairings of a library (transcript_pairings.bin).
+
+    Layout (little endian):
+        magic
+        one block per gene:  n_proteins, n_pairs (uint32)
+                             n_proteins x (header length (uint16), utf-8 protein header)
+                             n_pairs x (index_1, index_2) (uint32) into the gene's protein headers
+        index:               JSON object {gene_id: block offset}
+        trailer:             index offset (uint64), magic
+
+    The index is read once, afterwards the pairs of any gene are read with a single seek.
+    """
+
+    magic: bytes = b"SPICEPB1"
+    block_header = struct.Struct("<II")
+    header_length = struct.Struct("<H")
+    trailer = struct.Struct("<Q8s")
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.index: Dict[str, int] = dict()
+        self.load_index()
+
+    @staticmethod
+    def is_pairboy(path: str) -> bool:
+        with open(path, "rb") as f:
+            return f.read(len(PairBoy.magic)) == PairBoy.magic
+
+    @staticmethod
+    def write(path: str, gene_entries: Iterable[Tuple[str, List[str], List[Tuple[int, int]]]]) -> None:
+        """
+        Write (gene_id, protein_headers, index_pairs) entries one gene at a time.
+        """
+        index: Dict[str, int] = dict()
+        with open(path, "wb") as f:
+            f.write(PairBoy.magic)
+            for gene_id, headers, pairs in gene_entries:
+                index[gene_id] = f.tell()
+                f.write(PairBoy.block_header.pack(len(headers), len(pairs)))
+                for header in headers:
+                    encoded = header.encode("utf-8")
+                    f.write(PairBoy.header_length.pack(len(encoded)))
+                    f.write(encoded)
+                flat: List[int] = [i for pair in pairs for i in pair]
+                f.write(struct.pack("<%dI" % len(flat), *flat))
+            index_offset = f.tell()
+            f.write(JSONBoy.dumps(index).encode("utf-8"))
+            f.write(PairBoy.trailer.pack(index_offset, PairBoy.magic))
+
+    def load_index(self) -> None:
+        with open(self.path, "rb") as f:
+            if f.read(len(PairBoy.magic)) != PairBoy.magic:
+                raise ValueError(f"{self.path} is not a pairings store")
+            f.seek(-PairBoy.trailer.size, 2)
+            trailer_offset = f.tell()
+            index_offset, magic = PairBoy.trailer.unpack(f.read(PairBoy.trailer.size))
+            if magic != PairBoy.magic:
+                raise ValueError(f"{self.path} is truncated")
+            f.seek(index_offset)
+            self.index = JSONBoy.loads(f.read(trailer_offset - index_offset).decode("utf-8"))
+
+    @staticmethod
+    def read_block(f) -> Tuple[List[str], List[Tuple[int, int]]]:
+        n_proteins, n_pairs = PairBoy.block_header.unpack(f.read(PairBoy.block_header.size))
+        headers: List[str] = list()
+        for _ in range(n_proteins):
+            length, = PairBoy.header_length.unpack(f.read(PairBoy.header_length.size))
+            headers.append(f.read(length).decode("utf-8"))
+        flat = struct.unpack("<%dI" % (2 * n_pairs), f.read(8 * n_pairs))
+        return headers, list(zip(flat[0::2], flat[1::2]))
+
+    def get_gene_ids(self) -> List[str]:
+        return sorted(self.index, key=self.index.get)
+
+    def get_index_pairs(self, gene_id: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        with open(self.path, "rb") as f:
+            f.seek(self.index[gene_id])
+            return PairBoy.read_block(f)
+
+    def get_pairs(self, gene_id: str) -> List[Tuple[str, str]]:
+        headers, pairs = self.get_index_pairs(gene_id)
+        return [(headers[i], headers[j]) for i, j in pairs]
+
+    def write_tsv(self, gene_id: str, output_path: str) -> int:
+        """
+        Export the pairs of a gene in the tab separated format of fas.run --pairwise.
+        Returns the number of written pairs.
+        """
+        pairs = self.get_pairs(gene_id)
+        with open(output_path, "w") as f:
+            f.write("\n".join(header_1 + "\t" + header_2 for header_1, header_2 in pairs))
+        return len(pairs)
+
+    def __iter__(self) -> Iterator[Tuple[str, List[Tuple[str, str]]]]:
+        """
+        Yield (gene_id, [(header_1, header_2), ...]) for all genes in file order with one sequential read.
+        """
+        with open(self.path, "rb") as f:
+            for gene_id in self.get_gene_ids():
+                f.seek(self.index[gene_id])
+                headers, pairs = PairBoy.read_block(f)
+                yield gene_id, [(headers[i], headers[j]) for i, j in pairs]
+
+    def __contains__(self, gene_id: str) -> bool:
+        return gene_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
@@ -34,3 +34,6 @@ class PassPath:
             return self.path_dict["root"]
         else:
             return os.path.join(self.path_dict["root"], self.path_dict[item])
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.path_dict
@@ -20,11 +20,12 @@
 #
 #######################################################################
 
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, List, Optional, Set
 import hashlib
-import json
 import math
 import os
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.EWFDHandling.EWFDAssembler import EWFDAssembler
 
@@ -145,8 +146,11 @@ class ComparisonAssembler:
 
         self.comparison_gene_list: List[ComparisonGene] = list()
 
-        with open(os.path.join(result_pass_path["library_path"], "fas_data", "fas_index.json"), "r") as f:
-            self.fas_index: Dict[str, str] = json.load(f)
+        self.library_path: str = result_pass_path["library_path"]
+        self.fas_index: Dict[str, str] = dict()
+        if LibraryDB.library_db_path(self.library_path) is None:
+            with open(os.path.join(self.library_path, "fas_data", "fas_index.json"), "r") as f:
+                self.fas_index = JSONBoy.load(f)
 
         self.fas_scores_directory: str = os.path.join(result_pass_path["library_path"], "fas_data", "fas_scores")
 
@@ -167,20 +171,27 @@ class ComparisonAssembler:
 
     def compare_genes(self):
         with open(self.condition_1_path, "r") as f_1:
-            data_cond_1: Dict[str, Dict[str, List[Any]]] = json.load(f_1)["data"]
+            data_cond_1: Dict[str, Dict[str, List[Any]]] = JSONBoy.load(f_1)["data"]
 
         with open(self.condition_2_path, "r") as f_2:
-            data_cond_2: Dict[str, Dict[str, List[Any]]] = json.load(f_2)["data"]
+            data_cond_2: Dict[str, Dict[str, List[Any]]] = JSONBoy.load(f_2)["data"]
 
+        library_db: Optional[LibraryDB] = LibraryDB.open_library(self.library_path)
         for gene_id in data_cond_1.keys():
-            with open(os.path.join(self.fas_scores_directory, self.fas_index[gene_id]), "r") as f:
-                fas_adjacency_matrix: Dict[str, Dict[str, float]] = json.load(f)[gene_id]
+            fas_adjacency_matrix: Dict[str, Dict[str, float]]
+            if library_db is not None:
+                fas_adjacency_matrix = library_db.get_fas_matrix(gene_id)
+            else:
+                with open(os.path.join(self.fas_scores_directory, self.fas_index[gene_id]), "r") as f:
+                    fas_adjacency_matrix = JSONBoy.load(f)[gene_id]
             self.comparison_gene_list.append(ComparisonGene(gene_id,
                                                             data_cond_1[gene_id],
                                                             data_cond_2[gene_id],
                                                             self.biotype_filter,
                                                             self.tag_filter,
                                                             fas_adjacency_matrix))
+        if library_db is not None:
+            library_db.close()
 
     def sort_genes_by_rmsd(self):
         self.comparison_gene_list.sort(reverse=True)
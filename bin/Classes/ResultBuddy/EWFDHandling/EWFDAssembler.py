@@ -20,12 +20,12 @@
 #
 #######################################################################
 
-import json
 import math
 import numpy as np
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.ExpressionHandling.ConditionAssembler import ConditionAssembler
 from Classes.ResultBuddy.ExpressionHandling.ExpressionAssembler import ExpressionAssembler
@@ -157,13 +157,12 @@ class EWFDAssembler:
         else:
             self.ewfd_assembly: Dict[str, Any] = dict()
 
-    def save(self, output_path) -> None:
-        with open(output_path, "w") as f:
-            json.dump(self.ewfd_assembly, f, indent=4)
+    def save(self, output_path, indent: Optional[int] = None) -> None:
+        JSONBoy.save(output_path, JSONBoy.stream_data(self.ewfd_assembly), indent)
 
     def load(self, input_path) -> None:
         with open(input_path, "r") as f:
-            self.ewfd_assembly = json.load(f)
+            self.ewfd_assembly = JSONBoy.load(f)
 
     @staticmethod
     def calculate_ewfd(gene_fas_dists: Dict[str, Dict[str, float]],
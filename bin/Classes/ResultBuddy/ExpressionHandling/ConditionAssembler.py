@@ -20,11 +20,9 @@
 #
 #######################################################################
 
-import json
-import os
-
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.ExpressionHandling.ExpressionAssembler import ExpressionAssembler
 from Classes.SequenceHandling.Gene import Gene
@@ -78,13 +76,12 @@ class ConditionAssembler:
             self.condition_assembly["replicate_count"]: int = 0
             self.condition_assembly["data"]: Dict[str, Dict[str, Any]] = dict()
 
-    def save(self, output_path: str):
-        with open(output_path, "w") as f:
-            json.dump(self.condition_assembly, f, indent=4)
+    def save(self, output_path: str, indent: Optional[int] = None) -> None:
+        JSONBoy.save(output_path, JSONBoy.stream_data(self.condition_assembly), indent)
 
     def load(self, input_path: str):
         with open(input_path, "r") as f:
-            self.condition_assembly = json.load(f)
+            self.condition_assembly = JSONBoy.load(f)
 
     def insert_expression(self, expression_assembler: ExpressionAssembler):
         expr_assembly: Dict[str, Any] = expression_assembler.expression_assembly
@@ -120,19 +117,9 @@ class ConditionAssembler:
                 self.condition_assembly["data"][gene_id]["expression_rel_avg"][i] = rel_expr_avg
 
     def __load_gene_assembly(self) -> Dict[str, Gene]:
-        with open(self.library_pass_path["transcript_info"], "r") as f:
-            info_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        with open(self.library_pass_path["transcript_seq"], "r") as f:
-            seq_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        fas_dict: Dict[str, Dict[str, Any]] = dict()
-        with open(self.library_pass_path["fas_index"], "r") as f1:
-            fas_index: Dict[str, str] = json.load(f1)
-            for path in set(fas_index.values()):
-                with open(os.path.join(self.library_pass_path["fas_scores"], path), "r") as f2:
-                    fas_sub_dict: Dict[str, Dict[str, Any]] = json.load(f2)
-                    fas_dict.update(fas_sub_dict)
-        gene_assembly: Dict[str, Gene] = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
-        return gene_assembly
+        gene_assembler: GeneAssembler = GeneAssembler("", "")
+        gene_assembler.load(self.library_pass_path)
+        return gene_assembler.gene_assembly
 
     def cleanse_assembly(self):
         cleanse_dict: Dict[str, List[str]] = dict()
@@ -20,13 +20,13 @@
 #
 #######################################################################
 
-import json
 import os
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from tqdm import tqdm
 
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.PassPath.PassPath import PassPath
 from Classes.SequenceHandling.Gene import Gene
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
@@ -85,19 +85,9 @@ class ExpressionAssembler:
         return len(self.expression_assembly["data"])
 
     def __load_gene_assembly(self) -> Dict[str, Gene]:
-        with open(self.library_pass_path["transcript_info"], "r") as f:
-            info_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        with open(self.library_pass_path["transcript_seq"], "r") as f:
-            seq_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        fas_dict: Dict[str, Dict[str, Any]] = dict()
-        with open(self.library_pass_path["fas_index"], "r") as f1:
-            fas_index: Dict[str, str] = json.load(f1)
-            for path in set(fas_index.values()):
-                with open(os.path.join(self.library_pass_path["fas_scores"], path), "r") as f2:
-                    fas_sub_dict: Dict[str, Dict[str, Any]] = json.load(f2)
-                    fas_dict.update(fas_sub_dict)
-        gene_assembly: Dict[str, Gene] = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
-        return gene_assembly
+        gene_assembler: GeneAssembler = GeneAssembler("", "")
+        gene_assembler.load(self.library_pass_path)
+        return gene_assembler.gene_assembly
 
     def insert_expression_dict(self, insert_dict: Dict[str, Any]):
         gene_id: str = insert_dict["gene_id"]
@@ -158,13 +148,12 @@ class ExpressionAssembler:
 
     def load(self, input_path: str) -> None:
         with open(input_path, "r") as f:
-            self.expression_assembly = json.load(f)
+            self.expression_assembly = JSONBoy.load(f)
         with open(os.path.join(self.expression_assembly["library"], "paths.json"), "r") as f:
-            self.library_pass_path = PassPath(json.load(f))
+            self.library_pass_path = PassPath(JSONBoy.load(f))
 
-    def save(self, output_path: str) -> None:
-        with open(output_path, "w") as f:
-            json.dump(self.expression_assembly, f, indent=4)
+    def save(self, output_path: str, indent: Optional[int] = None) -> None:
+        JSONBoy.save(output_path, JSONBoy.stream_data(self.expression_assembly), indent)
 
     def __str__(self) -> str:
         return str(self.expression_assembly)
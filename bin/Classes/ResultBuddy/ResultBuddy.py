@@ -21,13 +21,13 @@
 #######################################################################
 
 import os
-import json
 
 from typing import Dict, Any, List
 
 from tqdm import tqdm
 
 from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.ComparisonHandling.ComparisonAssembler import ComparisonAssembler
 from Classes.ResultBuddy.ExpressionHandling.ConditionAssembler import ConditionAssembler
@@ -46,7 +46,7 @@ class ResultBuddy:
     def __init__(self, library_path: str, output_path: str, initial_flag: bool = False, suffix: str = ""):
         self.library_path: str = library_path
         with open(os.path.join(library_path, "paths.json"), "r") as f:
-            self.library_pass_path: PassPath = PassPath(json.load(f))
+            self.library_pass_path: PassPath = PassPath(JSONBoy.load(f))
         library_info: LibraryInfo = LibraryInfo(self.library_pass_path["info"])
         species: str = library_info["info"]["species"]
         release: str = library_info["info"]["release"]
@@ -94,16 +94,16 @@ class ResultBuddy:
 
     def __load_info(self) -> Dict[str, Any]:
         with open(os.path.join(self.result_path, "info.json"), "r") as f:
-            result_info: Dict[str, Any] = json.load(f)
+            result_info: Dict[str, Any] = JSONBoy.load(f)
         return result_info
 
     def __save_info(self) -> None:
         with open(os.path.join(self.result_path, "info.json"), "w") as f:
-            json.dump(self.result_info, f, indent=4)
+            JSONBoy.dump(self.result_info, f, indent=4)
 
     def __load_paths(self) -> Dict[str, Any]:
         with open(os.path.join(self.result_path, "paths.json"), "r") as f:
-            result_paths: Dict[str, Any] = json.load(f)
+            result_paths: Dict[str, Any] = JSONBoy.load(f)
         return result_paths
 
     def generate_ewfd_file(self, name: str, condition_flag: bool = False):
@@ -21,7 +21,8 @@
 #######################################################################
 
 
-from typing import List, Dict, Any
+from itertools import combinations
+from typing import List, Dict, Any, Iterator, Tuple
 
 from Classes.SequenceHandling.Transcript import Transcript
 from Classes.SequenceHandling.Protein import Protein
@@ -261,14 +262,31 @@ class Gene:
                 if key_x == key_y:
                     self.fas_dict[key_x][key_y] = 1.0
 
-    def make_pairings(self) -> str:
+    def get_pairing_indices(self) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Headers of all proteins without FAS scores and every unordered pair of them that still lacks a
+        score as index pair i < j. Each header is built once per protein.
+        """
         protein_list: List[Protein] = self.get_proteins(False, True)
-        row_list: List[str] = list()
-        for protein_1 in protein_list:
-            for protein_2 in protein_list:
-                if protein_1 != protein_2 and protein_2.make_header_pair(protein_1) not in row_list:
-                    row_list.append(protein_1.make_header_pair(protein_2))
-        return "\n".join(row_list)
+        headers: List[str] = [protein.make_header() for protein in protein_list]
+        ids: List[str] = [protein.get_id() for protein in protein_list]
+        pairs: List[Tuple[int, int]] = [
+            (i, j) for i, j in combinations(range(len(protein_list)), 2)
+            if protein_list[i] != protein_list[j] and -1 in (self.fas_dict[ids[i]].get(ids[j]),
+                                                             self.fas_dict[ids[j]].get(ids[i]))
+        ]
+        return headers, pairs
+
+    def iter_pairings(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yield every unordered pair of proteins without FAS scores as (header_1, header_2).
+        """
+        headers, pairs = self.get_pairing_indices()
+        for i, j in pairs:
+            yield headers[i], headers[j]
+
+    def make_pairings(self) -> str:
+        return "\n".join(header_1 + "\t" + header_2 for header_1, header_2 in self.iter_pairings())
 
     def __eq__(self, other):
         if isinstance(other, Gene):
@@ -22,14 +22,16 @@
 #######################################################################
 
 from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
 from Classes.PassPath.PassPath import PassPath
 from Classes.SequenceHandling.Gene import Gene
 from Classes.SequenceHandling.Transcript import Transcript
 from Classes.SequenceHandling.Protein import Protein
+from Classes.ShardPlan.ShardPlan import ShardPlan
 import os
 from tqdm import tqdm
-import json
-from typing import List, Dict, Any, Set, Iterator, Tuple
+from typing import List, Dict, Any, Set, Iterator, Optional, Tuple
 
 
 class GeneAssembler:
@@ -70,42 +72,79 @@ class GeneAssembler:
     def update_inclusion_filter(self, key: str, possible_values: List[str]) -> None:
         self.inclusion_filter_dict.update({key: possible_values})
 
-    def save_fas(self, pass_path: PassPath) -> None:
+    def save_fas(self, pass_path: PassPath, indent: Optional[int] = None) -> None:
+        if LibraryDB.is_db_library(pass_path):
+            with LibraryDB(pass_path["library_db"]) as library_db:
+                library_db.save_fas(GeneAssembler.to_dict_iter(self.gene_assembly, "fas"))
+            return
+        shard_plan_path: Optional[str] = pass_path["fas_shard_plan"] if "fas_shard_plan" in pass_path else None
+        shard_plan: ShardPlan = ShardPlan.load_or_build(shard_plan_path, self.get_isoform_counts())
+        if shard_plan_path is not None:
+            shard_plan.save(shard_plan_path)
         index_dict: Dict[str, str] = dict()
-        for index, index_sub_dict, entry_dict in GeneAssembler.fas_to_dict_iter(self.gene_assembly):
+        for index, index_sub_dict, entry_dict in GeneAssembler.fas_to_dict_iter(self.gene_assembly, shard_plan):
             index_dict.update(index_sub_dict)
-            with open(os.path.join(pass_path["fas_scores"], index), "w") as f:
-                json.dump(entry_dict, f, indent=4)
-        with open(pass_path["fas_index"], "w") as f:
-            json.dump(index_dict, f, indent=4)
-
-    def save_info(self, pass_path: PassPath) -> None:
-        json_dict: Dict[str, Dict[str, Any]] = GeneAssembler.to_dict(self.gene_assembly, "info")
-        with open(pass_path["transcript_info"], "w") as f:
-            json.dump(json_dict, f, indent=4)
-
-    def save_seq(self, pass_path: PassPath) -> None:
-        json_dict: Dict[str, Dict[str, Any]] = GeneAssembler.to_dict(self.gene_assembly, "seq")
-        with open(pass_path["transcript_seq"], "w") as f:
-            json.dump(json_dict, f, indent=4)
+            JSONBoy.save(os.path.join(pass_path["fas_scores"], index), entry_dict.items(), indent)
+        JSONBoy.save(pass_path["fas_index"], index_dict.items(), indent)
+
+    def save_info(self, pass_path: PassPath, indent: Optional[int] = None) -> None:
+        if LibraryDB.is_db_library(pass_path):
+            with LibraryDB(pass_path["library_db"]) as library_db:
+                library_db.save_info(GeneAssembler.to_dict_iter(self.gene_assembly, "info"))
+            return
+        JSONBoy.save(pass_path["transcript_info"], GeneAssembler.to_dict_iter(self.gene_assembly, "info"), indent)
+
+    def save_seq(self, pass_path: PassPath, indent: Optional[int] = None) -> None:
+        if LibraryDB.is_db_library(pass_path):
+            with LibraryDB(pass_path["library_db"]) as library_db:
+                library_db.save_seq(GeneAssembler.to_dict_iter(self.gene_assembly, "seq"))
+            return
+        JSONBoy.save(pass_path["transcript_seq"], GeneAssembler.to_dict_iter(self.gene_assembly, "seq"), indent)
 
     def load(self, pass_path: PassPath) -> None:
+        if LibraryDB.is_db_library(pass_path):
+            info_dict: Dict[str, Dict[str, Any]] = dict()
+            seq_dict: Dict[str, Dict[str, Any]] = dict()
+            fas_dict: Dict[str, Dict[str, Any]] = dict()
+            with LibraryDB(pass_path["library_db"]) as library_db:
+                for gene_id, info, sequences, fas_matrix in library_db.iter_dicts():
+                    info_dict[gene_id], seq_dict[gene_id], fas_dict[gene_id] = info, sequences, fas_matrix
+            self.gene_assembly = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
+            return
         with open(pass_path["transcript_info"], "r") as f:
-            info_dict: Dict[str, Dict[str, Any]] = json.load(f)
+            info_dict: Dict[str, Dict[str, Any]] = JSONBoy.load(f)
         with open(pass_path["transcript_seq"], "r") as f:
-            seq_dict: Dict[str, Dict[str, Any]] = json.load(f)
+            seq_dict: Dict[str, Dict[str, Any]] = JSONBoy.load(f)
         fas_dict: Dict[str, Dict[str, Any]] = dict()
         with open(pass_path["fas_index"], "r") as f1:
-            fas_index: Dict[str, str] = json.load(f1)
+            fas_index: Dict[str, str] = JSONBoy.load(f1)
             for path in set(fas_index.values()):
                 with open(os.path.join(pass_path["fas_scores"], path), "r") as f2:
-                    fas_sub_dict: Dict[str, Dict[str, Any]] = json.load(f2)
+                    fas_sub_dict: Dict[str, Dict[str, Any]] = JSONBoy.load(f2)
                     fas_dict.update(fas_sub_dict)
         self.gene_assembly = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
 
+    @staticmethod
+    def load_gene(pass_path: PassPath, gene_id: str) -> Optional[Gene]:
+        """
+        Load a single gene. Libraries with a database read only the rows of this gene.
+        """
+        if LibraryDB.is_db_library(pass_path):
+            with LibraryDB(pass_path["library_db"]) as library_db:
+                info: Optional[Dict[str, Any]] = library_db.get_info(gene_id)
+                if info is None:
+                    return None
+                gene_assembly: Dict[str, Gene] = GeneAssembler.from_dict({gene_id: info},
+                                                                         {gene_id: library_db.get_sequences(gene_id)},
+                                                                         {gene_id: library_db.get_fas_matrix(gene_id)})
+            return gene_assembly[gene_id]
+        gene_assembler: GeneAssembler = GeneAssembler("", "")
+        gene_assembler.load(pass_path)
+        return gene_assembler.gene_assembly.get(gene_id)
+
     def integrate_fas_json(self, input_path: str) -> None:
         with open(input_path, "r") as f:
-            distance_dict: Dict[str, Dict[str, Dict[str, float]]] = json.load(f)
+            distance_dict: Dict[str, Dict[str, Dict[str, float]]] = JSONBoy.load(f)
         count: int = 0
         for key_gene_id in tqdm(distance_dict.keys(),
                                 ncols=100,
@@ -218,6 +257,20 @@ class GeneAssembler:
             if len(gene.get_proteins()) == 0:
                 del self.gene_assembly[gene.get_id()]
 
+    def get_isoform_counts(self) -> List[Tuple[str, int]]:
+        """
+        (gene_id, protein count) of all genes, the input of the shard plan.
+        """
+        return GeneAssembler.isoform_counts(self.gene_assembly)
+
+    @staticmethod
+    def isoform_counts(gene_assembly: Dict[str, Gene]) -> List[Tuple[str, int]]:
+        """
+        (gene_id, protein count) of the genes. Every producer of shard files sizes its genes with this count,
+        so a gene missing in the stored plan gets the same shard in fas_scores/ and architectures/.
+        """
+        return [(key, len(gene.get_proteins())) for key, gene in gene_assembly.items()]
+
     def get_gene_count(self) -> int:
         return len(self.gene_assembly.keys())
 
@@ -247,24 +300,23 @@ class GeneAssembler:
             gene.reset_fas()
 
     @staticmethod
-    def fas_to_dict_iter(gene_assembly: Dict[str, Gene]) -> Iterator[List[Tuple[str, Dict[str, str], Dict[str, Dict[str, Any]]]]]:
-        json_dict: Dict[str, Dict[str, Any]] = dict()
-        index_dict: Dict[str, str] = dict()
-        count: int = 0
-        reset_count: int = 0
+    def fas_to_dict_iter(gene_assembly: Dict[str, Gene],
+                         shard_plan: Optional[ShardPlan] = None) -> Iterator[Tuple[str, Dict[str, str], Dict[str, Dict[str, Any]]]]:
+        """
+        Yield (shard file name, {gene_id: shard file name}, {gene_id: FAS matrix}) for every shard of the plan.
+        Without a plan, one is built from the isoform counts of the genes.
+        """
+        if shard_plan is None:
+            shard_plan = ShardPlan.build(GeneAssembler.isoform_counts(gene_assembly))
+        else:
+            shard_plan.extend(GeneAssembler.isoform_counts(gene_assembly))
 
-        for key in gene_assembly.keys():
-            json_dict[key] = gene_assembly[key].to_dict("fas")
-            index_dict[key] = "0" * (9 - len(str(count))) + str(count) + ".json"
-            reset_count += 1
-            if reset_count == 100:
-                yield "0" * (9 - len(str(count))) + str(count) + ".json", index_dict, json_dict
-                reset_count = 0
-                json_dict: Dict[str, Dict[str, Any]] = dict()
-                index_dict: Dict[str, str] = dict()
-                count += 1
-        if len(json_dict) > 0:
-            yield "0" * (9 - len(str(count))) + str(count) + ".json", index_dict, json_dict
+        for shard, gene_ids in enumerate(shard_plan.get_shards()):
+            file_name: str = ShardPlan.get_shard_name(shard) + ".json"
+            json_dict: Dict[str, Dict[str, Any]] = {key: gene_assembly[key].to_dict("fas")
+                                                    for key in gene_ids if key in gene_assembly}
+            if len(json_dict) > 0:
+                yield file_name, {key: file_name for key in json_dict}, json_dict
 
     @staticmethod
     def to_dict(gene_assembly: Dict[str, Gene], mode: str) -> Dict[str, Dict[str, Any]]:
@@ -273,6 +325,14 @@ class GeneAssembler:
             json_dict[key] = gene_assembly[key].to_dict(mode)
         return json_dict
 
+    @staticmethod
+    def to_dict_iter(gene_assembly: Dict[str, Gene], mode: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield the dictionaries of to_dict one gene at a time for streaming them to disk.
+        """
+        for key in gene_assembly.keys():
+            yield key, gene_assembly[key].to_dict(mode)
+
     @staticmethod
     def from_dict(info_dict: Dict[str, Dict[str, Any]],
                   seq_dict: Dict[str, Dict[str, Any]],
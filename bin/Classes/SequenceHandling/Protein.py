@@ -24,6 +24,7 @@
 from Classes.SequenceHandling.Transcript import Transcript
 from Classes.GTFBoy.GTFBoy import GTFBoy
 
+import hashlib
 from typing import List, Dict, Any
 
 
@@ -61,6 +62,13 @@ class Protein(Transcript):
     def get_sequence(self) -> str:
         return self.sequence
 
+    def get_sequence_hash(self) -> str:
+        return Protein.hash_sequence(self.sequence)
+
+    @staticmethod
+    def hash_sequence(sequence: str) -> str:
+        return hashlib.sha256(sequence.encode("utf-8")).hexdigest()
+
     def from_dict(self, input_dict: Dict[str, Any]) -> None:
         self.set_id(input_dict["_id"])
         self.set_sequence(input_dict["sequence"])
@@ -0,0 +1,140 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+
+class ShardPlan:
+    """
+    Assignment of genes to the numbered shard files of a library (fas_scores/ and architectures/).
+
+    The FAS matrix and the domain paths of a gene grow with the square of its isoform count, so shards are
+    filled up to a target size estimated from the isoform counts instead of a fixed number of genes. Genes
+    keep their order and a gene is never split. The plan is stored as fas_data/shard_plan.json in the
+    format of the architectures index ({"genes": {gene_id: shard}, "#files": last shard}) plus the target
+    size, so every producer of shard files writes the same gene into the same shard number.
+    """
+
+    default_target_bytes: int = 1048576
+    # Estimated bytes per ordered isoform pair and per gene in the JSON shards
+    pair_bytes: int = 64
+    gene_bytes: int = 256
+
+    def __init__(self, gene_shards: Dict[str, int], target_bytes: int = default_target_bytes, file_count: int = 0):
+        self.gene_shards: Dict[str, int] = gene_shards
+        self.target_bytes: int = target_bytes
+        self.file_count: int = file_count
+
+    @staticmethod
+    def estimate_bytes(isoform_count: int) -> int:
+        return ShardPlan.pair_bytes * isoform_count * isoform_count + ShardPlan.gene_bytes
+
+    @staticmethod
+    def build(gene_isoforms: Iterable[Tuple[str, int]], target_bytes: int = default_target_bytes,
+              max_genes: Optional[int] = None) -> "ShardPlan":
+        """
+        Fill shards in gene order until the next gene would exceed target_bytes (or max_genes genes).
+        A single gene larger than the target gets a shard of its own.
+        """
+        shard_plan: ShardPlan = ShardPlan(dict(), target_bytes)
+        shard_plan.extend(gene_isoforms, max_genes)
+        return shard_plan
+
+    def extend(self, gene_isoforms: Iterable[Tuple[str, int]], max_genes: Optional[int] = None) -> None:
+        """
+        Append genes that are not part of the plan yet after the last shard.
+        """
+        shard: int = self.get_file_count() + 1 if self.gene_shards or self.file_count else 0
+        shard_size: int = 0
+        shard_genes: int = 0
+        for gene_id, isoform_count in gene_isoforms:
+            if gene_id in self.gene_shards:
+                continue
+            gene_size: int = ShardPlan.estimate_bytes(isoform_count)
+            full: bool = (shard_size + gene_size > self.target_bytes
+                          or (max_genes is not None and shard_genes >= max_genes))
+            if shard_genes > 0 and full:
+                shard += 1
+                shard_size, shard_genes = 0, 0
+            self.gene_shards[gene_id] = shard
+            shard_size += gene_size
+            shard_genes += 1
+
+    @staticmethod
+    def load(path: str) -> "ShardPlan":
+        """
+        Read a shard plan or an architectures index.json.
+        """
+        with open(path, "r") as f:
+            plan: Dict[str, object] = JSONBoy.load(f)
+        return ShardPlan(plan["genes"], plan.get("target_bytes", ShardPlan.default_target_bytes), plan.get("#files", 0))
+
+    @staticmethod
+    def load_or_build(path: Optional[str], gene_isoforms: List[Tuple[str, int]],
+                      target_bytes: Optional[int] = None) -> "ShardPlan":
+        """
+        Reuse the plan at path and append new genes, or build a new plan. A given target_bytes that differs
+        from the stored one rebuilds the plan.
+        """
+        if path is not None and os.path.isfile(path):
+            shard_plan: ShardPlan = ShardPlan.load(path)
+            if target_bytes is None or target_bytes == shard_plan.target_bytes:
+                current_genes = {gene_id for gene_id, _ in gene_isoforms}
+                if all(gene_id in current_genes for gene_id in shard_plan.gene_shards):
+                    shard_plan.extend(gene_isoforms)
+                    return shard_plan
+                target_bytes = shard_plan.target_bytes
+        return ShardPlan.build(gene_isoforms, target_bytes or ShardPlan.default_target_bytes)
+
+    def save(self, path: str) -> None:
+        JSONBoy.save(path, [("genes", self.gene_shards), ("#files", self.get_file_count()),
+                            ("target_bytes", self.target_bytes)])
+
+    def get_shard(self, gene_id: str) -> int:
+        return self.gene_shards[gene_id]
+
+    def get_file_count(self) -> int:
+        """
+        Index of the last shard, the "#files" entry of the architectures index.
+        """
+        return max(max(self.gene_shards.values()) if self.gene_shards else 0, self.file_count)
+
+    def get_shards(self) -> List[List[str]]:
+        """
+        Genes of every shard, indexed by shard number.
+        """
+        shards: List[List[str]] = [list() for _ in range(self.get_file_count() + 1)]
+        for gene_id, shard in self.gene_shards.items():
+            shards[shard].append(gene_id)
+        return shards
+
+    @staticmethod
+    def get_shard_name(shard: int) -> str:
+        return str(shard).rjust(9, "0")
+
+    def __contains__(self, gene_id: str) -> bool:
+        return gene_id in self.gene_shards
+
+    def __len__(self) -> int:
+        return len(self.gene_shards)
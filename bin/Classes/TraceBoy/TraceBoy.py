@@ -0,0 +1,80 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import re
+from typing import Iterator, Dict, List
+
+
+class TraceBoy:
+    """
+    Reader for Nextflow execution traces (pipeline_info/execution_trace_*.txt).
+
+    Each row is returned as a dictionary keyed by the trace header. Task names look like
+    'BIONF_SPICE_LIBRARY_PIPELINE:SPICE_LIBRARY_PIPELINE:FAS_SCORING (partition_3)', the part in
+    parentheses is the task tag.
+    """
+
+    duration_units: Dict[str, float] = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0, "d": 86400.0}
+    name_pattern = re.compile(r"^(?P<process>[^ ]+)(?: \((?P<tag>.*)\))?$")
+
+    def __init__(self, trace_path: str):
+        self.trace_path: str = trace_path
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        with open(self.trace_path, "r") as f:
+            header: List[str] = next(f).rstrip("\n").split("\t")
+            for line in f:
+                if not line.strip():
+                    continue
+                yield dict(zip(header, line.rstrip("\n").split("\t")))
+
+    def get_task_runtimes(self, process_name: str, field: str = "realtime") -> Dict[str, float]:
+        """
+        Collect the runtime in seconds of every successfully completed task of a process, keyed by task tag.
+        If a tag was retried, the last completed attempt wins.
+        """
+        runtimes: Dict[str, float] = dict()
+        for row in self:
+            if row.get("status") not in ("COMPLETED", "CACHED"):
+                continue
+            match = TraceBoy.name_pattern.match(row.get("name", ""))
+            if match is None or match.group("process").split(":")[-1] != process_name:
+                continue
+            if match.group("tag") is None:
+                continue
+            runtime = TraceBoy.parse_duration(row.get(field, "-"))
+            if runtime is not None:
+                runtimes[match.group("tag")] = runtime
+        return runtimes
+
+    @staticmethod
+    def parse_duration(duration: str):
+        """
+        Convert a Nextflow duration such as '1h 2m 3s', '11.3s' or '688ms' into seconds.
+        Returns None for missing values ('-').
+        """
+        duration = duration.strip()
+        if duration in ("", "-"):
+            return None
+        total: float = 0.0
+        for value, unit in re.findall(r"([\d.]+)\s*(ms|s|m|h|d)", duration):
+            total += float(value) * TraceBoy.duration_units[unit]
+        return total
@@ -23,10 +23,11 @@
 #   - Adapted by Felix Haidle in 2025 for integration into spice_library_pipeline.
 #######################################################################
 
-import json
 import os
 from typing import Dict, Any, List
 
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.PairBoy.PairBoy import PairBoy
 from Classes.PassPath.PassPath import PassPath
 from Classes.ReduxArgParse.ReduxArgParse import ReduxArgParse
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
@@ -39,7 +40,7 @@ def main():
     Multipurpose CLI for handling FAS-related gene annotations.
 
     Modes supported:
-    - unpack: Extract a specific gene's pairing info from JSON and save to TSV
+    - unpack: Extract a specific gene's pairing info from the pairings store and save to TSV
     - delete: Delete all FAS-related intermediate files for a gene
     - concat: Append gene-specific results into global annotation files
     - integrate: Integrate per-gene FAS scores into the full library assembly
@@ -50,7 +51,7 @@ def main():
         ["store", "store", "store", "store", "store"],
         [None, None, None, None, None],
         [
-            "Path to the pairings TSV.",
+            "Path to the pairings store (transcript_pairings.bin or legacy transcript_pairings.json).",
             "Gene ID to operate on.",
             "Directory where gene-specific FAS results are stored.",
             "Operation to perform: 'unpack', 'concat', 'delete', or 'integrate'.",
@@ -65,17 +66,26 @@ def main():
     mode = argument_dict['mode']
 
     if mode == "unpack":
-        # Extract a specific gene's pairing from JSON and write to file
-        with open(argument_dict["pairings_path"], "r") as f:
-            json_data = json.load(f)
-
+        # Extract a specific gene's pairing from the pairings store and write to file
         gene_id = argument_dict['gene_id']
-        if gene_id not in json_data:
-            print(f"Gene ID '{gene_id}' not found in JSON. Skipping...")
+        output_path = os.path.join(argument_dict["out_dir"], f"{gene_id}.tsv")
+
+        if PairBoy.is_pairboy(argument_dict["pairings_path"]):
+            pair_boy = PairBoy(argument_dict["pairings_path"])
+            if gene_id not in pair_boy:
+                print(f"Gene ID '{gene_id}' not found in pairings store. Skipping...")
+            else:
+                pair_boy.write_tsv(gene_id, output_path)
         else:
-            output_path = os.path.join(argument_dict["out_dir"], f"{gene_id}.tsv")
-            with open(output_path, "w") as f:
-                f.write(json_data[gene_id])
+            # Libraries created before the binary store keep their pairings in JSON
+            with open(argument_dict["pairings_path"], "r") as f:
+                json_data = JSONBoy.load(f)
+
+            if gene_id not in json_data:
+                print(f"Gene ID '{gene_id}' not found in JSON. Skipping...")
+            else:
+                with open(output_path, "w") as f:
+                    f.write(json_data[gene_id])
 
     elif mode == "delete":
         # Remove all temporary/intermediate FAS files for this gene
@@ -117,7 +127,7 @@ def main():
         # Load gene library and inject FAS scores into its internal structure
         lib_path_dir = os.path.join("/".join(argument_dict["anno_dir"].split("/")[:-1]), "paths.json")
         with open(lib_path_dir, "r") as f:
-            path_dict = json.load(f)
+            path_dict = JSONBoy.load(f)
 
         pass_path = PassPath(path_dict)
         lib_info = LibraryInfo(pass_path["info"])
@@ -0,0 +1,168 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import os
+
+from Classes.FASCache.AnnotationCache import AnnotationCache
+from Classes.FASCache.FASCache import FASCache
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+
+def write_fasta_subset(fasta_path, headers, output_path):
+    """
+    Copy the entries of the given headers from fasta_path to output_path.
+    Returns the number of written sequences.
+    """
+    written = 0
+    keep = False
+    with open(fasta_path, "r") as f_in, open(output_path, "w") as f_out:
+        for line in f_in:
+            if line.startswith(">"):
+                keep = line[1:].strip() in headers
+                written += keep
+            if keep:
+                f_out.write(line)
+    return written
+
+
+def prepare(fasta_path, cache_path, config_key, reduced_fasta, cached_json, carried_json="", tool_versions=None):
+    """
+    Look up all sequences of fasta_path in the cache (if cache_path is given) and in the annotations
+    carried over from a previous library (carried_json of finish_setup.py, only used if they were made
+    with tool_versions). Found annotations are written to cached_json, all remaining sequences to
+    reduced_fasta for fas.doAnno.
+    """
+    hashes = FASCache.hash_fasta(fasta_path)
+    cached = AnnotationCache.merge({"feature": dict()}, dict())
+    if cache_path:
+        with AnnotationCache(cache_path, config_key) as anno_cache:
+            cached = anno_cache.lookup(hashes)
+    cache_count = len(cached["feature"])
+    if carried_json and os.path.isfile(carried_json):
+        with open(carried_json, "r") as f:
+            carried = JSONBoy.load(f)
+        if carried.get("version", dict()) == (tool_versions or dict()):
+            carried["feature"] = {header: entry for header, entry in carried["feature"].items() if header in hashes}
+            cached = AnnotationCache.merge(carried, cached)
+        else:
+            print(f"Annotations in {carried_json} were made with other tool versions and are not reused")
+    uncached = set(hashes) - set(cached["feature"])
+    write_fasta_subset(fasta_path, uncached, reduced_fasta)
+    with open(cached_json, "w") as f:
+        JSONBoy.dump(cached, f)
+    print(f"{cache_count} of {len(hashes)} sequences found in the annotation cache {cache_path or '(none)'}, "
+          f"{len(cached['feature']) - cache_count} carried over, {len(uncached)} left to annotate")
+
+
+def merge(fasta_path, cache_path, config_key, cached_json, fresh_json, output_path):
+    """
+    Combine cached and fresh annotations into output_path and add the fresh annotations to the cache
+    (if cache_path is given). fresh_json may be missing if all sequences were cached.
+    """
+    with open(cached_json, "r") as f:
+        cached = JSONBoy.load(f)
+    fresh = dict()
+    if fresh_json and os.path.isfile(fresh_json):
+        with open(fresh_json, "r") as f:
+            fresh = JSONBoy.load(f)
+
+    # Update the cache first, it refuses annotations of other tool versions than the cached ones
+    added = 0
+    if fresh and cache_path:
+        with AnnotationCache(cache_path, config_key) as anno_cache:
+            added = anno_cache.add(fresh, FASCache.hash_fasta(fasta_path))
+
+    merged = AnnotationCache.merge(cached, fresh)
+    with open(output_path, "w") as f:
+        JSONBoy.dump(merged, f)
+    print(f"Merged {len(cached['feature'])} cached and {len(fresh.get('feature', dict()))} fresh annotations "
+          f"into {output_path}, added {added} sequences to the annotation cache")
+
+
+def add(fasta_path, cache_path, config_key, annotations_json):
+    """
+    Add an existing annotations.json (e.g. of a previous library) to the cache.
+    """
+    with open(annotations_json, "r") as f:
+        annotations = JSONBoy.load(f)
+    with AnnotationCache(cache_path, config_key) as anno_cache:
+        added = anno_cache.add(annotations, FASCache.hash_fasta(fasta_path))
+    print(f"Added {added} sequences to the annotation cache {cache_path}")
+
+
+def read_tool_versions(annotations_json):
+    """
+    Tool versions ("version" entry) of an annotations.json, e.g. of a fas.doAnno run on a single sequence.
+    """
+    with open(annotations_json, "r") as f:
+        return JSONBoy.load(f).get("version", dict())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Content-addressed cache of fas.doAnno results, so only new sequences are annotated")
+    parser.add_argument("mode", choices=["prepare", "merge", "add"],
+                        help="prepare: split the FASTA into cached and uncached sequences, "
+                             "merge: combine cached and fresh annotations and update the cache, "
+                             "add: add an existing annotations.json to the cache")
+    parser.add_argument("--fasta", required=True, help="FASTA file with the annotated sequences")
+    parser.add_argument("--cache", default="",
+                        help="Annotation cache SQLite file, created if missing. prepare and merge work without a "
+                             "cache if only --carried_json is used")
+    parser.add_argument("--anno_tools_file", required=True, help="Annotation tools file passed to fas.doAnno")
+    parser.add_argument("--options", default="", help="fas.doAnno options that are part of the cache key")
+    parser.add_argument("--versions_json", default="",
+                        help="prepare, merge: annotations.json written by the installed annotation tools (e.g. for "
+                             "a single sequence), its tool versions are part of the cache key")
+    parser.add_argument("--reduced_fasta", default="reduced.fasta",
+                        help="prepare: output FASTA with the sequences missing in the cache")
+    parser.add_argument("--carried_json", default="",
+                        help="prepare: carried_annotations.json of finish_setup.py --previous_library")
+    parser.add_argument("--cached_json", default="cached_annotations.json",
+                        help="prepare: output, merge: input with the cached annotations")
+    parser.add_argument("--fresh_json", default="", help="merge: annotations.json of the reduced FASTA")
+    parser.add_argument("--output", default="annotations.json", help="merge: merged annotations.json")
+    parser.add_argument("--annotations", default="", help="add: annotations.json to add to the cache")
+    args = parser.parse_args()
+
+    if args.mode == "add":
+        if not args.cache:
+            parser.error("add requires --cache")
+        if not args.annotations:
+            parser.error("add requires --annotations")
+        tool_versions = read_tool_versions(args.annotations)
+    else:
+        if not args.versions_json:
+            parser.error(f"{args.mode} requires --versions_json")
+        tool_versions = read_tool_versions(args.versions_json)
+    config_key = AnnotationCache.make_config_key(args.anno_tools_file, args.options, tool_versions)
+    if args.mode == "prepare":
+        prepare(args.fasta, args.cache, config_key, args.reduced_fasta, args.cached_json, args.carried_json,
+                tool_versions)
+    elif args.mode == "merge":
+        merge(args.fasta, args.cache, config_key, args.cached_json, args.fresh_json, args.output)
+    else:
+        add(args.fasta, args.cache, config_key, args.annotations)
+
+
+if __name__ == "__main__":
+    main()
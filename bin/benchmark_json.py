@@ -0,0 +1,129 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import os
+import random
+import time
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+
+def library_datasets(library_dir):
+    """Collect every JSON file of a library as (relative path, raw bytes)."""
+    datasets = []
+    for root, _, files in os.walk(library_dir):
+        for file_name in sorted(files):
+            if file_name.endswith(".json"):
+                path = os.path.join(root, file_name)
+                with open(path, "rb") as f:
+                    datasets.append((os.path.relpath(path, library_dir), f.read()))
+    return datasets
+
+
+def synthetic_library(genes, isoforms, seed=1):
+    """
+    transcript_info, sequences and fas_scores dictionaries shaped like a library with the given number of
+    genes and on average the given number of protein isoforms per gene.
+    """
+    rng = random.Random(seed)
+    info, sequences, fas_scores = {}, {}, {}
+    for g in range(genes):
+        gene_id = f"ENSG{g:011d}"
+        protein_ids = [f"ENSP{g:07d}{p:04d}" for p in range(max(1, int(rng.expovariate(1 / isoforms))))]
+        info[gene_id] = {"_id": gene_id, "name": f"GENE{g}", "feature": "gene", "taxon_id": "9606",
+                         "chromosome": str(rng.randint(1, 22)), "species": "homo_sapiens",
+                         "biotype": "protein_coding", "transcripts": {
+                             pid: {"_id": pid, "feature": "protein", "gene_id": gene_id,
+                                   "transcript_name": f"GENE{g}-{p + 201}", "transcript_id": pid.replace("P", "T", 1),
+                                   "taxon_id": 9606, "biotype": "protein_coding", "tags": ["complete"],
+                                   "tsl": rng.randint(1, 5), "synonyms": []}
+                             for p, pid in enumerate(protein_ids)}}
+        sequences[gene_id] = {pid: "".join(rng.choice("ACDEFGHIKLMNPQRSTVWY") for _ in range(rng.randint(50, 1000)))
+                              for pid in protein_ids}
+        fas_scores[gene_id] = {p1: {p2: round(rng.random(), 4) for p2 in protein_ids if p2 != p1}
+                               for p1 in protein_ids}
+    return [("synthetic/transcript_info.json", info), ("synthetic/sequences.json", sequences),
+            ("synthetic/fas_scores.json", fas_scores)]
+
+
+def best_time(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(datasets, backends, repeats):
+    """
+    Time parsing and compact serialization of every dataset with every backend.
+    Returns rows of (dataset, backend, size in bytes, load seconds, dump seconds).
+    """
+    rows = []
+    for name, data in datasets:
+        if isinstance(data, bytes):
+            raw, value = data, None
+        else:
+            raw, value = None, data
+        for backend in backends:
+            JSONBoy.set_backend(backend)
+            if value is None:
+                value = JSONBoy.loads(raw)
+            text = JSONBoy.dumps(value)
+            payload = raw if raw is not None else text.encode("utf-8")
+            load_time = best_time(lambda: JSONBoy.loads(payload), repeats)
+            dump_time = best_time(lambda: JSONBoy.dumps(value), repeats)
+            rows.append((name, backend, len(payload), load_time, dump_time))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the JSON backends available to JSONBoy")
+    parser.add_argument("--library_dir", default=None, help="Library whose JSON files are benchmarked")
+    parser.add_argument("--genes", type=int, default=20000, help="Genes of the synthetic library, 0 to skip it")
+    parser.add_argument("--isoforms", type=float, default=5.0, help="Mean protein isoforms per synthetic gene")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions per measurement, the fastest is kept")
+    parser.add_argument("--output", default=None, help="Optional TSV file for the results")
+    args = parser.parse_args()
+
+    datasets = []
+    if args.library_dir:
+        datasets.extend(library_datasets(args.library_dir))
+    if args.genes > 0:
+        datasets.extend(synthetic_library(args.genes, args.isoforms))
+
+    default_backend = JSONBoy.backend
+    rows = benchmark(datasets, JSONBoy.backends, args.repeats)
+    JSONBoy.set_backend(default_backend)
+
+    lines = ["dataset\tbackend\tbytes\tload_s\tdump_s"]
+    lines += [f"{name}\t{backend}\t{size}\t{load_time:.6f}\t{dump_time:.6f}"
+              for name, backend, size, load_time, dump_time in rows]
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
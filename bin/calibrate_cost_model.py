@@ -0,0 +1,165 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import os
+
+import numpy as np
+from scipy.optimize import nnls
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.TraceBoy.TraceBoy import TraceBoy
+from partition_pairs import PAIR_FEATURES, load_path_counts, load_annotation_stats
+
+
+def index_partition_files(partition_dir):
+    """Map every pairing TSV below partition_dir to its name without extension (= FAS_SCORING tag)."""
+    index = {}
+    for root, _, files in os.walk(partition_dir):
+        for file_name in files:
+            if file_name.endswith(".tsv"):
+                index[file_name[:-len(".tsv")]] = os.path.join(root, file_name)
+    return index
+
+
+def partition_features(pairs_path, stats, features):
+    """Sum the pair features over all protein pairs of one partition file."""
+    totals = [0.0] * len(features)
+    with open(pairs_path, "r") as f:
+        for line in f:
+            parts = line.strip().split("\t")
+            if len(parts) != 2:
+                continue
+            for i, name in enumerate(features):
+                totals[i] += PAIR_FEATURES[name](parts[0], parts[1], stats)
+    return totals
+
+
+def collect_observations(trace_path, partition_dir, stats, features, process="FAS_SCORING", field="realtime"):
+    """
+    Join the runtimes of one pipeline run with the contents of its partitions.
+    Returns a list of (tag, feature_sums, runtime_seconds).
+    """
+    runtimes = TraceBoy(trace_path).get_task_runtimes(process, field)
+    partition_files = index_partition_files(partition_dir)
+
+    observations = []
+    for tag, runtime in sorted(runtimes.items()):
+        if tag in partition_files:
+            observations.append((tag, partition_features(partition_files[tag], stats, features), runtime))
+    return observations
+
+
+def fit_cost_model(observations, features):
+    """
+    Fit runtime = task_overhead + sum(weight_f * feature_f) with non-negative weights.
+    Columns are scaled to a maximum of 1 before fitting, so features of very different magnitude
+    (e.g. complexity products and pair counts) do not distort the solver.
+    """
+    x = np.array([row for _, row, _ in observations], dtype=float)
+    y = np.array([runtime for _, _, runtime in observations], dtype=float)
+    x = np.hstack([x, np.ones((len(observations), 1))])
+
+    scale = x.max(axis=0)
+    scale[scale == 0] = 1.0
+    coefficients, _ = nnls(x / scale, y)
+    coefficients = coefficients / scale
+
+    predicted = x.dot(coefficients)
+    ss_res = float(((y - predicted) ** 2).sum())
+    ss_tot = float(((y - y.mean()) ** 2).sum())
+    r_squared = 1.0 - ss_res / ss_tot if ss_tot > 0 else None
+
+    weights = {name: float(weight) for name, weight in zip(features, coefficients[:-1])}
+    return weights, float(coefficients[-1]), r_squared
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fit a per pair FAS runtime model from Nextflow execution traces and the partition contents")
+    parser.add_argument("--trace", action="append", required=True,
+                        help="Nextflow execution trace of a run. Can be given multiple times.")
+    parser.add_argument("--partition_dir", action="append", required=True,
+                        help="Directory with the partition_*/partition_*.tsv files of the same run, "
+                             "given in the same order as --trace")
+    parser.add_argument("--paths_file", action="append", required=True,
+                        help="Protein path complexity file of the run's library. Given once or once per --trace.")
+    parser.add_argument("--annotations", action="append", required=True,
+                        help="FAS annotations.json of the run's library. Given once or once per --trace.")
+    parser.add_argument("--features", default=",".join(PAIR_FEATURES),
+                        help=f"Comma-separated pair features to fit. Available: {', '.join(PAIR_FEATURES)}")
+    parser.add_argument("--process", default="FAS_SCORING", help="Name of the scoring process in the trace")
+    parser.add_argument("--field", default="realtime", help="Trace column used as observed runtime")
+    parser.add_argument("--output", default="fas_cost_model.json", help="Output JSON with the fitted model")
+    args = parser.parse_args()
+
+    runs = len(args.trace)
+    if len(args.partition_dir) != runs:
+        parser.error("--partition_dir has to be given once per --trace")
+    for option in ("paths_file", "annotations"):
+        if len(getattr(args, option)) not in (1, runs):
+            parser.error(f"--{option} has to be given once or once per --trace")
+
+    features = [name for name in args.features.split(",") if name]
+    unknown = set(features) - set(PAIR_FEATURES)
+    if unknown:
+        parser.error(f"Unknown features: {', '.join(sorted(unknown))}")
+
+    observations = []
+    library_stats = {}
+    for i in range(runs):
+        library = (args.paths_file[min(i, len(args.paths_file) - 1)],
+                   args.annotations[min(i, len(args.annotations) - 1)])
+        if library not in library_stats:
+            lengths, tool_counts = load_annotation_stats(library[1])
+            library_stats[library] = {"complexity": load_path_counts(library[0]), "length": lengths,
+                                      "tools": tool_counts}
+        stats = library_stats[library]
+        run_observations = collect_observations(args.trace[i], args.partition_dir[i], stats, features,
+                                                args.process, args.field)
+        print(f"{args.trace[i]}: matched {len(run_observations)} {args.process} tasks to partition files")
+        observations.extend(run_observations)
+
+    if len(observations) < len(features) + 1:
+        raise SystemExit(f"Need at least {len(features) + 1} matched tasks to fit {len(features)} features, "
+                         f"found {len(observations)}")
+
+    weights, task_overhead, r_squared = fit_cost_model(observations, features)
+    model = {
+        "version": 1,
+        "process": args.process,
+        "field": args.field,
+        "tasks": len(observations),
+        "r_squared": r_squared,
+        "task_overhead": task_overhead,
+        "weights": weights,
+    }
+    JSONBoy.save(args.output, model.items(), indent=4)
+
+    fit_quality = f"{r_squared:.3f}" if r_squared is not None else "undefined"
+    print(f"Fitted {len(features)} features on {len(observations)} tasks (R^2 {fit_quality})")
+    for name, weight in weights.items():
+        print(f"  {name}: {weight:.6g} s")
+    print(f"  task overhead: {task_overhead:.6g} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,6 @@
 
 import argparse
 import os
-import json
 from typing import Any, Dict
 from tqdm import tqdm
 from datetime import date
@@ -34,10 +33,13 @@ from datetime import date
 
 
 # Import necessary classes from the SPICE library
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
 from Classes.PassPath.PassPath import PassPath
+from Classes.ShardPlan.ShardPlan import ShardPlan
 from Classes.TreeGrow.TreeGrow import TreeGrow
+from Classes.PairBoy.PairBoy import PairBoy
 from Classes.FastaBoy.FastaBoy import EnsemblFastaBoy
 from Classes.SequenceHandling.Gene import Gene
 from Classes.SequenceHandling.Protein import Protein
@@ -63,7 +65,7 @@ def write_gene_ids_to_file(gene_assembler: GeneAssembler, transcript_data_dir: s
 
 
 
-def setup_library(outdir, species, release, fas_mode_hex):
+def setup_library(outdir, species, release, fas_mode_hex, shard_bytes=ShardPlan.default_target_bytes):
     """
     Set up the directory structure and create initial files for the gene library.
 
@@ -72,6 +74,7 @@ def setup_library(outdir, species, release, fas_mode_hex):
     - species (str): The species name.
     - release (str): The Ensembl release version.
     - fas_mode_hex (str): Hex value representing the FAS mode.
+    - shard_bytes (int): Target size of a fas_scores and architectures shard file.
     """
     library_name = f"spice_lib_{species}_{release}_{fas_mode_hex}"
     library_root = os.path.join(outdir, library_name)
@@ -83,6 +86,7 @@ def setup_library(outdir, species, release, fas_mode_hex):
         "fas_data": "fas_data",
         "fas_scores": "fas_data/fas_scores",
         "fas_index": "fas_data/fas_index.json",
+        "fas_shard_plan": "fas_data/shard_plan.json",
         "fas_temp": "fas_data/tmp",
         "fas_annotation": "fas_data/annotation",
         "fas_annoTools": "fas_data/annoTools.txt",
@@ -91,7 +95,7 @@ def setup_library(outdir, species, release, fas_mode_hex):
         "transcript_info": "transcript_data/transcript_info.json",
         "transcript_seq": "transcript_data/sequences.json",
         "transcript_fasta": "transcript_data/transcript_set.fasta",
-        "transcript_pairings": "transcript_data/transcript_pairings.json",
+        "transcript_pairings": "transcript_data/transcript_pairings.bin",
         "transcript_ids": "transcript_data/phyloprofile_ids.tsv"
     }
 
@@ -104,19 +108,19 @@ def setup_library(outdir, species, release, fas_mode_hex):
     # Create initial placeholder files
     with open(pass_path["fas_annoTools"], "w") as f:
         f.write(str(fas_mode_hex))
-    with open(pass_path["transcript_pairings"], "w") as f:
-        json.dump({}, f, indent=4)
+    PairBoy.write(pass_path["transcript_pairings"], [])
     with open(pass_path["transcript_seq"], "w") as f:
-        json.dump({}, f, indent=4)
+        JSONBoy.dump({}, f, indent=4)
     with open(pass_path["fas_index"], "w") as f:
-        json.dump({}, f, indent=4)
+        JSONBoy.dump({}, f, indent=4)
+    ShardPlan(dict(), shard_bytes).save(pass_path["fas_shard_plan"])
     with open(pass_path["transcript_info"], "w") as f:
-        json.dump({}, f, indent=4)
+        JSONBoy.dump({}, f, indent=4)
 
     # Save path.json to store all paths in a single file
     path_json_path = os.path.join(library_root, "paths.json")
     with open(path_json_path, "w") as f:
-        json.dump(path_dict, f, indent=4)
+        JSONBoy.dump(path_dict, f, indent=4)
 
     print(f"Library setup complete at {library_root}. Paths have been saved to {path_json_path}.")
     return pass_path
@@ -224,6 +228,8 @@ def main():
     parser.add_argument('--min_protein_length', type=int, default=11, help='Minimum protein length to retain.')
     parser.add_argument('--modefas', type=str, default=None, help='Path to a FAS mode file to configure FAS in this library.')
     parser.add_argument('--taxon_id', type=str, required=True, help='NCBI Taxonomy ID for the species.')
+    parser.add_argument('--shard_bytes', type=int, default=ShardPlan.default_target_bytes,
+                        help='Target size in bytes of the fas_scores and architectures shard files.')
 
 
     args = parser.parse_args()
@@ -248,7 +254,7 @@ def main():
     mode_hex_value = fas_mode_hex.get_mode_hex()  # Obtain the FAS mode hex value for use
 
     # Create library structure and write initial files
-    pass_path = setup_library(args.outdir, args.species, args.release, mode_hex_value)
+    pass_path = setup_library(args.outdir, args.species, args.release, mode_hex_value, args.shard_bytes)
 
     # Save FAS mode configuration to a file for future reference
     with open(pass_path["fas_annoTools"], "w") as f:
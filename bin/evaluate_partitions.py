@@ -0,0 +1,103 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import math
+
+from Classes.TraceBoy.TraceBoy import TraceBoy
+
+
+def load_predicted_loads(report_path):
+    """Read the predicted_loads.tsv written by partition_pairs.py into {partition: predicted_load}."""
+    predicted = {}
+    with open(report_path, "r") as f:
+        header = next(f).rstrip("\n").split("\t")
+        load_idx = header.index("predicted_load")
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) > load_idx:
+                predicted[parts[0]] = float(parts[load_idx])
+    return predicted
+
+
+def pearson(x, y):
+    """Pearson correlation of two equally long lists. Returns None if it is undefined."""
+    if len(x) < 2:
+        return None
+    mean_x = sum(x) / len(x)
+    mean_y = sum(y) / len(y)
+    cov = sum((a - mean_x) * (b - mean_y) for a, b in zip(x, y))
+    var_x = sum((a - mean_x) ** 2 for a in x)
+    var_y = sum((b - mean_y) ** 2 for b in y)
+    if var_x == 0 or var_y == 0:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def imbalance(values):
+    """Ratio of the largest value to the mean value (1.0 means perfectly balanced)."""
+    mean_value = sum(values) / len(values) if values else 0
+    return max(values) / mean_value if mean_value > 0 else 1.0
+
+
+def compare(predicted, observed):
+    """Join predicted loads and observed runtimes on the partition name.
+    Returns [(partition, predicted_load, observed_seconds)] sorted by partition."""
+    return [(partition, predicted[partition], observed[partition])
+            for partition in sorted(predicted) if partition in observed]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the predicted FAS partition loads with the runtimes observed in a Nextflow trace")
+    parser.add_argument("--trace", required=True, help="Nextflow execution trace (pipeline_info/execution_trace_*.txt)")
+    parser.add_argument("--loads", required=True, help="predicted_loads.tsv written by partition_pairs.py")
+    parser.add_argument("--process", default="FAS_SCORING", help="Name of the scoring process in the trace")
+    parser.add_argument("--field", default="realtime", help="Trace column used as observed runtime")
+    parser.add_argument("--output", default=None, help="Optional TSV with the per partition comparison")
+    args = parser.parse_args()
+
+    predicted = load_predicted_loads(args.loads)
+    observed = TraceBoy(args.trace).get_task_runtimes(args.process, args.field)
+    rows = compare(predicted, observed)
+
+    if not rows:
+        print(f"No {args.process} task in the trace is tagged with a partition of {args.loads}.")
+        return
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("partition\tpredicted_load\tobserved_seconds\n")
+            for partition, load, seconds in rows:
+                f.write(f"{partition}\t{load}\t{seconds}\n")
+
+    loads = [load for _, load, _ in rows]
+    seconds = [runtime for _, _, runtime in rows]
+    correlation = pearson(loads, seconds)
+    print(f"Matched {len(rows)} of {len(predicted)} partitions")
+    print(f"Predicted imbalance (max/mean): {imbalance(loads):.3f}")
+    print(f"Observed imbalance (max/mean): {imbalance(seconds):.3f}")
+    print(f"Observed makespan: {max(seconds):.1f}s")
+    print("Pearson correlation: " + (f"{correlation:.3f}" if correlation is not None else "undefined"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import os
+
+from Classes.FASCache.FASCache import FASCache
+
+
+def populate(library_dir, cache_path, score_options=""):
+    """
+    Add the FAS results of a finished library (fas_data/fas.phyloprofile, forward.domains and
+    reverse.domains) to the cache.
+    """
+    pass_path = FASCache.open_library(library_dir)
+    hashes = FASCache.hash_fasta(pass_path["transcript_fasta"])
+    fas_data = pass_path["fas_data"]
+
+    with FASCache(cache_path, FASCache.library_config_key(library_dir, score_options)) as fas_cache:
+        added = fas_cache.add_results(os.path.join(fas_data, "fas.phyloprofile"),
+                                      os.path.join(fas_data, "forward.domains"),
+                                      os.path.join(fas_data, "reverse.domains"),
+                                      hashes)
+    print(f"Added {added} protein pairs to the FAS cache {cache_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add the FAS results of a finished library to the content-addressed FAS result cache")
+    parser.add_argument("--library_dir", required=True, help="Root directory of the library")
+    parser.add_argument("--cache", required=True, help="FAS cache SQLite file, created if missing")
+    parser.add_argument("--score_options", default="",
+                        help="FAS scoring options that are part of the cache key")
+    args = parser.parse_args()
+
+    populate(args.library_dir, args.cache, args.score_options)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,13 +27,13 @@
 
 import argparse
 import os
-import json
 import yaml
 from tqdm import tqdm
 
 
 
 # Import necessary classes from SPICE library
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
 from Classes.PassPath.PassPath import PassPath
@@ -50,7 +50,7 @@ def remove_incorrect_entries(gene_assembler, pass_path, prefix_mapping):
     gene_list = gene_assembler.get_genes()
 
     with open(prefix_mapping, "r", encoding="utf-8") as file:
-        taxon_prefix_mapping = json.load(file)
+        taxon_prefix_mapping = JSONBoy.load(file)
 
     # Convert keys to strings to avoid mismatches
     taxon_prefix_mapping = {str(k): v for k, v in taxon_prefix_mapping.items()}
@@ -106,7 +106,7 @@ def filter_gene_library(library_dir,taxon_prefixes):
     # Load paths from paths.json
     path_json_path = os.path.join(library_dir, "paths.json")
     with open(path_json_path, "r") as f:
-        path_dict = json.load(f)
+        path_dict = JSONBoy.load(f)
 
     # Create PassPath object to handle paths
     pass_path = PassPath(path_dict)
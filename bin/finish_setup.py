@@ -26,16 +26,20 @@
 
 import argparse
 import os
-import json
 import yaml
 from tqdm import tqdm
+from typing import Any, Dict, List, Tuple
 
 
 
 # Import necessary classes from SPICE library
+from Classes.FASCache.AnnotationCache import AnnotationCache
+from Classes.JSONBoy.JSONBoy import JSONBoy
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
 from Classes.PassPath.PassPath import PassPath
+from Classes.PairBoy.PairBoy import PairBoy
+from Classes.SequenceHandling.Protein import Protein
 
 def calculate_implicit_fas_scores(
     gene_assembler: GeneAssembler,
@@ -72,6 +76,159 @@ def calculate_implicit_fas_scores(
 
 
 
+def load_previous_scores(previous_pass_path: PassPath, taxon_id: str
+                         ) -> Tuple[Dict[Tuple[str, str], Tuple[float, str, str]], Dict[str, str]]:
+    """
+    Collect all explicit FAS scores of a previous library keyed by the sequence hashes of the protein pair.
+
+    Returns:
+        Dict mapping (seq_hash_1, seq_hash_2) to (score, header_1, header_2) of the previous library and
+        dict mapping the protein headers of the previous library to their sequence hashes.
+    """
+    previous_assembler = GeneAssembler("", "")
+    previous_assembler.load(previous_pass_path)
+
+    previous_scores = {}
+    previous_hashes = {}
+    for gene_id, gene in previous_assembler.gene_assembly.items():
+        hashes = {protein_id: Protein.hash_sequence(sequence)
+                  for protein_id, sequence in gene.to_dict("seq").items() if sequence}
+        previous_hashes.update((f"{gene_id}|{protein_id}|{taxon_id}", seq_hash)
+                               for protein_id, seq_hash in hashes.items())
+        for protein_1, row in gene.to_dict("fas").items():
+            for protein_2, score in row.items():
+                if protein_1 == protein_2 or score == -1 or protein_1 not in hashes or protein_2 not in hashes:
+                    continue
+                previous_scores[(hashes[protein_1], hashes[protein_2])] = (
+                    score, f"{gene_id}|{protein_1}|{taxon_id}", f"{gene_id}|{protein_2}|{taxon_id}")
+    return previous_scores, previous_hashes
+
+
+def carry_over_fas_results(previous_fas_data: str, fas_data: str,
+                           header_map: Dict[Tuple[str, str], List[Tuple[str, str]]]):
+    """
+    Copy the phyloprofile and domain lines of all carried over pairs from a previous library into
+    carried_<file> next to the library-wide FAS files, with the protein headers renamed to the ones of
+    the current library. A previous pair is written once for every current pair with the same sequences.
+    CONCAT_GENES appends them to the freshly scored results and removes them.
+    """
+    for file_name in ("fas.phyloprofile", "forward.domains", "reverse.domains"):
+        previous_path = os.path.join(previous_fas_data, file_name)
+        if not os.path.exists(previous_path):
+            continue
+        with open(previous_path, "r") as f_in, open(os.path.join(fas_data, "carried_" + file_name), "w") as f_out:
+            f_out.write(next(f_in, ""))
+            for line in f_in:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if file_name == "fas.phyloprofile":
+                    for pair in header_map.get((fields[0], fields[2]), []):
+                        fields[0], fields[2] = pair
+                        f_out.write("\t".join(fields) + "\n")
+                else:
+                    previous_pair = tuple(fields[0].split("#"))
+                    ortho_index = previous_pair.index(fields[1])
+                    for pair in header_map.get(previous_pair, []):
+                        fields[0] = "#".join(pair)
+                        fields[1] = pair[ortho_index]
+                        f_out.write("\t".join(fields) + "\n")
+
+
+def carry_over_annotations(previous_fas_data: str, fas_data: str, previous_hashes: Dict[str, str],
+                           current_headers: Dict[str, List[str]]) -> int:
+    """
+    Write the annotations of all proteins whose sequence was annotated in a previous library to
+    carried_annotations.json, with the protein headers of the current library. FAS_ANNOTATION only
+    annotates the remaining sequences if the tool versions of the previous library are still installed,
+    and removes the file once annotations.json is written. Returns the number of carried proteins.
+    """
+    previous_path = os.path.join(previous_fas_data, "annotations.json")
+    if not os.path.exists(previous_path):
+        return 0
+    carried: Dict[str, Any] = {"feature": dict()}
+    for key, value in JSONBoy.iter_object(previous_path, nested=("feature",)):
+        if isinstance(key, tuple):
+            for header in current_headers.get(previous_hashes.get(key[1]), []):
+                carried["feature"][header] = value
+        elif key in AnnotationCache.feature_info_keys or key == "version":
+            carried[key] = value
+    used_features = {feature_id for entry in carried["feature"].values()
+                     for feature_id in AnnotationCache.iter_feature_ids(entry)}
+    for key in AnnotationCache.feature_info_keys:
+        carried[key] = {feature_id: value for feature_id, value in carried.get(key, dict()).items()
+                        if feature_id in used_features}
+    carried["count"] = AnnotationCache.count_features(carried["feature"])
+    JSONBoy.save(os.path.join(fas_data, "carried_annotations.json"), carried.items())
+    return len(carried["feature"])
+
+
+def carry_over_fas_scores(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath,
+                          previous_library_dir: str):
+    """
+    Step 5b: Reuse the FAS scores of a previous library (e.g. the last Ensembl release).
+
+    Proteins are matched by the hash of their sequence, so renamed but unchanged isoforms are reused as well.
+    Scores are only carried over if both libraries were annotated with the same FAS mode. Pairs that received
+    a score here are no longer listed in the pairings and their phyloprofile and domain lines are copied over,
+    so the architectures of these pairs are rebuilt without scoring them again. The annotations of unchanged
+    sequences are copied to carried_annotations.json for FAS_ANNOTATION.
+
+    Args:
+        gene_assembler (GeneAssembler): Contains all loaded gene data.
+        library_info (LibraryInfo): Stores metadata and processing status.
+        pass_path (PassPath): File paths used for saving results.
+        previous_library_dir (str): Root directory of the previous library.
+    """
+    with open(os.path.join(previous_library_dir, "paths.json"), "r") as f:
+        previous_paths = JSONBoy.load(f)
+    previous_paths["root"] = previous_library_dir
+    previous_pass_path = PassPath(previous_paths)
+    previous_info = LibraryInfo(previous_pass_path["info"])
+
+    if previous_info["info"]["fas_mode"] != library_info["info"]["fas_mode"]:
+        print(f"FAS mode of the previous library ({previous_info['info']['fas_mode']}) differs from this library "
+              f"({library_info['info']['fas_mode']}). No FAS scores are carried over.")
+        return
+
+    previous_scores, previous_hashes = load_previous_scores(previous_pass_path,
+                                                            str(previous_info["info"]["taxon_id"]))
+    print(f"Loaded {len(previous_scores)} FAS scores from {previous_library_dir}")
+
+    # Several genes of the new library can hold the same sequence pair, each of them gets the previous results
+    header_map: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    current_headers: Dict[str, List[str]] = {}
+    carried_count = 0
+    gene_list = gene_assembler.get_genes()
+    for gene in tqdm(gene_list, ncols=100, total=len(gene_list), desc="FAS score carry over progress"):
+        proteins = {protein.get_id(): protein for protein in gene.get_proteins() if protein.has_sequence()}
+        hashes = {protein_id: protein.get_sequence_hash() for protein_id, protein in proteins.items()}
+        for protein_id, seq_hash in hashes.items():
+            current_headers.setdefault(seq_hash, []).append(proteins[protein_id].make_header())
+        fas_dict = gene.get_fas_dict()
+        for protein_1, row in fas_dict.items():
+            for protein_2, score in row.items():
+                if score != -1 or protein_1 not in hashes or protein_2 not in hashes:
+                    continue
+                previous = previous_scores.get((hashes[protein_1], hashes[protein_2]))
+                if previous is not None:
+                    row[protein_2] = previous[0]
+                    header_map.setdefault((previous[1], previous[2]), []).append(
+                        (proteins[protein_1].make_header(), proteins[protein_2].make_header()))
+                    carried_count += 1
+
+    carry_over_fas_results(previous_pass_path["fas_data"], pass_path["fas_data"], header_map)
+    gene_assembler.save_fas(pass_path)
+    annotation_count = carry_over_annotations(previous_pass_path["fas_data"], pass_path["fas_data"],
+                                              previous_hashes, current_headers)
+
+    print(f"Carried over {carried_count} FAS scores and the annotations of {annotation_count} proteins "
+          f"from the previous library.")
+    library_info["info"]["previous_library"] = os.path.abspath(previous_library_dir)
+    library_info["info"]["carried_fas_scores_count"] = carried_count
+    library_info.save()
+
+
 def generate_fasta_file(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
     """
     Step 6: Generate a FASTA file for all gene transcripts.
@@ -105,16 +262,13 @@ def generate_pairings(gene_assembler: GeneAssembler, library_info: LibraryInfo,
     Args:
         gene_assembler (GeneAssembler): Contains gene objects with transcript structures.
         library_info (LibraryInfo): Tracks progress and saves metadata.
-        pass_path (PassPath): Path to store the pairing results in JSON format.
+        pass_path (PassPath): Path to store the pairing results in the binary pairings store.
     """
     gene_list = gene_assembler.get_genes(False,True)
-    pairings_dict = {}
-
-    for gene in tqdm(gene_list, ncols=100, total=len(gene_list), desc="Pairing generation process"):
-        pairings_dict[gene.get_id()] = gene.make_pairings()
+    gene_iter = tqdm(gene_list, ncols=100, total=len(gene_list), desc="Pairing generation process")
 
-    with open(pass_path["transcript_pairings"], "w") as f:
-        json.dump(pairings_dict, f, indent=4)
+    PairBoy.write(pass_path["transcript_pairings"],
+                  ((gene.get_id(),) + gene.get_pairing_indices() for gene in gene_iter))
 
     library_info["status"]["07_pairing_generation"] = True
     library_info.save()
@@ -151,6 +305,7 @@ def main():
 
     Loads gene data and metadata, then executes:
     - Implicit FAS score calculation
+    - FAS score carry over from a previous library (optional)
     - FASTA file generation
     - Isoform pairing extraction
     - Phyloprofile ID TSV creation
@@ -162,6 +317,9 @@ def main():
                         help='Root directory of the gene library containing paths.json and info.yaml.')
     parser.add_argument('--force_gene_ids', type=str, default="",
                     help='Comma-separated list of gene IDs to force implicit FAS score to 1.')
+    parser.add_argument('--previous_library', type=str, default=None,
+                        help='Root directory of a previous library (e.g. last Ensembl release). FAS scores of '
+                             'unchanged protein pairs are carried over instead of being scored again.')
 
 
     args = parser.parse_args()
@@ -177,7 +335,7 @@ def main():
 
     # Load configuration and metadata
     with open(paths_json_path, "r") as f:
-        paths_dict = json.load(f)
+        paths_dict = JSONBoy.load(f)
     pass_path = PassPath(paths_dict)
 
     with open(info_yaml_path, "r") as f:
@@ -193,6 +351,8 @@ def main():
 
     # Pipeline steps
     calculate_implicit_fas_scores(gene_assembler, library_info, pass_path, args.force_gene_ids)
+    if args.previous_library:
+        carry_over_fas_scores(gene_assembler, library_info, pass_path, args.previous_library)
     generate_fasta_file(gene_assembler, library_info, pass_path)
     generate_pairings(gene_assembler, library_info, pass_path)
     generate_ids_tsv(gene_assembler, library_info, pass_path)
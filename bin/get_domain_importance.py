@@ -26,10 +26,17 @@
 
 
 import argparse
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+# Count matrices of all genes, shared read-only by the workers of a batch run
+shared_genes = None
+
 
 def option_parse():
     """
@@ -41,6 +48,9 @@ def option_parse():
 
     Optional Arguments:
     -l / --isoformList: Optional TSV file containing isoforms of interest (filtered by condition).
+    -c / --matrixCache: Optional .npz file caching the isoform x feature count matrices of all genes.
+    -b / --batch: Directory of isoform lists or manifest TSV (name, path). One output per list.
+    -w / --workers: Number of processes handling the isoform lists of a batch. Default is 1.
     """
     parser = argparse.ArgumentParser(
         epilog="This script uses the annotation file of the different protein isoforms of each gene "
@@ -55,12 +65,26 @@ def option_parse():
                           help="Output directory. Result file will be named important_features.json.")
     optional.add_argument("-l", "--isoformList", default=None, type=str, required=False,
                           help="Optional: TSV file listing relevant (expressed) isoforms for comparison.")
+    optional.add_argument("-c", "--matrixCache", default=None, type=str, required=False,
+                          help="Optional: .npz file with the feature count matrices of all genes. Created from the "
+                               "input if missing or outdated, reused by later runs with other isoform lists.")
+    optional.add_argument("-b", "--batch", default=None, type=str, required=False,
+                          help="Optional: directory of isoform list TSV files, or a manifest TSV with a name and the "
+                               "path of an isoform list per line. The annotations are read once and "
+                               "important_features_<name>.json is written for every list.")
+    optional.add_argument("-w", "--workers", default=1, type=int, required=False,
+                          help="Number of processes handling the isoform lists of a batch.")
 
     args = parser.parse_args()
-    main(args.inPath, args.outPath, args.isoformList)
+    if args.batch and args.isoformList:
+        parser.error("--isoformList and --batch are mutually exclusive")
+    if args.batch:
+        batch(args.inPath, args.outPath, args.batch, args.matrixCache, args.workers)
+    else:
+        main(args.inPath, args.outPath, args.isoformList, args.matrixCache)
 
 
-def main(inpath, outpath, isoformlist):
+def main(inpath, outpath, isoformlist, matrix_cache=None):
     """
     Main processing logic.
 
@@ -68,16 +92,88 @@ def main(inpath, outpath, isoformlist):
         inpath (str): Path to isoform annotation JSON.
         outpath (str): Directory to write output.
         isoformlist (str | None): Optional path to isoform list file.
+        matrix_cache (str | None): Optional path to the .npz cache of the count matrices.
     """
     rel_isoforms = None
     if isoformlist:
         rel_isoforms = read_isoformlist(isoformlist)
 
-    genes = read_input(inpath, rel_isoforms)
+    genes = read_input(inpath, rel_isoforms, matrix_cache)
     output = get_fdict(genes)
     save2json(output, outpath)
 
 
+def batch(inpath, outpath, batch_path, matrix_cache=None, workers=1):
+    """
+    Writes important_features_<name>.json for every isoform list of a batch. The annotations are
+    read once, the lists are processed in parallel over the shared count matrices.
+
+    Args:
+        inpath (str): Path to isoform annotation JSON.
+        outpath (str): Directory to write output.
+        batch_path (str): Directory of isoform lists or manifest TSV.
+        matrix_cache (str | None): Optional path to the .npz cache of the count matrices.
+        workers (int): Number of processes handling the isoform lists.
+    """
+    isoform_lists = read_batch(batch_path)
+    genes = read_input(inpath, None, matrix_cache)
+    tasks = [(name, path, outpath) for name, path in isoform_lists]
+
+    if workers > 1:
+        # Workers receive the matrices once at start up, forked workers share them copy-on-write
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_shared_genes, initargs=(genes,)) as executor:
+            list(executor.map(process_isoformlist, tasks))
+    else:
+        set_shared_genes(genes)
+        for task in tasks:
+            process_isoformlist(task)
+    print(f"Wrote important features of {len(tasks)} isoform lists to {outpath}")
+
+
+def read_batch(batch_path):
+    """
+    Lists the isoform lists of a batch.
+
+    Args:
+        batch_path (str): Directory with one isoform list per file, named after the file, or manifest TSV
+                          with a name and a path (relative to the manifest) per line.
+
+    Returns:
+        list: [(name, path), ...]
+    """
+    if os.path.isdir(batch_path):
+        return [(os.path.splitext(entry)[0], os.path.join(batch_path, entry))
+                for entry in sorted(os.listdir(batch_path))
+                if os.path.isfile(os.path.join(batch_path, entry)) and not entry.startswith('.')]
+
+    isoform_lists = []
+    with open(batch_path, 'r') as infile:
+        for line in infile:
+            cells = line.rstrip('\n').split('\t')
+            if len(cells) < 2 or line[0] in ('#', '!'):
+                continue
+            isoform_lists.append((cells[0], os.path.join(os.path.dirname(os.path.abspath(batch_path)), cells[1])))
+    return isoform_lists
+
+
+def set_shared_genes(genes):
+    global shared_genes
+    shared_genes = genes
+
+
+def process_isoformlist(task):
+    """
+    Writes the important features of one isoform list of a batch from the shared count matrices.
+
+    Args:
+        task (tuple): (name, path of the isoform list, output directory).
+    """
+    name, path, outpath = task
+    genes = select_isoforms(shared_genes, read_isoformlist(path))
+    save2json(get_fdict(genes), outpath, f"important_features_{name}")
+    return name
+
+
 def read_isoformlist(path):
     """
     Parses a TSV file containing relevant isoforms per gene.
@@ -97,122 +193,213 @@ def read_isoformlist(path):
     return isoformdict
 
 
-def save2json(dict2save, directory):
+def save2json(dict2save, directory, name="important_features"):
     """
     Saves a dictionary to a JSON file named 'important_features.json' in the given directory.
 
     Args:
         dict2save (dict): Data to be written.
         directory (str): Output directory path.
+        name (str): Output filename (without extension).
     """
     Path(directory).mkdir(parents=True, exist_ok=True)
-    jsonOut = json.dumps(dict2save, ensure_ascii=False)
-    with open(f"{directory}/important_features.json", 'w') as out:
+    jsonOut = JSONBoy.dumps(dict2save)
+    with open(f"{directory}/{name}.json", 'w', encoding='utf-8') as out:
         out.write(jsonOut)
 
 
 def get_fdict(genes):
     """
     Generates a dictionary of features/clans that are alternatively spliced (variable across isoforms).
+    A feature/clan is variable if an isoform has it fewer times than the isoform with the most instances.
 
     Returns:
         dict: {feature_or_clan: [gene1, gene2, ...]}
     """
     f_dict = {}
     for gene in genes:
-        f_list = []
-
-        # Collect features/clans that vary across isoforms
-        for isoform in genes[gene]['isoforms']:
-            iso = genes[gene]['isoforms'][isoform]
+        counts = genes[gene]['counts']
+        if counts.shape[0] == 0:
+            continue
 
-            # Check domain features
-            for feature in iso['types']:
-                if feature not in f_list and iso['types'][feature] < genes[gene]['max'][feature]:
-                    f_list.append(feature)
-
-            # Check clans (higher-level domain families)
-            for clan in iso['clans']:
-                if clan not in f_list and iso['clans'][clan] < genes[gene]['max'][clan]:
-                    f_list.append(clan)
+        # Absent features are -1 and never count as variable themselves
+        variable = ((counts >= 0) & (counts < counts.max(axis=0))).any(axis=0)
 
         # Add features/clans to the global feature dictionary
-        for feature in f_list:
-            if feature not in f_dict:
-                f_dict[feature] = []
-            f_dict[feature].append(gene)
+        for column in np.flatnonzero(variable):
+            f_dict.setdefault(genes[gene]['columns'][column], []).append(gene)
 
     return f_dict
 
 
-def read_input(inpath, isoformlist):
+def read_input(inpath, isoformlist, matrix_cache=None):
     """
-    Reads isoform annotation data and structures it by gene, isoform, and features/clans.
+    Reads isoform annotation data and structures it as one isoform x feature/clan count matrix per gene.
+    The annotation file is streamed protein by protein. With a matrix cache, the matrices of all genes
+    are stored after the first read and reused as long as the annotation file is unchanged.
 
     Args:
         inpath (str): Path to input annotation JSON.
         isoformlist (dict | None): Optional filter to include only relevant isoforms.
+        matrix_cache (str | None): Optional path to the .npz cache of the count matrices.
 
     Returns:
         dict: Structured annotation data:
               {
                   gene_id: {
-                      'max': {feature/clan: max_count},
-                      'isoforms': {
-                          isoform_id: {
-                              'types': {feature: count},
-                              'clans': {clan: count}
-                          }
-                      }
+                      'isoforms': [isoform_id, ...],
+                      'columns': [feature/clan, ...],
+                      'counts': np.ndarray of shape (isoforms, columns), -1 if absent
                   }
               }
     """
-    with open(inpath, 'r') as infile:
-        in_dict = json.loads(infile.read())
-        features, clans = in_dict['feature'], in_dict['clan']
+    source = get_source_key(inpath)
+    genes = None
+    if matrix_cache and os.path.isfile(matrix_cache):
+        genes = load_matrices(matrix_cache, source)
+
+    if genes is None:
+        proteins = {}
+        clans = {}
+        for key, value in JSONBoy.iter_object(inpath, nested=('feature',)):
+            if isinstance(key, tuple) and key[0] == 'feature':
+                add_protein(proteins, key[1], value)
+            elif key == 'clan':
+                clans = value
+        genes = build_matrices(proteins, clans)
+        if matrix_cache:
+            save_matrices(genes, matrix_cache, source)
+
+    return select_isoforms(genes, isoformlist)
+
+
+def add_protein(proteins, protein, annotation):
+    """
+    Adds the feature counts of one protein of the annotation file.
+
+    Args:
+        proteins (dict): {gene_id: {isoform_id: {feature: count}}}
+        protein (str): Protein header (gene|protein|taxon).
+        annotation (dict): Annotation of the protein, {tool: {feature: {'instance': [...]}}, 'length': int}.
+    """
+    gid, pid, tid = protein.split('|')  # Extract gene ID and protein isoform ID
+    types = proteins.setdefault(gid, {}).setdefault(pid, {})
+
+    for tool in annotation:
+        if tool != "length":
+            for ftype in annotation[tool]:
+                types[ftype] = len(annotation[tool][ftype]["instance"])
+
+
+def build_matrices(proteins, clans):
+    """
+    Builds the isoform x feature/clan count matrix of every gene. Feature counts of an isoform are
+    aggregated by clan; the clan mapping follows the features in the annotation file, so clans are
+    added once all proteins are read.
+
+    Args:
+        proteins (dict): {gene_id: {isoform_id: {feature: count}}} as filled by add_protein.
+        clans (dict): {feature: clan} mapping of the annotation file.
 
+    Returns:
+        dict: Count matrices as returned by read_input.
+    """
     genes = {}
+    for gid, isoforms in proteins.items():
+        rows = []
+        for types in isoforms.values():
+            row = dict(types)
+            for ftype, count in types.items():
+                if ftype in clans:
+                    row[clans[ftype]] = row.get(clans[ftype], 0) + count
+            rows.append(row)
+
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        column_index = {column: i for i, column in enumerate(columns)}
+        counts = np.full((len(rows), len(columns)), -1, dtype=np.int32)
+        for i, row in enumerate(rows):
+            counts[i, [column_index[column] for column in row]] = list(row.values())
+        genes[gid] = {'isoforms': list(isoforms), 'columns': columns, 'counts': counts}
+    return genes
 
-    for protein in features:
-        gid, pid, tid = protein.split('|')  # Extract gene ID and protein isoform ID
-        gtmp = True
 
-        if isoformlist and gid not in isoformlist:
-            gtmp = False
+def select_isoforms(genes, isoformlist):
+    """
+    Restricts the count matrices to the genes and isoforms of an isoform list.
 
-        if gtmp:
-            if gid not in genes:
-                genes[gid] = {'max': {}, 'isoforms': {}}
+    Args:
+        genes (dict): Count matrices as returned by read_input.
+        isoformlist (dict | None): {gene_id: [isoform_id, ...]}, None keeps all isoforms.
 
-            isotmp = True
-            if isoformlist and pid not in isoformlist[gid]:
-                isotmp = False
+    Returns:
+        dict: Count matrices of the selected isoforms.
+    """
+    if not isoformlist:
+        return genes
 
-            if isotmp:
-                genes[gid]['isoforms'][pid] = {'types': {}, 'clans': {}}
+    selected = {}
+    for gid, gene in genes.items():
+        if gid in isoformlist:
+            relevant = set(isoformlist[gid])
+            rows = [i for i, pid in enumerate(gene['isoforms']) if pid in relevant]
+            selected[gid] = {'isoforms': [gene['isoforms'][i] for i in rows],
+                             'columns': gene['columns'],
+                             'counts': gene['counts'][rows]}
+    return selected
 
-                for tool in features[protein]:
-                    if tool != "length":
-                        for ftype in features[protein][tool]:
-                            count = len(features[protein][tool][ftype]["instance"])
 
-                            # Update max observed count for this feature
-                            if ftype not in genes[gid]['max'] or count > genes[gid]['max'][ftype]:
-                                genes[gid]['max'][ftype] = count
+def get_source_key(inpath):
+    """
+    Identifies the state of an annotation file by its size and modification time.
+    """
+    stat = os.stat(inpath)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
 
-                            genes[gid]['isoforms'][pid]['types'][ftype] = count
+def save_matrices(genes, path, source):
+    """
+    Stores the count matrices of all genes in one .npz file as flat arrays with per gene lengths.
 
-                            # Handle clan aggregation
-                            if ftype in clans:
-                                clan = clans[ftype]
-                                genes[gid]['isoforms'][pid]['clans'].setdefault(clan, 0)
-                                genes[gid]['isoforms'][pid]['clans'][clan] += count
+    Args:
+        genes (dict): Count matrices as returned by read_input.
+        path (str): Path to the .npz file.
+        source (str): Key of the annotation file the matrices were built from.
+    """
+    with JSONBoy.atomic_open(path, "wb") as f:
+        np.savez(f,
+                 source=np.array(source),
+                 genes=np.array(list(genes), dtype=str),
+                 isoform_counts=np.array([len(gene['isoforms']) for gene in genes.values()], dtype=np.int64),
+                 column_counts=np.array([len(gene['columns']) for gene in genes.values()], dtype=np.int64),
+                 isoforms=np.array([pid for gene in genes.values() for pid in gene['isoforms']], dtype=str),
+                 columns=np.array([column for gene in genes.values() for column in gene['columns']], dtype=str),
+                 counts=np.concatenate([gene['counts'].ravel() for gene in genes.values()] +
+                                       [np.zeros(0, dtype=np.int32)]))
+
+
+def load_matrices(path, source=None):
+    """
+    Loads the count matrices stored by save_matrices.
 
-                # Update max observed count for each clan
-                for clan, count in genes[gid]['isoforms'][pid]['clans'].items():
-                    if clan not in genes[gid]['max'] or count > genes[gid]['max'][clan]:
-                        genes[gid]['max'][clan] = count
+    Args:
+        path (str): Path to the .npz file.
+        source (str | None): Expected key of the annotation file, a mismatch returns None.
 
+    Returns:
+        dict | None: Count matrices as returned by read_input.
+    """
+    with np.load(path) as data:
+        if source is not None and str(data['source']) != source:
+            return None
+        isoforms, columns, counts = data['isoforms'].tolist(), data['columns'].tolist(), data['counts']
+        genes = {}
+        i = c = n = 0
+        for gid, n_isoforms, n_columns in zip(data['genes'].tolist(), data['isoform_counts'], data['column_counts']):
+            size = n_isoforms * n_columns
+            genes[gid] = {'isoforms': isoforms[i:i + n_isoforms],
+                          'columns': columns[c:c + n_columns],
+                          'counts': counts[n:n + size].reshape(n_isoforms, n_columns)}
+            i, c, n = i + n_isoforms, c + n_columns, n + size
     return genes
 
 
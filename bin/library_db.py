@@ -0,0 +1,107 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import os
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+
+def read_paths(library_dir):
+    """
+    Return the paths.json dictionary as stored and a PassPath rooted at library_dir.
+    """
+    with open(os.path.join(library_dir, "paths.json"), "r") as f:
+        path_dict = JSONBoy.load(f)
+    return path_dict, PassPath(dict(path_dict, root=library_dir))
+
+
+def write_paths(library_dir, path_dict):
+    JSONBoy.save(os.path.join(library_dir, "paths.json"), path_dict.items(), indent=4)
+
+
+def convert(library_dir):
+    """
+    Store the JSON files of a library in library.sqlite and switch the library to the database backend.
+    """
+    path_dict, pass_path = read_paths(library_dir)
+    if LibraryDB.is_db_library(pass_path):
+        raise SystemExit(f"{library_dir} already uses the database {pass_path['library_db']}")
+    gene_assembler = GeneAssembler("", "")
+    gene_assembler.load(pass_path)
+
+    path_dict["library_db"] = LibraryDB.file_name
+    db_pass_path = PassPath(dict(path_dict, root=library_dir))
+    # Create the database file first, the save_* methods only use it once it exists
+    with LibraryDB(db_pass_path["library_db"]) as library_db:
+        architecture_count = library_db.import_architectures(db_pass_path["fas_architectures"])
+    gene_assembler.save_info(db_pass_path)
+    gene_assembler.save_seq(db_pass_path)
+    gene_assembler.save_fas(db_pass_path)
+    write_paths(library_dir, path_dict)
+    print(f"Stored {gene_assembler.get_gene_count()} genes and {architecture_count} architectures "
+          f"in {db_pass_path['library_db']}")
+
+
+def export(library_dir, detach=False):
+    """
+    Write the JSON files of a database library. With detach the library switches back to the JSON files.
+    """
+    path_dict, pass_path = read_paths(library_dir)
+    if not LibraryDB.is_db_library(pass_path):
+        raise SystemExit(f"{library_dir} has no library database")
+    gene_assembler = GeneAssembler("", "")
+    gene_assembler.load(pass_path)
+
+    json_path_dict = {key: value for key, value in path_dict.items() if key != "library_db"}
+    json_pass_path = PassPath(dict(json_path_dict, root=library_dir))
+    os.makedirs(json_pass_path["fas_scores"], exist_ok=True)
+    gene_assembler.save_info(json_pass_path)
+    gene_assembler.save_seq(json_pass_path)
+    gene_assembler.save_fas(json_pass_path)
+    with LibraryDB(pass_path["library_db"]) as library_db:
+        architecture_count = library_db.export_architectures(json_pass_path["fas_architectures"])
+    if detach:
+        write_paths(library_dir, json_path_dict)
+    print(f"Exported {gene_assembler.get_gene_count()} genes and {architecture_count} architectures "
+          f"to the JSON files of {library_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a SPICE library between the JSON and the SQLite layout")
+    parser.add_argument("mode", choices=["convert", "export"],
+                        help="convert: JSON files to library.sqlite, export: library.sqlite to JSON files")
+    parser.add_argument("--library_dir", required=True, help="Root directory of the library")
+    parser.add_argument("--detach", action="store_true",
+                        help="export: remove the database from paths.json, so the JSON files are used again")
+    args = parser.parse_args()
+
+    if args.mode == "convert":
+        convert(args.library_dir)
+    else:
+        export(args.library_dir, args.detach)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,10 +27,14 @@
 
 
 import argparse
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
+from Classes.ShardPlan.ShardPlan import ShardPlan
+
 
 def option_parse():
     """
@@ -41,6 +45,11 @@ def option_parse():
     -r / --reversePath: Path to _reverse.domains file.
     -m / --mapPath: Path to the feature mapping JSON directory.
     -o / --outPath: Output directory for processed JSON output.
+
+    Optional Arguments:
+    -w / --workers: Number of processes handling shards in parallel. Default is 1.
+    -l / --libraryDir: Root directory of the library. If it has a library database, the architectures are read
+                       from and stored in it.
     """
     parser = argparse.ArgumentParser(
         epilog="This script restructures the annotation file format into a mapped version "
@@ -57,12 +66,18 @@ def option_parse():
                           help="Path to feature mapping JSON directory.")
     required.add_argument("-o", "--outPath", type=str, required=True,
                           help="Path to output directory.")
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-w", "--workers", type=int, default=1, required=False,
+                          help="Number of processes handling architecture shards in parallel.")
+    optional.add_argument("-l", "--libraryDir", type=str, default=None, required=False,
+                          help="Root directory of the library. If its paths.json has a library database, the "
+                               "feature maps are read from it and the paths are stored in it.")
 
     args = parser.parse_args()
-    main(args.forwardPath, args.reversePath, args.mapPath, args.outPath)
+    main(args.forwardPath, args.reversePath, args.mapPath, args.outPath, args.workers, args.libraryDir)
 
 
-def main(forwardpath, reversepath, mappath, outpath):
+def main(forwardpath, reversepath, mappath, outpath, workers=1, library_dir=None):
     """
     Loads the index from the mapping directory and calls the input reader.
 
@@ -71,10 +86,17 @@ def main(forwardpath, reversepath, mappath, outpath):
         reversepath (str): Path to _reverse.domains file.
         mappath (str): Path to directory containing index.json and mapping files.
         outpath (str): Output directory for resulting JSON files.
+        workers (int): Number of processes handling shards in parallel.
+        library_dir (str): Root directory of the library, its database replaces the mapping and output
+                           files if it has one.
     """
-    with open(f"{mappath}/index.json", 'r') as infile:
-        files = json.loads(infile.read())['#files']
-    read_input((forwardpath, reversepath), mappath, files, outpath)
+    db_path = LibraryDB.library_db_path(library_dir) if library_dir is not None else None
+    if db_path is not None:
+        with LibraryDB(db_path) as library_db:
+            shard_plan = ShardPlan(library_db.get_architecture_shards())
+    else:
+        shard_plan = ShardPlan.load(f"{mappath}/index.json")
+    read_input((forwardpath, reversepath), mappath, shard_plan, outpath, workers, db_path)
 
 
 def save2json(dict2save, name, directory):
@@ -87,119 +109,188 @@ def save2json(dict2save, name, directory):
         directory (str): Output directory.
     """
     Path(directory).mkdir(parents=True, exist_ok=True)
-    jsonOut = json.dumps(dict2save, ensure_ascii=False)
-    with open(f"{directory}/{name}.json", 'w') as out:
+    jsonOut = JSONBoy.dumps(dict2save)
+    with open(f"{directory}/{name}.json", 'w', encoding='utf-8') as out:
         out.write(jsonOut)
 
 
-def read_input(inpaths, mappath, files, outpath):
+def index_domains(inpath):
+    """
+    Maps every gene of a domains file to the byte ranges of its lines in a single streaming pass.
+    A gene may occur in several non-contiguous blocks, e.g. when its pairs were scored in different
+    partitions.
+
+    Args:
+        inpath (str): Path to a forward.domains or reverse.domains file.
+
+    Returns:
+        dict: {gene_id: [[start, end], ...]} byte offsets into the file.
+    """
+    index = {}
+    current = None
+    offset = 0
+    with open(inpath, 'rb') as infile:
+        for line in infile:
+            if line != b'\n' and not line.startswith(b'#'):
+                gid = line.split(b'|', 1)[0].decode('utf-8')
+                if gid != current:
+                    if current is not None:
+                        index[current][-1][1] = offset
+                    index.setdefault(gid, []).append([offset, None])
+                    current = gid
+            offset += len(line)
+
+    if current is not None:
+        index[current][-1][1] = offset
+    return index
+
+
+def read_lines(infile, ranges):
+    """
+    Yields the domain lines of the given byte ranges of an open domains file.
+
+    Args:
+        infile (file): Domains file opened in binary mode.
+        ranges (list): [start, end] byte ranges of one gene.
+    """
+    for start, end in ranges:
+        infile.seek(start)
+        for line in infile.read(end - start).decode('utf-8').split('\n'):
+            if line and not line.startswith('#'):
+                yield line
+
+
+def build_lookup(fmap):
+    """
+    Builds the reverse lookup of a protein's feature map. The first feature ID wins if a
+    (feature, start, end) instance occurs more than once.
+
+    Args:
+        fmap (dict): {fid: [feature, start, end]} of a protein.
+
+    Returns:
+        dict: {(feature, start, end): fid}
+    """
+    lookup = {}
+    for fid in sorted(fmap, key=int):
+        feature, start, end = fmap[fid][:3]
+        lookup.setdefault((feature, start, end), fid)
+    return lookup
+
+
+def add_path(lin, line, direction, mapfile, lookups):
+    """
+    Adds the feature ID of a domain line to the linearized architecture of its protein pair.
+
+    Args:
+        lin (dict): Output {gene_id: {"p1@p2": [[fids of p1], [fids of p2]]}}.
+        line (str): Line of a domains file.
+        direction (int): 0 for forward.domains, 1 for reverse.domains.
+        mapfile (dict): Feature mapping of the shard.
+        lookups (dict): Reverse feature lookups of the shard's proteins, filled on first access.
+    """
+    cells = line.split('\t')
+
+    # Get protein IDs depending on direction
+    if direction == 0:
+        p1, p2 = cells[0].split('#')
+    else:
+        p2, p1 = cells[0].split('#')
+
+    if p1 == p2:
+        return
+
+    gid, p1, tax = p1.split('|')
+    p2 = p2.split('|')[1]
+
+    if gid not in lin:
+        lin[gid] = {}
+
+    pkey = '@'.join((p1, p2))
+
+    if pkey not in lin[gid]:
+        lin[gid][pkey] = [[], []]
+
+    rp = cells[1].split('|')[1]
+
+    if cells[7] == 'Y':
+        # Look up feature ID by matching attributes
+        if (gid, rp) not in lookups:
+            lookups[(gid, rp)] = build_lookup(mapfile[gid][rp]['fmap'])
+        fid = lookups[(gid, rp)][(cells[3], int(cells[4]), int(cells[5]))]
+
+        # Assign feature ID to correct direction
+        if rp == p1:
+            lin[gid][pkey][0].append(fid)
+        elif rp == p2:
+            lin[gid][pkey][1].append(fid)
+
+
+def process_shard(shard):
+    """
+    Writes the _paths.json file of one shard, or its paths in the library database. Only the byte
+    ranges of the shard's genes are read from the domains files, so shards can be processed by
+    independent workers.
+
+    Args:
+        shard (tuple): (shard index, domains file paths, mapping directory, output directory,
+                       ({gene_id: ranges} of forward.domains, {gene_id: ranges} of reverse.domains),
+                       library database path or None).
+    """
+    index, inpaths, mappath, outpath, ranges, db_path = shard
+    if db_path is not None:
+        with LibraryDB(db_path) as library_db:
+            mapfile = library_db.get_architecture_features(index)
+    else:
+        mapfile_path = f"{mappath}/{ShardPlan.get_shard_name(index)}.json"
+        with open(mapfile_path, 'r', encoding='utf-8') as infile2:
+            mapfile = JSONBoy.loads(infile2.read())
+
+    lin = {}
+    lookups = {}
+    with open(inpaths[0], 'rb') as forward, open(inpaths[1], 'rb') as reverse:
+        domain_files = (forward, reverse)
+        for gene in mapfile:
+            for direction in (0, 1):
+                for line in read_lines(domain_files[direction], ranges[direction].get(gene, [])):
+                    add_path(lin, line, direction, mapfile, lookups)
+
+    # Save result for this file
+    if db_path is not None:
+        with LibraryDB(db_path) as library_db:
+            library_db.save_architecture_paths((gene, lin.get(gene)) for gene in mapfile)
+    else:
+        save2json(lin, f"{ShardPlan.get_shard_name(index)}_paths", outpath)
+
+
+def read_input(inpaths, mappath, shard_plan, outpath, workers=1, db_path=None):
     """
     Processes the forward and reverse domain files to create feature path mappings
-    for each gene using the provided mapping files.
+    for each gene using the provided mapping files. Both files are indexed once, afterwards
+    every shard reads only the lines of its own genes, so memory is bounded by the largest shard.
 
     Args:
         inpaths (tuple): Tuple of paths to (forward.domains, reverse.domains).
         mappath (str): Directory containing mapping JSON files.
-        files (int): Number of mapping files to iterate through.
+        shard_plan (ShardPlan): Shards of the mapping files, read from their index.json.
         outpath (str): Directory to write the output JSON files.
+        workers (int): Number of processes handling shards in parallel.
+        db_path (str): Library database holding the architectures, None for the JSON files.
     """
-    for i in [0, 1]:  # 0 = forward, 1 = reverse
-        with open(inpaths[i], 'r') as infile:
-            lines = infile.readlines()
-
-        index2 = {}     # Maps gene ID to (start, end) line indices in the domains file
-        y = 0
-        current = None
-
-        # Parse domain lines to find ranges for each gene
-        for line in lines:
-            if line == '\n' or line.startswith('#'):
-                y += 1
-                continue
-
-            gid = line.split('|')[0]
-
-            if gid not in index2:
-                index2[gid] = [y]
-
-            if current and gid != current:
-                index2[current].append(y)
-                current = gid
-
-            if not current:
-                current = gid
-
-            y += 1
-
-        index2[current].append(y)
-
-        # Process each mapping file
-        for index in range(files + 1):
-            mapfile_path = f"{mappath}/{str(index).rjust(9, '0')}.json"
-            with open(mapfile_path, 'r') as infile2:
-                mapfile = json.loads(infile2.read())
-
-            if i == 0:
-                lin = {}  # Initialize new output
-            else:
-                # Load existing forward results to extend them with reverse data
-                with open(f"{outpath}/{str(index).rjust(9, '0')}_paths.json", 'r') as pathfile:
-                    lin = json.loads(pathfile.read())
-
-            for gene in mapfile:
-                if gene in index2:
-                    start, end = index2[gene]
-                    for z in range(start, end):
-                        line = lines[z]
-                        cells = line.rstrip('\n').split('\t')
-
-                        if line == '\n' or line.startswith('#'):
-                            continue
-
-                        # Get protein IDs depending on direction
-                        if i == 0:
-                            p1, p2 = cells[0].split('#')
-                        else:
-                            p2, p1 = cells[0].split('#')
-
-                        if p1 == p2:
-                            continue
-
-                        gid, p1, tax = p1.split('|')
-                        p2 = p2.split('|')[1]
-
-                        if gid not in lin:
-                            lin[gid] = {}
-
-                        pkey = '@'.join((p1, p2))
-
-                        if pkey not in lin[gid]:
-                            lin[gid][pkey] = [[], []]
-
-                        rp = cells[1].split('|')[1]
-
-                        if cells[7] == 'Y':
-                            fid = None
-                            x = 0
-                            # Look up feature ID by matching attributes
-                            while fid is None:
-                                fmap_entry = mapfile[gid][rp]['fmap'][str(x)]
-                                if (
-                                    fmap_entry[0] == cells[3] and
-                                    fmap_entry[1] == int(cells[4]) and
-                                    fmap_entry[2] == int(cells[5])
-                                ):
-                                    fid = str(x)
-                                x += 1
-
-                            # Assign feature ID to correct direction
-                            if rp == p1:
-                                lin[gid][pkey][0].append(fid)
-                            elif rp == p2:
-                                lin[gid][pkey][1].append(fid)
-
-            # Save result for this file
-            save2json(lin, f"{str(index).rjust(9, '0')}_paths", outpath)
+    indices = [index_domains(inpath) for inpath in inpaths]  # 0 = forward, 1 = reverse
+
+    # Every shard only gets the domain ranges of its own genes
+    shards = [(index, inpaths, mappath, outpath,
+               tuple({gene: domain_index[gene] for gene in genes if gene in domain_index} for domain_index in indices),
+               db_path)
+              for index, genes in enumerate(shard_plan.get_shards())]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(process_shard, shards))
+    else:
+        for shard in shards:
+            process_shard(shard)
 
 
 if __name__ == '__main__':
@@ -2,8 +2,15 @@
 
 import os
 import argparse
-import json
-import shutil
+import heapq
+
+from Classes.FASCache.FASCache import FASCache
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.PairBoy.PairBoy import PairBoy
+
+# Characters read per chunk when streaming the pairings JSON.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
 
 def load_path_counts(path_count_file, column_name="approximate greedy complexity"):
     """Load protein scores from a TSV file based on a named column"""
@@ -26,153 +33,322 @@ def load_path_counts(path_count_file, column_name="approximate greedy complexity
     return path_counts
 
 
+def iter_json_object(json_path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream the top-level (key, value) entries of a JSON object file.
+    Only one entry is decoded at a time, so the whole file never has to be parsed into memory.
+    """
+    return JSONBoy.iter_object(json_path, chunk_size=chunk_size)
 
 
-def unpack_genes(pairings_json_path, out_dir, excluded_genes):
-    """Unpack all genes into individual TSV files"""
-    os.makedirs(out_dir, exist_ok=True)
+def iter_gene_pairings(pairings_path, excluded_genes):
+    """Yield (gene_id, [(protein_1, protein_2), ...]) for every gene in the pairings store.
+    Legacy transcript_pairings.json files are streamed instead."""
+    excluded_genes = set(excluded_genes)
 
-    with open(pairings_json_path, "r") as f:
-        json_data = json.load(f)
+    if PairBoy.is_pairboy(pairings_path):
+        for gene_id, pairs in PairBoy(pairings_path):
+            if gene_id not in excluded_genes:
+                yield gene_id, pairs
+        return
 
     skip_keys = {"feature", "interproID", "clan", "count", "length", "version"}
-    gene_files = []
-
-    for gene_id, data in json_data.items():
+    for gene_id, data in iter_json_object(pairings_path):
         if gene_id in skip_keys or not isinstance(data, str):
             continue
         if gene_id in excluded_genes:
             continue
 
-        gene_path = os.path.join(out_dir, f"{gene_id}.tsv")
-        with open(gene_path, "w") as f_out:
-            f_out.write(data)
-        gene_files.append(gene_path)
+        pairs = []
+        for line in data.split("\n"):
+            parts = line.strip().split("\t")
+            if len(parts) == 2:
+                pairs.append((parts[0], parts[1]))
+        yield gene_id, pairs
+
+
+def drop_cached_pairs(gene_pairings, fas_cache, hashes, output_dir="cached_fas"):
+    """
+    Pass on only the pairs without a cached FAS result. The results of cached pairs are written to
+    cached.phyloprofile, cached_forward.domains and cached_reverse.domains in output_dir, which are merged
+    with the FAS_SCORING outputs by CONCAT_PROTEIN_PAIRS. The domains files are only written once the
+    cache knows their header, a fresh cache has no domain lines to restore anyway.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cached_count = 0
+    forward_header = fas_cache.get_meta("forward_header")
+    reverse_header = fas_cache.get_meta("reverse_header")
+    forward_path = os.path.join(output_dir, "cached_forward.domains") if forward_header else os.devnull
+    reverse_path = os.path.join(output_dir, "cached_reverse.domains") if reverse_header else os.devnull
+    with open(os.path.join(output_dir, "cached.phyloprofile"), "w") as phyloprofile, \
+            open(forward_path, "w") as forward, \
+            open(reverse_path, "w") as reverse:
+        phyloprofile.write(FASCache.phyloprofile_header)
+        forward.write(forward_header)
+        reverse.write(reverse_header)
+
+        for gene_id, pairs in gene_pairings:
+            remaining = []
+            for p1, p2 in pairs:
+                key = (hashes.get(p1), hashes.get(p2))
+                cached = fas_cache.get_pair(key[0], key[1], p1, p2) if None not in key else None
+                if cached is None:
+                    remaining.append((p1, p2))
+                    continue
+                scores, forward_lines, reverse_lines = cached
+                cached_count += 1
+                phyloprofile.write(f"{p1}\tncbi{p1.split('|')[-1]}\t{p2}\t{scores[0]}\t{scores[1]}\n")
+                forward.writelines(forward_lines)
+                reverse.writelines(reverse_lines)
+            yield gene_id, remaining
 
+    print(f"Reused {cached_count} cached FAS results")
 
-    return gene_files
 
+def load_annotation_stats(annotations_path):
+    """Collect sequence length and number of feature instances per annotation tool for every protein
+    from the FAS annotations.json."""
+    lengths = {}
+    tool_counts = {}
+    with open(annotations_path, "r") as f:
+        features = JSONBoy.load(f)["feature"]
 
-def split_gene_files(gene_files):
-    """Split each gene .tsv file into individual pairing files (geneID_lineNum.tsv)"""
-    all_pair_files = []
+    for protein_id, tools in features.items():
+        lengths[protein_id] = tools.get("length", 0)
+        tool_counts[protein_id] = {
+            tool: sum(len(entry["instance"]) for entry in tool_features.values())
+            for tool, tool_features in tools.items() if tool != "length"
+        }
+    return lengths, tool_counts
+
+
+def complexity_sum_cost(p1, p2, stats):
+    """Sum of the path complexities of both proteins (the original SPICE cost)."""
+    complexity = stats["complexity"]
+    return complexity.get(p1, 0) + complexity.get(p2, 0)
+
+
+def complexity_product_cost(p1, p2, stats):
+    """Product of the path complexities, every path of one protein is compared against every path of the other."""
+    complexity = stats["complexity"]
+    return complexity.get(p1, 0) * complexity.get(p2, 0)
+
+
+def length_cost(p1, p2, stats):
+    """Path complexity weighted by the combined sequence length of the pair."""
+    lengths = stats["length"]
+    return complexity_sum_cost(p1, p2, stats) * (lengths.get(p1, 0) + lengths.get(p2, 0) + 1)
 
-    for file_path in gene_files:
-        gene_id = os.path.basename(file_path).replace(".tsv", "")
-        with open(file_path, "r") as f:
-            for i, line in enumerate(f):
-                if not line.strip():
-                    continue
-                pair_file = f"{gene_id}_{i}.tsv"
-                with open(pair_file, "w") as out_f:
-                    out_f.write(line)
-                all_pair_files.append(pair_file)
 
-    return all_pair_files
+def annotation_cost(p1, p2, stats):
+    """Number of feature instance comparisons per annotation tool, summed over all tools."""
+    counts_1 = stats["tools"].get(p1, {})
+    counts_2 = stats["tools"].get(p2, {})
+    return sum((counts_1.get(tool, 0) + 1) * (counts_2.get(tool, 0) + 1)
+               for tool in set(counts_1) | set(counts_2)) + 1
 
 
-def score_pairs(pair_files, path_counts):
-    """Calculate score for each protein pair file"""
+def length_sum_cost(p1, p2, stats):
+    """Combined sequence length of the pair."""
+    lengths = stats["length"]
+    return lengths.get(p1, 0) + lengths.get(p2, 0)
+
+
+# Per pair features available to a calibrated cost model (see calibrate_cost_model.py)
+PAIR_FEATURES = {
+    "pairs": lambda p1, p2, stats: 1,
+    "complexity_sum": complexity_sum_cost,
+    "complexity_product": complexity_product_cost,
+    "length_sum": length_sum_cost,
+    "annotation": annotation_cost,
+}
+
+
+def load_cost_model(model_json):
+    """Load the feature weights of a calibrated cost model written by calibrate_cost_model.py."""
+    with open(model_json, "r") as f:
+        weights = JSONBoy.load(f)["weights"]
+    unknown = set(weights) - set(PAIR_FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features in cost model {model_json}: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def calibrated_cost(p1, p2, stats):
+    """Predicted runtime in seconds, a weighted sum of the pair features fitted on past execution traces."""
+    return sum(weight * PAIR_FEATURES[name](p1, p2, stats) for name, weight in stats["weights"].items())
+
+
+# Cost model name -> (cost function, needs annotations.json)
+COST_MODELS = {
+    "complexity_sum": (complexity_sum_cost, False),
+    "complexity_product": (complexity_product_cost, False),
+    "length": (length_cost, True),
+    "annotation": (annotation_cost, True),
+    "calibrated": (calibrated_cost, True),
+}
+
+
+def score_pairs(gene_pairings, stats, cost_function=complexity_sum_cost):
+    """Calculate the predicted cost of each protein pair in memory.
+    Returns a list of ((gene_id, line_number, protein_1, protein_2), score)."""
     pair_scores = []
 
-    for f in pair_files:
-        with open(f, "r") as pf:
-            line = pf.readline().strip()
-            try:
-                p1, p2 = line.split("\t")
-                score = path_counts.get(p1, 0) + path_counts.get(p2, 0)
-                pair_scores.append((f, score))
-            except ValueError:
-                continue
+    for gene_id, pairs in gene_pairings:
+        for i, (p1, p2) in enumerate(pairs):
+            pair_scores.append(((gene_id, i, p1, p2), cost_function(p1, p2, stats)))
 
     return pair_scores
 
 
 def lpt_partition(pair_scores, num_bins):
-    """Greedy LPT-style partitioning"""
+    """Greedy LPT-style partitioning. The lightest bin is kept on top of a heap, so assigning n pairs
+    to k bins takes O(n log k). Returns the bins and their predicted loads."""
     sorted_pairs = sorted(pair_scores, key=lambda x: x[1], reverse=True)
     bins = [[] for _ in range(num_bins)]
     totals = [0] * num_bins
+    heap = [(0, i) for i in range(num_bins)]
+
+    for pair, score in sorted_pairs:
+        total, min_bin = heapq.heappop(heap)
+        bins[min_bin].append(pair)
+        totals[min_bin] = total + score
+        heapq.heappush(heap, (totals[min_bin], min_bin))
+
+    return bins, totals
 
-    for file_name, score in sorted_pairs:
-        min_bin = totals.index(min(totals))
-        bins[min_bin].append(file_name)
-        totals[min_bin] += score
 
-    return bins
+def write_load_report(partitions, totals, report_path):
+    """Write the predicted load of every partition and print a short balance summary."""
+    with open(report_path, "w") as f:
+        f.write("partition\tpairs\tpredicted_load\n")
+        for i, bin_pairs in enumerate(partitions):
+            f.write(f"partition_{i}\t{len(bin_pairs)}\t{round(totals[i], 3)}\n")
 
+    if totals:
+        mean_load = sum(totals) / len(totals)
+        imbalance = max(totals) / mean_load if mean_load > 0 else 1.0
+        print(f"Predicted load: max {round(max(totals), 3)}, min {round(min(totals), 3)}, mean {mean_load:.1f} "
+              f"(max/mean {imbalance:.3f})")
 
-def merge_files_into_partitions(partitions):
-    """Merge .tsv files into partition_X/partition_X.tsv (one entry per line)."""
-    for i, bin_files in enumerate(partitions):
+
+def write_partitions(partitions):
+    """Write partition_X/partition_X.tsv (one protein pair per line)."""
+    for i, bin_pairs in enumerate(partitions):
         part_dir = f"partition_{i}"
         os.makedirs(part_dir, exist_ok=True)
 
         merged_path = os.path.join(part_dir, f"partition_{i}.tsv")
         with open(merged_path, "w") as merged_file:
-            for f in bin_files:
-                with open(f, "r") as infile:
-                    for line in infile:
-                        line = line.rstrip('\n')  # remove any accidental multiple newlines
-                        merged_file.write(line + "\n")  # re-add exactly one newline
+            for _, _, p1, p2 in bin_pairs:
+                merged_file.write(f"{p1}\t{p2}\n")
+
+
+def write_pair_files(pair_scores, part_dir="partition_0"):
+    """Write one geneID_lineNum.tsv file per protein pair, so that each pair is scored in its own process.
+    Without any pair an empty partition_0.tsv is written, SEED_PARALLELIZATION always emits a pairing file."""
+    os.makedirs(part_dir, exist_ok=True)
+
+    if not pair_scores:
+        open(os.path.join(part_dir, f"{os.path.basename(part_dir)}.tsv"), "w").close()
+
+    for (gene_id, i, p1, p2), _ in pair_scores:
+        with open(os.path.join(part_dir, f"{gene_id}_{i}.tsv"), "w") as out_f:
+            out_f.write(f"{p1}\t{p2}\n")
+
+
+def write_partition_outputs(scored_pairs, num_partitions, report_path):
+    """Write the pairing files for FAS_SCORING: num_partitions LPT partitions, or one file per pair for 0.
+    Without any pair (e.g. all of them were found in the FAS cache) a single empty partition is written."""
+    if num_partitions < 1:
+        # No pre-partitioning: every pair gets its own FAS_SCORING process
+        write_pair_files(scored_pairs)
+        print(f"Wrote {len(scored_pairs)} individual pairing files")
+        return
 
+    split_partitions_number = num_partitions
 
+    # Adjust partition number if too many partitions requested
+    total_pairs = len(scored_pairs)
+    if split_partitions_number > total_pairs:
+        print(f"Warning: Requested {split_partitions_number} partitions, but only {total_pairs} pairs available.")
+        split_partitions_number = max(total_pairs, 1)
+        print(f"Adjusting to {split_partitions_number} partitions.")
+
+    # Step 3: Partition using LPT
+    partitions, totals = lpt_partition(scored_pairs, split_partitions_number)
+    print(f"Partitioned into {split_partitions_number} bins")
 
+    # Step 4: Write the partition files and the predicted loads
+    write_partitions(partitions)
+    write_load_report(partitions, totals, report_path)
+    print("Pairs organized into partition folders")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Partition FAS protein pairings based on LPT scoring")
-    parser.add_argument("--pairings_json", required=True, help="JSON file with all gene pairings")
+    parser.add_argument("--pairings", "--pairings_json", dest="pairings", required=True,
+                        help="Pairings store (transcript_pairings.bin) or legacy JSON file with all gene pairings")
     parser.add_argument("--paths_file", required=True, help="Protein path complexity file")
-    parser.add_argument("--tmp_dir", default="unpacked_genes", help="Temporary dir for unpacked gene .tsv files")
-    parser.add_argument("--partitions", type=int, default=8, help="Number of CPU partitions")
+    parser.add_argument("--partitions", type=int, default=8,
+                        help="Number of CPU partitions. 0 writes one file per protein pair instead.")
     parser.add_argument(
     "--exclude_gene_ids", type=str, default="",
     help="Comma-separated list of gene IDs to exclude from unpacking and partitioning"
 )
+    parser.add_argument("--cost_model", choices=sorted(COST_MODELS), default="complexity_sum",
+                        help="Cost model used to predict the FAS runtime of a protein pair")
+    parser.add_argument("--annotations", default=None,
+                        help="FAS annotations.json, required by the 'length', 'annotation' and 'calibrated' cost models")
+    parser.add_argument("--cost_model_json", default=None,
+                        help="Cost model fitted by calibrate_cost_model.py, required by the 'calibrated' cost model")
+    parser.add_argument("--load_report", default="predicted_loads.tsv",
+                        help="Output TSV with the predicted load of every partition")
+    parser.add_argument("--fas_cache", default=None,
+                        help="FAS result cache (SQLite). Pairs with a cached result are not partitioned.")
+    parser.add_argument("--library_dir", default=None,
+                        help="Root directory of the library, required by --fas_cache")
+    parser.add_argument("--score_options", default="",
+                        help="FAS scoring options that are part of the cache key")
 
 
     args = parser.parse_args()
 
-    if args.partitions < 1:
-        split_partitions_number = 1
-    else:
-        split_partitions_number = args.partitions
-
     # Load protein complexity scores
-    path_counts = load_path_counts(args.paths_file)
-    print(f"Loaded {len(path_counts)} protein path scores")
-
-    # Step 1–2: Unpack genes and split to protein pair .tsv files
+    stats = {"complexity": load_path_counts(args.paths_file), "length": {}, "tools": {}, "weights": {}}
+    print(f"Loaded {len(stats['complexity'])} protein path scores")
+
+    if args.cost_model == "calibrated":
+        if args.cost_model_json is None:
+            parser.error("--cost_model calibrated requires --cost_model_json")
+        stats["weights"] = load_cost_model(args.cost_model_json)
+
+    cost_function, needs_annotations = COST_MODELS[args.cost_model]
+    if needs_annotations:
+        if args.annotations is None:
+            parser.error(f"--cost_model {args.cost_model} requires --annotations")
+        stats["length"], stats["tools"] = load_annotation_stats(args.annotations)
+        print(f"Loaded annotation statistics for {len(stats['length'])} proteins")
+
+    # Step 1–2: Stream gene pairings and score each pair with the cost model
     excluded_gene_list = args.exclude_gene_ids.split(",") if args.exclude_gene_ids else []
-    gene_files = unpack_genes(args.pairings_json, args.tmp_dir, excluded_gene_list)
-
-    print(f"Unpacked {len(gene_files)} genes")
-
-    pair_files = split_gene_files(gene_files)
-    print(f"Split into {len(pair_files)} individual pairing files")
-
-    # Adjust partition number if too many partitions requested
-    total_pairs = len(pair_files)
-    if split_partitions_number > total_pairs:
-        print(f"Warning: Requested {split_partitions_number} partitions, but only {total_pairs} pairs available.")
-        split_partitions_number = total_pairs
-        print(f"Adjusting to {split_partitions_number} partitions.")
+    gene_pairings = iter_gene_pairings(args.pairings, excluded_gene_list)
 
+    fas_cache = None
+    if args.fas_cache:
+        if args.library_dir is None:
+            parser.error("--fas_cache requires --library_dir")
+        hashes = FASCache.hash_fasta(FASCache.open_library(args.library_dir)["transcript_fasta"])
+        fas_cache = FASCache(args.fas_cache, FASCache.library_config_key(args.library_dir, args.score_options))
+        gene_pairings = drop_cached_pairs(gene_pairings, fas_cache, hashes)
 
-    # Step 3–4: Score each pair using protein path counts
-    scored_pairs = score_pairs(pair_files, path_counts)
-    print(f"Scored {len(scored_pairs)} pairing files")
+    scored_pairs = score_pairs(gene_pairings, stats, cost_function)
+    if fas_cache is not None:
+        fas_cache.close()
+    print(f"Scored {len(scored_pairs)} protein pairs with the '{args.cost_model}' cost model")
 
-    # Step 5: Partition using LPT
-    partitions = lpt_partition(scored_pairs, split_partitions_number)
-    print(f"Partitioned into {split_partitions_number} bins")
-
-    # Step 6: Move files to bin directories
-    merge_files_into_partitions(partitions)
-    print("Files organized into partition folders")
+    write_partition_outputs(scored_pairs, args.partitions, args.load_report)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,288 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+
+import argparse
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Select the headless backend before pyplot is imported by the visualizers
+import matplotlib
+matplotlib.use("Agg")
+
+from Classes.AssemblyVisualizer.AssemblyTables import AssemblyTables
+from Classes.AssemblyVisualizer.AssemblyVisualizer import AssemblyVisualizer, ResultVisualizer
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+MANIFEST_NAME: str = "render_manifest.json"
+TABLES_NAME: str = "assembly_tables.npz"
+RMSD_DEFAULTS: Dict[str, Any] = {"rank_count": 200, "category": "all", "filter_tag": "", "library_name": "",
+                                 "switch_max": False, "max_rmsd_genes": [], "max_rmsd_gene_colors": [],
+                                 "gene_synonyms": [], "sim_switch_genes": [], "sim_switch_transcripts": [],
+                                 "sim_switch_synonyms": [], "sim_switch_color": []}
+
+
+def open_library(library_dir: str) -> PassPath:
+    with open(os.path.join(library_dir, "paths.json"), "r") as f:
+        path_dict: Dict[str, str] = JSONBoy.load(f)
+    path_dict["root"] = library_dir
+    return PassPath(path_dict)
+
+
+def library_files(library_dir: str) -> List[str]:
+    """
+    Files GeneAssembler.load reads from a library.
+    """
+    pass_path: PassPath = open_library(library_dir)
+    if LibraryDB.is_db_library(pass_path):
+        return [pass_path["library_db"]]
+    return [pass_path["transcript_info"], pass_path["transcript_seq"], pass_path["fas_index"],
+            pass_path["fas_scores"]]
+
+
+def hash_file(path: str, file_hashes: Dict[str, List[Any]]) -> str:
+    """
+    SHA-256 of a file. file_hashes maps paths to [size, mtime_ns, hash] and is reused while both match.
+    """
+    stat = os.stat(path)
+    cached: Optional[List[Any]] = file_hashes.get(path)
+    if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    file_hashes[path] = [stat.st_size, stat.st_mtime_ns, hasher.hexdigest()]
+    return file_hashes[path][2]
+
+
+def hash_paths(paths: List[str], file_hashes: Dict[str, List[Any]]) -> str:
+    """
+    Combined content hash of files and of all files below directories.
+    """
+    hasher = hashlib.sha256()
+    for path in paths:
+        files: List[str] = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for file_path in files:
+            hasher.update(os.path.relpath(file_path, path).encode("utf-8"))
+            hasher.update(hash_file(file_path, file_hashes).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def hash_plot(plot: Dict[str, Any], *input_hashes: str) -> str:
+    hasher = hashlib.sha256(json.dumps(plot, sort_keys=True).encode("utf-8"))
+    for input_hash in input_hashes:
+        hasher.update(input_hash.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def get_outfile(plot: Dict[str, Any]) -> str:
+    return plot["name"] + (".svg" if plot["type"] == "rmsd_distribution" else ".html")
+
+
+def read_config(config_path: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Read a JSON plot configuration:
+        {"library": "<library directory>",
+         "plots": [{"name": "rmsd_all", "type": "rmsd_distribution", "input": "<result csv directory>",
+                    "maximum": "<max RMSD tsv>", "category": "all", ...},
+                   {"name": "tsl", "type": "tsl_biotype_histogram"}, ...]}
+    rmsd_distribution plots take the options of AssemblyVisualizer.py (see RMSD_DEFAULTS) and are written as
+    SVG, all other types are AssemblyVisualizer.figures and are written as HTML.
+    """
+    with open(config_path, "r") as f:
+        config: Dict[str, Any] = JSONBoy.load(f)
+    plots: List[Dict[str, Any]] = list()
+    names = set()
+    for plot in config["plots"]:
+        if plot["type"] != "rmsd_distribution" and plot["type"] not in AssemblyVisualizer.figures:
+            raise ValueError(f"Unknown plot type {plot['type']} of {plot['name']}")
+        if plot["name"] in names:
+            raise ValueError(f"Plot name {plot['name']} is used twice")
+        names.add(plot["name"])
+        if plot["type"] == "rmsd_distribution":
+            plot = dict(RMSD_DEFAULTS, **plot)
+        plots.append(plot)
+    return config.get("library"), plots
+
+
+def prepare_rmsd_jobs(plots: List[Dict[str, Any]], library_dir: Optional[str], output_dir: str,
+                      manifest: Dict[str, Any], force_flag: bool) -> List[Tuple[str, Dict[str, Any], str]]:
+    """
+    Import the data of all changed RMSD figures. Each result directory and max RMSD file is read once.
+    """
+    max_rmsd_dicts: Dict[Tuple[str, str], Dict[str, float]] = dict()
+    rank_imports: Dict[Tuple[str, str, str, int], Tuple[List[List[float]], List[float]]] = dict()
+    jobs: List[Tuple[str, Dict[str, Any], str]] = list()
+    for plot in plots:
+        # Simulated switches depend on single genes of the library, their RMSDs are part of the hash
+        sim_switch_rmsds: List[float] = list()
+        if plot["sim_switch_genes"]:
+            result_visualizer = ResultVisualizer(plot.get("library", library_dir))
+            sim_switch_rmsds = [float(result_visualizer.simulate_transcript(gene_id, *transcripts))
+                                for gene_id, transcripts in zip(plot["sim_switch_genes"],
+                                                                plot["sim_switch_transcripts"])]
+        plot_hash: str = hash_plot(plot, hash_paths([plot["input"], plot["maximum"]], manifest["files"]),
+                                   json.dumps(sim_switch_rmsds))
+        if is_current(plot, plot_hash, output_dir, manifest, force_flag):
+            continue
+
+        max_key: Tuple[str, str] = (plot["maximum"], plot["category"])
+        if max_key not in max_rmsd_dicts:
+            max_rmsd_dicts[max_key] = ResultVisualizer.extract_max_rmsd_file(*max_key)
+        rank_key: Tuple[str, str, str, int] = (plot["input"], plot["maximum"], plot["category"], plot["rank_count"])
+        if rank_key not in rank_imports:
+            rank_imports[rank_key] = ResultVisualizer.import_rmsd_ranks(plot["input"], max_rmsd_dicts[max_key],
+                                                                        plot["rank_count"])
+        rank_entries, rank_max = rank_imports[rank_key]
+        job: Dict[str, Any] = {
+            "rank_entries": rank_entries,
+            "rank_max": rank_max,
+            "max_rmsd_stats": ResultVisualizer.make_max_rmsd_stats(plot["max_rmsd_genes"],
+                                                                   plot["max_rmsd_gene_colors"],
+                                                                   plot["gene_synonyms"],
+                                                                   max_rmsd_dicts[max_key]),
+            "sim_switch_stats": ResultVisualizer.make_sim_switch_stats(sim_switch_rmsds,
+                                                                       plot["sim_switch_color"],
+                                                                       plot["gene_synonyms"],
+                                                                       plot["sim_switch_synonyms"]),
+            "filter_tag": plot["filter_tag"],
+            "outfile": os.path.join(output_dir, get_outfile(plot)),
+            "library_name": plot["library_name"],
+            "switch_label_flag": plot["switch_max"]}
+        jobs.append((plot["name"], job, plot_hash))
+    return jobs
+
+
+def prepare_assembly_jobs(plots: List[Dict[str, Any]], library_dir: Optional[str], output_dir: str,
+                          manifest: Dict[str, Any], force_flag: bool) -> List[Tuple[str, Dict[str, Any], str]]:
+    """
+    Make sure the transcript tables of the library are cached for all changed AssemblyVisualizer figures.
+    """
+    if not plots:
+        return list()
+    if library_dir is None:
+        raise ValueError("AssemblyVisualizer figures need a library in the plot configuration")
+    library_hash: str = hash_paths(library_files(library_dir), manifest["files"])
+    cache_path: str = os.path.join(output_dir, TABLES_NAME)
+    jobs: List[Tuple[str, Dict[str, Any], str]] = list()
+    for plot in plots:
+        plot_hash: str = hash_plot(plot, library_hash)
+        if not is_current(plot, plot_hash, output_dir, manifest, force_flag):
+            jobs.append((plot["name"], {"figure_name": plot["type"], "cache_path": cache_path,
+                                        "cache_key": library_hash,
+                                        "outfile": os.path.join(output_dir, get_outfile(plot))}, plot_hash))
+    if jobs and AssemblyTables.load(cache_path, library_hash) is None:
+        gene_assembler: GeneAssembler = GeneAssembler("", "")
+        gene_assembler.load(open_library(library_dir))
+        AssemblyVisualizer(gene_assembler, output_dir, cache_path, library_hash).get_tables()
+    return jobs
+
+
+def is_current(plot: Dict[str, Any], plot_hash: str, output_dir: str, manifest: Dict[str, Any],
+               force_flag: bool) -> bool:
+    return (not force_flag and manifest["figures"].get(plot["name"]) == plot_hash
+            and os.path.isfile(os.path.join(output_dir, get_outfile(plot))))
+
+
+def render(job: Dict[str, Any]) -> None:
+    if "figure_name" in job:
+        visualizer = AssemblyVisualizer(None, os.path.dirname(job["outfile"]), job["cache_path"], job["cache_key"])
+        visualizer.write_figure(job["figure_name"], job["outfile"])
+    else:
+        ResultVisualizer.render_rmsd_distribution(**job)
+
+
+def write_index(output_dir: str, plots: List[Dict[str, Any]]) -> None:
+    lines: List[str] = ["<!DOCTYPE html>", "<html>", "<head><meta charset=\"utf-8\"><title>Plots</title></head>",
+                        "<body>"]
+    for plot in plots:
+        outfile: str = html.escape(get_outfile(plot))
+        lines.append(f"<h2>{html.escape(plot['name'])}</h2>")
+        if outfile.endswith(".svg"):
+            lines.append(f"<img src=\"{outfile}\" alt=\"{html.escape(plot['name'])}\">")
+        else:
+            lines.append(f"<iframe src=\"{outfile}\" width=\"100%\" height=\"600\" frameborder=\"0\"></iframe>")
+    lines += ["</body>", "</html>", ""]
+    with JSONBoy.atomic_open(os.path.join(output_dir, "index.html")) as f:
+        f.write("\n".join(lines))
+
+
+def render_plots(config_path: str, output_dir: str, workers: int = 1, force_flag: bool = False) -> int:
+    """
+    Render all changed figures of the configuration. Returns the number of rendered figures.
+
+    render_manifest.json of output_dir keeps a hash of the options and input file contents of every figure,
+    figures with an unchanged hash are skipped. Result directories are imported once for all figures using
+    them and the library is only read if its transcript tables are not cached in output_dir yet.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    library_dir, plots = read_config(config_path)
+    manifest_path: str = os.path.join(output_dir, MANIFEST_NAME)
+    manifest: Dict[str, Any] = {"figures": dict(), "files": dict()}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest.update(JSONBoy.load(f))
+
+    jobs: List[Tuple[str, Dict[str, Any], str]] = prepare_rmsd_jobs(
+        [plot for plot in plots if plot["type"] == "rmsd_distribution"], library_dir, output_dir, manifest,
+        force_flag)
+    jobs += prepare_assembly_jobs([plot for plot in plots if plot["type"] != "rmsd_distribution"], library_dir,
+                                  output_dir, manifest, force_flag)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            list(executor.map(render, [job for _, job, _ in jobs]))
+    else:
+        for _, job, _ in jobs:
+            render(job)
+
+    manifest["figures"] = {plot["name"]: manifest["figures"][plot["name"]] for plot in plots
+                           if plot["name"] in manifest["figures"]}
+    manifest["figures"].update({name: plot_hash for name, _, plot_hash in jobs})
+    JSONBoy.save(manifest_path, manifest.items())
+    write_index(output_dir, plots)
+    print(f"Rendered {len(jobs)} of {len(plots)} figures into {output_dir}")
+    return len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render all configured plots headless and in parallel, skipping figures with unchanged inputs")
+    parser.add_argument("-c", "--config", required=True, help="JSON plot configuration")
+    parser.add_argument("-o", "--output", required=True, help="Output directory for the figures and index.html")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of rendering processes")
+    parser.add_argument("-f", "--force", action="store_true", help="Render all figures, even unchanged ones")
+    args = parser.parse_args()
+
+    render_plots(args.config, args.output, args.workers, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,10 +25,16 @@
 #######################################################################
 
 import argparse
-import json
 import os
 from pathlib import Path
 
+import get_domain_importance
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.LibraryDB.LibraryDB import LibraryDB
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.ShardPlan.ShardPlan import ShardPlan
+
 def option_parse():
     """
     Parses command-line arguments and triggers the main process.
@@ -38,7 +44,12 @@ def option_parse():
     -o / --outPath: Path to the output directory.
 
     Optional Arguments:
-    -c / --genesPerFile: Number of genes to include in each output file. Default is 100.
+    -p / --shardPlan: Shard plan of the library (fas_data/shard_plan.json). Used if it exists.
+    -b / --shardBytes: Target size of an output file if no shard plan exists.
+    -c / --genesPerFile: Maximum number of genes in an output file. Default is no limit.
+    -d / --importanceOut: Directory for important_features.json, computed in the same pass over the input.
+    -l / --libraryDir: Root directory of the library. Genes are sized by its protein counts and, if it has a library
+                       database, the architectures are stored there.
     """
     parser = argparse.ArgumentParser(
         epilog="This script restructures the annotation file format into a mapped version where each feature instance "
@@ -51,51 +62,93 @@ def option_parse():
                           help="Path to input JSON file containing feature annotations.")
     required.add_argument("-o", "--outPath", default='.', type=str, required=True,
                           help="Path to output directory. Output filenames are based on the input.")
-    optional.add_argument("-c", "--genesPerFile", default=100, type=int, required=False,
-                          help="Number of genes per output file. Larger number results in fewer, larger files.")
+    optional.add_argument("-p", "--shardPlan", default=None, type=str, required=False,
+                          help="Shard plan of the library. Genes are written to the shards of the plan, so the "
+                               "architectures share their file numbers with the FAS scores.")
+    optional.add_argument("-b", "--shardBytes", default=ShardPlan.default_target_bytes, type=int, required=False,
+                          help="Target size of an output file in bytes, estimated from the squared isoform count "
+                               "of the genes. Only used without a shard plan.")
+    optional.add_argument("-c", "--genesPerFile", default=None, type=int, required=False,
+                          help="Maximum number of genes per output file.")
+    optional.add_argument("-d", "--importanceOut", default=None, type=str, required=False,
+                          help="Output directory for important_features.json. Replaces a separate run of "
+                               "get_domain_importance.py, the annotation file is read only once.")
+    optional.add_argument("-l", "--libraryDir", default=None, type=str, required=False,
+                          help="Root directory of the library. Genes are sized by their protein count in the "
+                               "library like the FAS score shards. If its paths.json has a library database, the "
+                               "architectures are stored in it instead of the output directory.")
 
     args = parser.parse_args()
-    main(args.inPath, args.outPath, args.genesPerFile)
+    main(args.inPath, args.outPath, args.genesPerFile, args.shardPlan, args.shardBytes, args.importanceOut,
+         args.libraryDir)
 
 
-def main(inpath, outpath, filesize):
+def main(inpath, outpath, filesize=None, shard_plan_path=None, target_bytes=ShardPlan.default_target_bytes,
+         importance_path=None, library_dir=None):
     """
     Reads the input file, restructures the annotation data by gene,
-    splits it into smaller JSON files, and creates an index file.
+    splits it into smaller JSON files following the shard plan, and creates an index file.
 
     Args:
         inpath (str): Path to the input JSON file.
         outpath (str): Directory where output files will be saved.
-        filesize (int): Number of genes per output file.
+        filesize (int): Maximum number of genes per output file, None for no limit.
+        shard_plan_path (str): Shard plan of the library. A new plan is built if it does not exist, the plan
+                               including new genes is saved back.
+        target_bytes (int): Target size of an output file for a new plan.
+        importance_path (str): Directory for important_features.json, None to skip it.
+        library_dir (str): Root directory of the library. Genes are sized by its protein counts, and its
+                           database replaces the output files if it has one.
     """
-    arc = read_input(inpath)
-    index = 0  # File index counter
-    count = 0  # Gene counter
-    output = {}  # Temp dictionary for batch output
-    indexout = {'genes': {}}  # Mapping from gene ID to output file index
-
-    for gene in arc:
-        output[gene] = arc[gene]
-        indexout['genes'][gene] = index
-        count += 1
-
-        # Save current batch if it hits the file size limit
-        if count > filesize:
-            name = str(index).rjust(9, '0')  # Padded file name
-            save2json(output, name, outpath)
-            output = {}
-            index += 1
-            count = 0
-
-    # Save any remaining genes
-    name = str(index).rjust(9, '0')
-    save2json(output, name, outpath)
+    importance_genes = {} if importance_path is not None else None
+    arc = read_input(inpath, importance_genes)
+    if importance_path is not None:
+        get_domain_importance.save2json(get_domain_importance.get_fdict(importance_genes), importance_path)
+    if library_dir is not None:
+        # The protein counts of the library, as used for the fas_scores shards
+        gene_isoforms = load_isoform_counts(library_dir)
+    else:
+        gene_isoforms = [(gene, len(arc[gene])) for gene in arc]
+
+    if shard_plan_path is not None and os.path.isfile(shard_plan_path):
+        shard_plan = ShardPlan.load(shard_plan_path)
+        shard_plan.extend(gene_isoforms, filesize)  # Genes missing in the plan get shards after the last one
+    else:
+        shard_plan = ShardPlan.build(gene_isoforms, target_bytes, filesize)
+    if shard_plan_path is not None:
+        shard_plan.save(shard_plan_path)
+
+    library_db = LibraryDB.open_library(library_dir) if library_dir is not None else None
+    if library_db is not None:
+        with library_db:
+            library_db.save_architectures((gene, shard, arc[gene]) for shard, genes in
+                                          enumerate(shard_plan.get_shards()) for gene in genes if gene in arc)
+        return
+
+    # Every shard gets a file, parse_domain_out.py reads all of them
+    for shard, genes in enumerate(shard_plan.get_shards()):
+        save2json({gene: arc[gene] for gene in genes if gene in arc}, ShardPlan.get_shard_name(shard), outpath)
 
     # Save the index file mapping genes to their output files
-    indexout['#files'] = index
+    indexout = {'genes': {gene: shard_plan.get_shard(gene) for gene in arc},
+                '#files': shard_plan.get_file_count()}
     save2json(indexout, 'index', outpath)
 
 
+def load_isoform_counts(library_dir):
+    """
+    Returns the (gene_id, protein count) pairs of GeneAssembler.get_isoform_counts for the library in library_dir.
+
+    Args:
+        library_dir (str): Root directory of the library.
+    """
+    with open(os.path.join(library_dir, "paths.json"), "r") as f:
+        pass_path = PassPath(dict(JSONBoy.load(f), root=library_dir))
+    gene_assembler = GeneAssembler("", "")
+    gene_assembler.load(pass_path)
+    return gene_assembler.get_isoform_counts()
+
+
 def save2json(dict2save, name, directory):
     """
     Serializes a dictionary to JSON and writes it to a file.
@@ -106,45 +159,68 @@ def save2json(dict2save, name, directory):
         directory (str): Output directory path.
     """
     Path(directory).mkdir(parents=True, exist_ok=True)
-    jsonOut = json.dumps(dict2save, ensure_ascii=False)
-    with open(f"{directory}/{name}.json", 'w') as out:
+    jsonOut = JSONBoy.dumps(dict2save)
+    with open(f"{directory}/{name}.json", 'w', encoding='utf-8') as out:
         out.write(jsonOut)
 
 
-def read_input(inpath):
+def read_input(inpath, importance_genes=None):
     """
     Reads and restructures the input JSON file into a nested gene-centric dictionary.
+    The annotation file is streamed protein by protein.
 
     Args:
         inpath (str): Path to the input JSON file.
+        importance_genes (dict | None): If given, it is filled with the feature count matrices of
+                                        get_domain_importance.py in the same pass.
 
     Returns:
         dict: Nested dictionary of structure:
               {gene_id: {protein_id: {'length': int, 'fmap': {int: (feature_type, start, end)}}}}
     """
     fa_map = {}
-    with open(inpath, 'r') as infile:
-        features = json.loads(infile.read())['feature']
-
-        for protid in features:
-            gid, pid, tid = protid.split('|')  # Extract gene, protein, and transcript IDs
-
-            if gid not in fa_map:
-                fa_map[gid] = {}
-
-            fa_map[gid][pid] = {'fmap': {}}
-            i = 0  # Instance index
-
-            for tool in features[protid]:
-                if tool == 'length':
-                    fa_map[gid][pid]['length'] = features[protid]['length']
-                else:
-                    for feature in features[protid][tool]:
-                        for instance in features[protid][tool][feature]['instance']:
-                            fa_map[gid][pid]['fmap'][i] = (feature, instance[0], instance[1])
-                            i += 1
+    proteins = {}
+    clans = {}
+
+    for key, value in JSONBoy.iter_object(inpath, nested=('feature',)):
+        if isinstance(key, tuple) and key[0] == 'feature':
+            add_protein(fa_map, key[1], value)
+            if importance_genes is not None:
+                get_domain_importance.add_protein(proteins, key[1], value)
+        elif key == 'clan':
+            clans = value
+
+    if importance_genes is not None:
+        importance_genes.update(get_domain_importance.build_matrices(proteins, clans))
     return fa_map
 
 
+def add_protein(fa_map, protid, annotation):
+    """
+    Adds the feature instances of one protein of the annotation file to the feature map.
+
+    Args:
+        fa_map (dict): Feature map as returned by read_input.
+        protid (str): Protein header (gene|protein|taxon).
+        annotation (dict): Annotation of the protein, {tool: {feature: {'instance': [...]}}, 'length': int}.
+    """
+    gid, pid, tid = protid.split('|')  # Extract gene, protein, and transcript IDs
+
+    if gid not in fa_map:
+        fa_map[gid] = {}
+
+    fa_map[gid][pid] = {'fmap': {}}
+    i = 0  # Instance index
+
+    for tool in annotation:
+        if tool == 'length':
+            fa_map[gid][pid]['length'] = annotation['length']
+        else:
+            for feature in annotation[tool]:
+                for instance in annotation[tool][feature]['instance']:
+                    fa_map[gid][pid]['fmap'][i] = (feature, instance[0], instance[1])
+                    i += 1
+
+
 if __name__ == '__main__':
     option_parse()
@@ -45,8 +45,7 @@ def download_gtf_and_peptides(outdir: str, species: str, release: int):
     )
 
     print("Downloading GTF and peptide FASTA datasets from Ensembl...")
-    gtf_path = local_ensembl.download()
-    pep_path = local_ensembl.download_pep()
+    gtf_path, pep_path = local_ensembl.download_all()
 
     # Get metadata
     species_name = local_ensembl.get_species_name()
@@ -1,7 +1,67 @@
 #!/bin/env python3
 
 import os
+import glob
 import argparse
+from collections import OrderedDict
+
+# Upper bound of simultaneously open per-gene output files. Stays well below the usual `ulimit -n` of 1024.
+DEFAULT_MAX_OPEN_FILES = 256
+# Write buffer per pooled per-gene handle (bytes). A full pool reserves max_open times this much.
+DEFAULT_BUFFER_SIZE = 64 * 1024
+# Write buffer of the few merged library-wide output files (bytes).
+MERGED_BUFFER_SIZE = 1024 * 1024
+
+
+class HandlePool:
+    """
+    LRU-bounded pool of open output file handles.
+
+    The first time a path is requested it is opened in write mode and the given header is written.
+    If the pool is full, the least recently used handle is closed. A path that was evicted before is
+    reopened in append mode, so no data is lost and the header is written exactly once.
+    """
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN_FILES, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.max_open = max(1, max_open)
+        self.buffer_size = buffer_size
+        self.handles = OrderedDict()
+        self.seen = set()
+
+    def write(self, path, header, line):
+        """
+        Write a line into the file at path, opening (or reopening) the file if necessary.
+        """
+        handle = self.handles.get(path)
+        if handle is None:
+            if len(self.handles) >= self.max_open:
+                _, oldest = self.handles.popitem(last=False)
+                oldest.close()
+            if path in self.seen:
+                handle = open(path, "a", buffering=self.buffer_size)
+            else:
+                handle = open(path, "w", buffering=self.buffer_size)
+                handle.write(header)
+                self.seen.add(path)
+            self.handles[path] = handle
+        else:
+            self.handles.move_to_end(path)
+        handle.write(line)
+
+    def __contains__(self, path):
+        return path in self.seen
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 def extract_gene_id(protein_id):
     """
@@ -11,133 +71,188 @@ def extract_gene_id(protein_id):
     """
     return protein_id.split("|")[0]
 
-def process_domains_low_memory(input_file, output_base, direction):
+
+def is_header(direction, line):
     """
-    Process a .domains file (forward or reverse) line-by-line.
-    Immediately write lines to the correct per-gene output file,
-    ensuring each file has the header once.
+    Whether a line is the header of a .domains ("# pairID ...") or .phyloprofile ("geneID ...") file.
     """
-    output_handles = {}
+    return line.startswith("geneID") if direction == "phyloprofile" else line.startswith("#")
+
+
+def gene_dir_path(output_base, gene, created_dirs):
+    """
+    Return the output directory of a gene and create it the first time the gene is seen.
+    """
+    gene_dir = os.path.join(output_base, gene)
+    if gene not in created_dirs:
+        os.makedirs(gene_dir, exist_ok=True)
+        created_dirs.add(gene)
+    return gene_dir
+
 
+def process_domains(input_file, output_base, direction, pool, created_dirs, all_genes):
+    """
+    Process a .domains file (forward or reverse) line-by-line.
+    Each line is written to the per-gene files of both genes in its pairID.
+    Returns the header line of the input file.
+    """
     with open(input_file, "r") as f:
-        header = next(f)  # Read and store the header line
+        header = next(f, "")  # Read and store the header line
 
         for line in f:
             if not line.strip():
                 continue  # Skip empty lines
 
-            pair_id = line.split("\t")[0]  # The pairID field
+            pair_id = line.split("\t", 1)[0]  # The pairID field
             prot1, prot2 = pair_id.split("#")  # Separate the two protein IDs
-            gene1 = extract_gene_id(prot1)
-            gene2 = extract_gene_id(prot2)
+            genes = (extract_gene_id(prot1), extract_gene_id(prot2))
+            all_genes.update(genes)
 
             # Write the line to both gene1 and gene2 output files
-            for gene in (gene1, gene2):
-                gene_dir = os.path.join(output_base, gene)
-                os.makedirs(gene_dir, exist_ok=True)
-
+            for gene in genes:
+                gene_dir = gene_dir_path(output_base, gene, created_dirs)
                 output_path = os.path.join(gene_dir, f"{gene}_{direction}.domains")
+                pool.write(output_path, header, line)
 
-                if gene not in output_handles:
-                    # First time seeing this gene: open file and write header
-                    out_f = open(output_path, "w")
-                    out_f.write(header)
-                    output_handles[gene] = out_f
-
-                # Write the current line into the gene's file
-                output_handles[gene].write(line)
+    return header
 
-    # Close all open files
-    for out_f in output_handles.values():
-        out_f.close()
 
-def process_phyloprofile_low_memory(input_file, output_base):
+def process_phyloprofile(input_file, output_base, pool, created_dirs, all_genes):
     """
-    Process a .phyloprofile file line-by-line.
-    Immediately write lines to the correct per-gene output file,
-    ensuring each file has the header once.
+    Process a .phyloprofile file line-by-line into per-gene output files.
     """
-    output_handles = {}
-
     with open(input_file, "r") as f:
-        header = next(f)  # Read and store the header line
+        header = next(f, "")  # Read and store the header line
 
         for line in f:
             if not line.strip():
                 continue  # Skip empty lines
 
-            parts = line.strip().split("\t")
-            gene_id = extract_gene_id(parts[0])
-
-            gene_dir = os.path.join(output_base, gene_id)
-            os.makedirs(gene_dir, exist_ok=True)
+            gene_id = extract_gene_id(line.split("\t", 1)[0])
+            all_genes.add(gene_id)
 
+            gene_dir = gene_dir_path(output_base, gene_id, created_dirs)
             output_path = os.path.join(gene_dir, f"{gene_id}.phyloprofile")
+            pool.write(output_path, header, line.rstrip("\n") + "\n")
+
+
+def route_partitions(partition_dir, merged_dir, output_base=None, max_open_files=DEFAULT_MAX_OPEN_FILES):
+    """
+    Stream the FAS_SCORING outputs of all partitions exactly once.
 
-            if gene_id not in output_handles:
-                # First time seeing this gene: open file and write header
-                out_f = open(output_path, "w")
-                out_f.write(header)
-                output_handles[gene_id] = out_f
+    Every line is appended to the library-wide forward.domains, reverse.domains and fas.phyloprofile
+    in merged_dir (one header each). If output_base is given, the per-gene files are produced in the
+    same pass, so no merged intermediate has to be written and split again.
+    """
+    os.makedirs(merged_dir, exist_ok=True)
+    targets = [
+        ("forward", "*_forward.domains", "forward.domains"),
+        ("reverse", "*_reverse.domains", "reverse.domains"),
+        ("phyloprofile", "*.phyloprofile", "fas.phyloprofile"),
+    ]
+
+    all_genes = set()
+    created_dirs = set()
+    headers = {}
+
+    with HandlePool(max_open_files) as pool:
+        for direction, pattern, merged_name in targets:
+            input_files = sorted(glob.glob(os.path.join(partition_dir, pattern)))
+            # Empty or header-less partitions (e.g. only cached pairs) must not hide the header of the others
+            header = ""
+            for input_file in input_files:
+                with open(input_file, "r") as f:
+                    file_header = next(f, "")
+                if is_header(direction, file_header):
+                    header = file_header
+                    break
+
+            with open(os.path.join(merged_dir, merged_name), "w", buffering=MERGED_BUFFER_SIZE) as merged:
+                merged.write(header)
+                for input_file in input_files:
+                    with open(input_file, "r") as f:
+                        for line in f:
+                            if not line.strip() or is_header(direction, line):
+                                continue  # Skip empty lines and repeated headers
+                            line = line.rstrip("\n") + "\n"
+                            merged.write(line)
 
-            # Write the current line into the gene's file
-            output_handles[gene_id].write(line + "\n")
+                            if direction == "phyloprofile":
+                                genes = {extract_gene_id(line.split("\t", 1)[0])}
+                                suffix = ".phyloprofile"
+                            else:
+                                prot1, prot2 = line.split("\t", 1)[0].split("#")
+                                genes = {extract_gene_id(prot1), extract_gene_id(prot2)}
+                                suffix = f"_{direction}.domains"
+                            all_genes.update(genes)
 
-    # Close all open files
-    for out_f in output_handles.values():
-        out_f.close()
+                            if output_base is not None:
+                                for gene in genes:
+                                    gene_dir = gene_dir_path(output_base, gene, created_dirs)
+                                    pool.write(os.path.join(gene_dir, gene + suffix), header, line)
 
-def main(batch_dir, output_base):
+            headers[direction] = header
+
+        if output_base is not None:
+            # Ensure forward/reverse files exist for all genes
+            for gene in all_genes:
+                gene_dir = gene_dir_path(output_base, gene, created_dirs)
+                for direction in ("forward", "reverse"):
+                    file_path = os.path.join(gene_dir, f"{gene}_{direction}.domains")
+                    if file_path not in pool:
+                        with open(file_path, "w") as f:
+                            f.write(headers[direction])
+
+    return all_genes
+
+
+def main(batch_dir, output_base, max_open_files=DEFAULT_MAX_OPEN_FILES):
     """
     Main function to split merged batch outputs into per-gene files.
-    Processes forward.domains, reverse.domains, and phyloprofile.
+    Every merged file is read exactly once. Gene IDs are collected during that same pass and
+    used afterwards to create header-only forward/reverse files for genes that lack them.
     """
     forward_file = os.path.join(batch_dir, "merged_forward.domains")
     reverse_file = os.path.join(batch_dir, "merged_reverse.domains")
     phyloprofile_file = os.path.join(batch_dir, "merged.phyloprofile")
 
     all_genes = set()
+    created_dirs = set()
+
+    with HandlePool(max_open_files) as pool:
+        forward_header = process_domains(forward_file, output_base, "forward", pool, created_dirs, all_genes)
+        reverse_header = process_domains(reverse_file, output_base, "reverse", pool, created_dirs, all_genes)
+        process_phyloprofile(phyloprofile_file, output_base, pool, created_dirs, all_genes)
 
-    # Collect gene IDs from all files
-    for file in [forward_file, reverse_file, phyloprofile_file]:
-        with open(file) as f:
-            next(f)  # skip header
-            for line in f:
-                if not line.strip():
-                    continue
-                if "phyloprofile" in file:
-                    gene = extract_gene_id(line.split("\t")[0])
-                    all_genes.add(gene)
-                else:
-                    prot1, prot2 = line.split("\t")[0].split("#")
-                    all_genes.update([extract_gene_id(prot1), extract_gene_id(prot2)])
-
-    # Process actual data
-    process_domains_low_memory(forward_file, output_base, direction="forward")
-    process_domains_low_memory(reverse_file, output_base, direction="reverse")
-    process_phyloprofile_low_memory(phyloprofile_file, output_base)
-
-    # Ensure forward/reverse files exist for all genes
-    with open(forward_file) as f:
-        forward_header = next(f)
-    with open(reverse_file) as f:
-        reverse_header = next(f)
-
-    for gene in all_genes:
-        for direction, header in [("forward", forward_header), ("reverse", reverse_header)]:
-            gene_dir = os.path.join(output_base, gene)
-            os.makedirs(gene_dir, exist_ok=True)
-            file_path = os.path.join(gene_dir, f"{gene}_{direction}.domains")
-            if not os.path.exists(file_path):
-                with open(file_path, "w") as f:
-                    f.write(header)
+        # Ensure forward/reverse files exist for all genes
+        for gene in all_genes:
+            gene_dir = gene_dir_path(output_base, gene, created_dirs)
+            for direction, header in [("forward", forward_header), ("reverse", reverse_header)]:
+                file_path = os.path.join(gene_dir, f"{gene}_{direction}.domains")
+                if file_path not in pool:
+                    with open(file_path, "w") as f:
+                        f.write(header)
 
 
 if __name__ == "__main__":
     # Command-line argument parsing
     parser = argparse.ArgumentParser(description="Split FAS batch output into per-gene files (memory-efficient).")
-    parser.add_argument("--batch_dir", required=True, help="Directory containing merged partition batch files")
-    parser.add_argument("--output_base", default="merged_output", help="Directory to save per-gene outputs")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--batch_dir", help="Directory containing merged partition batch files")
+    source.add_argument("--partition_dir",
+                        help="Directory containing the raw FAS_SCORING outputs of all partitions "
+                             "(*_forward.domains, *_reverse.domains, *.phyloprofile)")
+    parser.add_argument("--merged_dir", default="merged_fas",
+                        help="Directory for the library-wide forward.domains, reverse.domains and fas.phyloprofile "
+                             "(only used with --partition_dir)")
+    parser.add_argument("--output_base", default=None,
+                        help="Directory to save per-gene outputs. Optional with --partition_dir, "
+                             "defaults to 'merged_output' with --batch_dir")
+    parser.add_argument("--max_open_files", type=int, default=DEFAULT_MAX_OPEN_FILES,
+                        help="Maximum number of per-gene output files kept open at the same time")
 
     args = parser.parse_args()
-    main(args.batch_dir, args.output_base)
+    if args.partition_dir:
+        route_partitions(args.partition_dir, args.merged_dir, args.output_base, args.max_open_files)
+    else:
+        main(args.batch_dir, args.output_base or "merged_output", args.max_open_files)
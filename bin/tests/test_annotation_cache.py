@@ -0,0 +1,135 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import json
+import os
+import tempfile
+import unittest
+
+import annotation_cache
+from Classes.FASCache.AnnotationCache import AnnotationCache
+
+VERSION = {"pfam": {"version": "35.0"}}
+
+
+def make_entry(feature_id, instances):
+    return {"length": 10, "pfam": {feature_id: {"evalue": 0.001, "instance": [[1, 5, 0.001]] * instances}}}
+
+
+class TestAnnotationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "anno_cache.sqlite")
+        self.fasta_path = os.path.join(self.tmp.name, "transcript_set.fasta")
+        with open(self.fasta_path, "w") as f:
+            f.write(">G1|P1|9606\nMKV\nLL\n>G1|P2|9606\nMKA\n")
+        self.tools_path = os.path.join(self.tmp.name, "annoTools.txt")
+        with open(self.tools_path, "w") as f:
+            f.write("#linearized\nPfam\n")
+        self.config_key = AnnotationCache.make_config_key(self.tools_path, "", VERSION)
+        self.fresh = {
+            "feature": {"G1|P1|9606": make_entry("pfam_A", 2)},
+            "interproID": {"pfam_A": "IPR000001"},
+            "clan": {},
+            "count": {"pfam_A": 2},
+            "length": {"pfam_A": 20},
+            "version": VERSION,
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_only_uncached_sequences_are_annotated(self):
+        with open(self.path("previous.json"), "w") as f:
+            json.dump(self.fresh, f)
+        annotation_cache.add(self.fasta_path, self.cache_path, self.config_key, self.path("previous.json"))
+
+        # A new library with the sequence of G1|P1 under another header and one new sequence
+        with open(self.fasta_path, "w") as f:
+            f.write(">G2|P3|9606\nMKVLL\n>G2|P4|9606\nMKW\n")
+        annotation_cache.prepare(self.fasta_path, self.cache_path, self.config_key, self.path("reduced.fasta"),
+                                 self.path("cached.json"))
+        with open(self.path("reduced.fasta")) as f:
+            self.assertEqual(f.read(), ">G2|P4|9606\nMKW\n")
+
+        fresh = dict(self.fresh, feature={"G2|P4|9606": make_entry("pfam_B", 1)}, interproID={}, length={})
+        with open(self.path("fresh.json"), "w") as f:
+            json.dump(fresh, f)
+        annotation_cache.merge(self.fasta_path, self.cache_path, self.config_key, self.path("cached.json"),
+                               self.path("fresh.json"), self.path("annotations.json"))
+        with open(self.path("annotations.json")) as f:
+            merged = json.load(f)
+        self.assertEqual(set(merged["feature"]), {"G2|P3|9606", "G2|P4|9606"})
+        self.assertEqual(merged["count"], {"pfam_A": 2, "pfam_B": 1})
+        self.assertEqual(merged["interproID"], {"pfam_A": "IPR000001"})
+        self.assertEqual(merged["version"], VERSION)
+
+        with AnnotationCache(self.cache_path, self.config_key) as anno_cache:
+            self.assertEqual(len(anno_cache.lookup(annotation_cache.FASCache.hash_fasta(self.fasta_path))["feature"]), 2)
+
+    def test_other_tool_versions_are_refused(self):
+        hashes = {"G1|P1|9606": "hash"}
+        with AnnotationCache(self.cache_path, self.config_key) as anno_cache:
+            self.assertEqual(anno_cache.add(self.fresh, hashes), 1)
+            with self.assertRaises(ValueError):
+                anno_cache.add(dict(self.fresh, version={"pfam": {"version": "36.0"}}), hashes)
+        with AnnotationCache(self.cache_path, "other config") as anno_cache:
+            self.assertEqual(anno_cache.lookup(hashes)["feature"], {})
+
+    def test_tool_versions_are_part_of_the_key(self):
+        with open(self.path("previous.json"), "w") as f:
+            json.dump(self.fresh, f)
+        annotation_cache.add(self.fasta_path, self.cache_path, self.config_key, self.path("previous.json"))
+        self.assertEqual(annotation_cache.read_tool_versions(self.path("previous.json")), VERSION)
+
+        # Installed tools of another release must not reuse the cached annotations
+        other_key = AnnotationCache.make_config_key(self.tools_path, "", {"pfam": {"version": "36.0"}})
+        self.assertNotEqual(other_key, self.config_key)
+        annotation_cache.prepare(self.fasta_path, self.cache_path, other_key, self.path("reduced.fasta"),
+                                 self.path("cached.json"))
+        with open(self.path("reduced.fasta")) as f:
+            self.assertEqual(f.read().count(">"), 2)
+
+    def test_carried_annotations_without_cache(self):
+        carried = dict(self.fresh, feature={"G1|P1|9606": make_entry("pfam_A", 1),
+                                            "G9|P9|9606": make_entry("pfam_A", 1)})
+        with open(self.path("carried.json"), "w") as f:
+            json.dump(carried, f)
+        annotation_cache.prepare(self.fasta_path, "", self.config_key, self.path("reduced.fasta"),
+                                 self.path("cached.json"), self.path("carried.json"), VERSION)
+        with open(self.path("reduced.fasta")) as f:
+            self.assertEqual(f.read(), ">G1|P2|9606\nMKA\n")
+        with open(self.path("cached.json")) as f:
+            self.assertEqual(set(json.load(f)["feature"]), {"G1|P1|9606"})
+        self.assertFalse(os.path.exists(self.cache_path))
+
+        # Annotations of other tool versions are not carried over
+        annotation_cache.prepare(self.fasta_path, "", self.config_key, self.path("reduced.fasta"),
+                                 self.path("cached.json"), self.path("carried.json"), {"pfam": {"version": "36.0"}})
+        with open(self.path("reduced.fasta")) as f:
+            self.assertEqual(f.read().count(">"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
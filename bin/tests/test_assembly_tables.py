@@ -0,0 +1,62 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from Classes.AssemblyVisualizer.AssemblyTables import AssemblyTables
+
+
+def make_tables():
+    # Gene 0: T1, T2 and the excluded T3, gene 1: T4 alone
+    transcripts = {"_id": np.array(["T1", "T2", "T3", "T4"]),
+                   "biotype": np.array(["protein_coding", "protein_coding", "nonsense_mediated_decay",
+                                        "protein_coding"]),
+                   "tsl": np.array([1, 3, 2, 1]),
+                   "gene_index": np.array([0, 0, 0, 1]),
+                   "tags": np.array([[False], [True], [False], [False]])}
+    pairs = {"first": np.array([0, 1]), "second": np.array([1, 0]), "fas_score": np.array([0.25, 0.75])}
+    return AssemblyTables(transcripts, pairs, ["cds_start_NF"])
+
+
+class TestAssemblyTables(unittest.TestCase):
+
+    def test_fas_comparison(self):
+        df = make_tables().fas_comparison_dataframe(["cds_start_NF"])
+        self.assertEqual(df["tsl_dist"].tolist(), [2, 2])
+        self.assertEqual(df["complete_status"].tolist(), ["one incomplete"] * 2)
+        self.assertEqual(make_tables().get_included_counts().tolist(), [2, 1])
+
+    def test_cache_key(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tables.npz")
+            self.assertIsNone(AssemblyTables.load(path, "a"))
+            make_tables().save(path, "a")
+            self.assertIsNone(AssemblyTables.load(path, "b"))
+            tables = AssemblyTables.load(path, "a")
+            self.assertEqual(tables.tags, ["cds_start_NF"])
+            self.assertEqual(tables.pairs["fas_score"].tolist(), [0.25, 0.75])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+import calibrate_cost_model
+import partition_pairs
+
+
+class TestCalibrateCostModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_collect_and_fit(self):
+        stats = {"complexity": {"A": 1, "B": 4, "C": 9, "D": 2}, "length": {"A": 100, "B": 300, "C": 50, "D": 80},
+                 "tools": {}, "weights": {}}
+        partitions = [[("A", "B")], [("A", "C"), ("B", "D")], [("C", "D")], [("A", "D"), ("B", "C")]]
+        features = ["complexity_sum", "length_sum"]
+
+        trace_path = os.path.join(self.tmp.name, "execution_trace.txt")
+        with open(trace_path, "w") as trace:
+            trace.write("task_id\tname\tstatus\trealtime\n")
+            for i, pairs in enumerate(partitions):
+                part_dir = os.path.join(self.tmp.name, f"partition_{i}")
+                os.makedirs(part_dir)
+                with open(os.path.join(part_dir, f"partition_{i}.tsv"), "w") as f:
+                    f.write("".join(f"{p1}\t{p2}\n" for p1, p2 in pairs))
+                runtime = 3 + sum(2 * partition_pairs.complexity_sum_cost(p1, p2, stats)
+                                  + 0.5 * partition_pairs.length_sum_cost(p1, p2, stats) for p1, p2 in pairs)
+                trace.write(f"{i}\tSPICE:FAS_SCORING (partition_{i})\tCOMPLETED\t{runtime}s\n")
+
+        observations = calibrate_cost_model.collect_observations(trace_path, self.tmp.name, stats, features)
+        self.assertEqual([tag for tag, _, _ in observations], [f"partition_{i}" for i in range(4)])
+
+        weights, task_overhead, r_squared = calibrate_cost_model.fit_cost_model(observations, features)
+        self.assertAlmostEqual(weights["complexity_sum"], 2, places=5)
+        self.assertAlmostEqual(weights["length_sum"], 0.5, places=5)
+        self.assertAlmostEqual(task_overhead, 3, places=4)
+        self.assertAlmostEqual(r_squared, 1.0)
+
+        stats["weights"] = weights
+        self.assertAlmostEqual(partition_pairs.calibrated_cost("A", "B", stats), 2 * 5 + 0.5 * 400, places=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
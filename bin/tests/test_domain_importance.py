@@ -0,0 +1,94 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+import get_domain_importance
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+
+def annotation(pfam):
+    return {"length": 100, "pfam": {feature: {"instance": [[1, 2]] * count} for feature, count in pfam.items()}}
+
+
+ANNOTATIONS = {
+    "feature": {
+        "G1|P1|9606": annotation({"pfam_A": 2, "pfam_B": 1}),
+        "G1|P2|9606": annotation({"pfam_A": 1, "pfam_C": 1}),
+        "G1|P3|9606": annotation({"pfam_A": 2, "pfam_C": 1}),
+        "G2|P4|9606": annotation({"pfam_A": 1}),
+    },
+    "clan": {"pfam_B": "CL1", "pfam_C": "CL1"},
+}
+
+
+class TestDomainImportance(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "annotations.json")
+        with open(self.path, "w") as f:
+            JSONBoy.dump(ANNOTATIONS, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_variable_features_and_clans(self):
+        genes = get_domain_importance.read_input(self.path, None)
+        self.assertEqual(get_domain_importance.get_fdict(genes), {"pfam_A": ["G1"]})
+        # Features missing in an isoform are not variable by themselves, only lower counts are
+        genes = get_domain_importance.read_input(self.path, {"G1": ["P2", "P3"]})
+        self.assertEqual(get_domain_importance.get_fdict(genes), {"pfam_A": ["G1"]})
+        genes = get_domain_importance.read_input(self.path, {"G1": ["P1", "P3"]})
+        self.assertEqual(get_domain_importance.get_fdict(genes), {})
+
+    def test_matrix_cache(self):
+        cache = os.path.join(self.tmp.name, "matrices.npz")
+        genes = get_domain_importance.read_input(self.path, None, cache)
+        cached = get_domain_importance.load_matrices(cache, get_domain_importance.get_source_key(self.path))
+        self.assertEqual(set(cached), set(genes))
+        for gene in genes:
+            self.assertEqual(cached[gene]["columns"], genes[gene]["columns"])
+            self.assertTrue((cached[gene]["counts"] == genes[gene]["counts"]).all())
+        self.assertIsNone(get_domain_importance.load_matrices(cache, "outdated"))
+
+    def test_batch_writes_one_file_per_list(self):
+        lists = os.path.join(self.tmp.name, "lists")
+        os.mkdir(lists)
+        for name, isoforms in (("all", "P1;P2;P3"), ("constant", "P1;P3")):
+            with open(os.path.join(lists, name + ".tsv"), "w") as f:
+                f.write(f"gene_id\ttranscripts\nG1\t{isoforms}\n")
+        manifest = os.path.join(self.tmp.name, "manifest.tsv")
+        with open(manifest, "w") as f:
+            f.write("all\tlists/all.tsv\nconstant\tlists/constant.tsv\n")
+
+        for batch_path, workers in ((lists, 1), (manifest, 2)):
+            out = os.path.join(self.tmp.name, f"out_{workers}")
+            get_domain_importance.batch(self.path, out, batch_path, workers=workers)
+            with open(os.path.join(out, "important_features_all.json")) as f:
+                self.assertEqual(JSONBoy.load(f), {"pfam_A": ["G1"]})
+            with open(os.path.join(out, "important_features_constant.json")) as f:
+                self.assertEqual(JSONBoy.load(f), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
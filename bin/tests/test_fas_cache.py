@@ -0,0 +1,136 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+from Classes.FASCache.FASCache import FASCache
+import partition_pairs
+
+DOMAINS_HEADER = "# pairID\torthoID\tseqLen\tfeature\n"
+
+
+class TestFASCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "fas_cache.sqlite")
+        fasta_path = os.path.join(self.tmp.name, "transcript_set.fasta")
+        with open(fasta_path, "w") as f:
+            f.write(">G1|P1|9606\nMKV\nLL\n>G1|P2|9606\nMKA\n>G2|P3|9606\nMKVLL\n")
+        self.hashes = FASCache.hash_fasta(fasta_path)
+
+        self.files = {}
+        contents = {
+            "fas.phyloprofile": FASCache.phyloprofile_header + "G1|P1|9606\tncbi9606\tG1|P2|9606\t0.5\t0.75\n",
+            "forward.domains": DOMAINS_HEADER + "G1|P1|9606#G1|P2|9606\tG1|P1|9606\t5\tpfam_A\n",
+            "reverse.domains": DOMAINS_HEADER + "G1|P1|9606#G1|P2|9606\tG1|P2|9606\t3\tpfam_B\n",
+        }
+        for name, content in contents.items():
+            self.files[name] = os.path.join(self.tmp.name, name)
+            with open(self.files[name], "w") as f:
+                f.write(content)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_results(self, fas_cache):
+        return fas_cache.add_results(self.files["fas.phyloprofile"], self.files["forward.domains"],
+                                     self.files["reverse.domains"], self.hashes)
+
+    def test_sequences_are_hashed(self):
+        self.assertEqual(self.hashes["G1|P1|9606"], self.hashes["G2|P3|9606"])
+        self.assertNotEqual(self.hashes["G1|P1|9606"], self.hashes["G1|P2|9606"])
+
+    def test_results_are_reused_by_sequence(self):
+        with FASCache(self.cache_path, "config") as fas_cache:
+            self.assertEqual(self.add_results(fas_cache), 1)
+            self.assertEqual(self.add_results(fas_cache), 0)
+
+        with FASCache(self.cache_path, "other config") as fas_cache:
+            self.assertIsNone(fas_cache.get_scores(self.hashes["G1|P1|9606"], self.hashes["G1|P2|9606"]))
+
+        # G2|P3 has the sequence of G1|P1, so the pair is cached under other headers
+        pairings = [("G2", [("G2|P3|9606", "G1|P2|9606"), ("G2|P3|9606", "G2|P4|9606")])]
+        output_dir = os.path.join(self.tmp.name, "cached_fas")
+        with FASCache(self.cache_path, "config") as fas_cache:
+            remaining = list(partition_pairs.drop_cached_pairs(pairings, fas_cache, self.hashes, output_dir))
+        self.assertEqual(remaining, [("G2", [("G2|P3|9606", "G2|P4|9606")])])
+
+        with open(os.path.join(output_dir, "cached.phyloprofile")) as f:
+            self.assertEqual(f.read().splitlines()[1], "G2|P3|9606\tncbi9606\tG1|P2|9606\t0.5\t0.75")
+        with open(os.path.join(output_dir, "cached_forward.domains")) as f:
+            self.assertEqual(f.read(), DOMAINS_HEADER + "G2|P3|9606#G1|P2|9606\tG2|P3|9606\t5\tpfam_A\n")
+        with open(os.path.join(output_dir, "cached_reverse.domains")) as f:
+            self.assertEqual(f.read(), DOMAINS_HEADER + "G2|P3|9606#G1|P2|9606\tG1|P2|9606\t3\tpfam_B\n")
+
+    def test_reversed_pair_is_reused(self):
+        with FASCache(self.cache_path, "config") as fas_cache:
+            self.add_results(fas_cache)
+            scores, forward, reverse = fas_cache.get_pair(self.hashes["G1|P2|9606"], self.hashes["G2|P3|9606"],
+                                                          "G1|P2|9606", "G2|P3|9606")
+        self.assertEqual(scores, (0.75, 0.5))
+        self.assertEqual(forward, ["G1|P2|9606#G2|P3|9606\tG1|P2|9606\t3\tpfam_B\n"])
+        self.assertEqual(reverse, ["G1|P2|9606#G2|P3|9606\tG2|P3|9606\t5\tpfam_A\n"])
+
+    def test_domains_without_header(self):
+        for name in ("forward.domains", "reverse.domains"):
+            with open(self.files[name]) as f:
+                lines = f.readlines()[1:]
+            with open(self.files[name], "w") as f:
+                f.writelines(lines)
+
+        output_dir = os.path.join(self.tmp.name, "cached_fas")
+        with FASCache(self.cache_path, "config") as fas_cache:
+            self.add_results(fas_cache)
+            self.assertEqual(fas_cache.get_meta("forward_header"), "")
+            self.assertEqual(len(fas_cache.get_domain_lines(self.hashes["G1|P1|9606"], self.hashes["G1|P2|9606"],
+                                                            "forward", "G1|P1|9606", "G1|P2|9606")), 1)
+            list(partition_pairs.drop_cached_pairs([("G1", [("G1|P1|9606", "G1|P2|9606")])], fas_cache,
+                                                   self.hashes, output_dir))
+        self.assertEqual(sorted(os.listdir(output_dir)), ["cached.phyloprofile"])
+
+    def test_all_pairs_cached(self):
+        pairings = [("G1", [("G1|P1|9606", "G1|P2|9606")]), ("G2", [("G2|P3|9606", "G1|P2|9606")])]
+        cwd = os.getcwd()
+        with FASCache(self.cache_path, "config") as fas_cache:
+            self.add_results(fas_cache)
+            remaining = partition_pairs.drop_cached_pairs(pairings, fas_cache, self.hashes,
+                                                          os.path.join(self.tmp.name, "cached_fas"))
+            scored_pairs = partition_pairs.score_pairs(remaining, {"complexity": {}})
+        self.assertEqual(scored_pairs, [])
+
+        # FAS_SCORING still gets an (empty) pairing file with and without pre-partitioning
+        for partitions in (8, 0):
+            run_dir = os.path.join(self.tmp.name, f"run_{partitions}")
+            os.makedirs(run_dir)
+            os.chdir(run_dir)
+            try:
+                partition_pairs.write_partition_outputs(scored_pairs, partitions, "predicted_loads.tsv")
+            finally:
+                os.chdir(cwd)
+            with open(os.path.join(run_dir, "partition_0", "partition_0.tsv")) as f:
+                self.assertEqual(f.read(), "")
+            self.assertEqual(os.listdir(run_dir).count("partition_0"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import json
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+ASSEMBLY = {"name": "sample", "data": {"G1": {"ids": ["P1", "P2"], "expression": [1.0, 0.0]}, "G2": {}},
+            "replicates": [], "replicate_count": 0}
+
+
+class TestJSONBoy(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "assembly.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_streamed_output_matches_json_dump(self):
+        JSONBoy.save(self.path, JSONBoy.stream_data(ASSEMBLY))
+        self.assertEqual(self.read(), json.dumps(ASSEMBLY, separators=(",", ":")))
+        JSONBoy.save(self.path, JSONBoy.stream_data(ASSEMBLY), indent=4)
+        self.assertEqual(self.read(), json.dumps(ASSEMBLY, indent=4))
+        JSONBoy.save(self.path, iter([]))
+        self.assertEqual(self.read(), "{}")
+
+    def test_failed_write_keeps_previous_file(self):
+        JSONBoy.save(self.path, ASSEMBLY.items())
+        with self.assertRaises(TypeError):
+            JSONBoy.save(self.path, iter([("name", "other"), ("data", object())]))
+        self.assertEqual(json.loads(self.read()), ASSEMBLY)
+        self.assertEqual(os.listdir(self.tmp.name), ["assembly.json"])
+
+    def test_saved_file_mode(self):
+        umask = os.umask(0o022)
+        try:
+            JSONBoy.save(self.path, ASSEMBLY.items())
+            self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o644)
+            # An existing file keeps its permissions
+            os.chmod(self.path, 0o640)
+            JSONBoy.save(self.path, ASSEMBLY.items())
+            self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+        finally:
+            os.umask(umask)
+
+    def test_iter_object_streams_nested_members(self):
+        with open(self.path, "w") as f:
+            json.dump(ASSEMBLY, f, indent=2)
+        entries = list(JSONBoy.iter_object(self.path, nested=("data", "replicates"), chunk_size=5))
+        self.assertEqual(entries, [("name", "sample"), (("data", "G1"), ASSEMBLY["data"]["G1"]), (("data", "G2"), {}),
+                                   ("replicates", []), ("replicate_count", 0)])
+
+    def test_iter_object_reads_utf8(self):
+        data = {"Gén": {"description": "α-Tubulin ß"}}
+        with open(self.path, "wb") as f:
+            f.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self.assertEqual(list(JSONBoy.iter_object(self.path, chunk_size=3)), list(data.items()))
+
+    def test_iter_object_decodes_every_value_once(self):
+        data = {"a \\\" {[": "x\\\"}]" * 50, "n": -1.5e3, "t": True, "z": None,
+                "big": {"k": [[1, "]"], {"\\": "{"}] * 100}, "e": {}}
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=1)
+
+        decode = json.JSONDecoder.raw_decode
+        calls = []
+
+        def counting_decode(decoder, s, idx=0):
+            calls.append(idx)
+            return decode(decoder, s, idx)
+
+        with mock.patch.object(json.JSONDecoder, "raw_decode", counting_decode):
+            for chunk_size in (1, 2, 3, 7, 64):
+                calls.clear()
+                self.assertEqual(list(JSONBoy.iter_object(self.path, chunk_size=chunk_size)), list(data.items()))
+                self.assertEqual(len(calls), 2 * len(data))
+
+    def test_backends_agree(self):
+        default_backend = JSONBoy.backend
+        try:
+            results = []
+            for backend in JSONBoy.backends:
+                JSONBoy.set_backend(backend)
+                results.append(JSONBoy.loads(JSONBoy.dumps(ASSEMBLY)))
+        finally:
+            JSONBoy.set_backend(default_backend)
+        self.assertTrue(all(result == ASSEMBLY for result in results))
+        with self.assertRaises(ValueError):
+            JSONBoy.set_backend("unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
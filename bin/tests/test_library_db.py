@@ -0,0 +1,109 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import finish_setup
+import library_db
+import parse_domain_out
+import restructure_anno
+from Classes.LibraryDB.LibraryDB import LibraryDB
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+EXAMPLE_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "assets", "test_files",
+                               "example_test_library", "spice_lib_homo_sapiens_custom_3ee")
+
+
+class TestLibraryDB(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.library_dir = os.path.join(self.tmp.name, "library")
+        shutil.copytree(EXAMPLE_LIBRARY, self.library_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_json_files(self):
+        contents = {}
+        for root, _, files in os.walk(self.library_dir):
+            for file_name in files:
+                if file_name.endswith(".json") and file_name != "paths.json":
+                    path = os.path.join(root, file_name)
+                    with open(path) as f:
+                        contents[os.path.relpath(path, self.library_dir)] = json.load(f)
+        return contents
+
+    def test_convert_and_export(self):
+        original = self.read_json_files()
+        library_db.convert(self.library_dir)
+        _, pass_path = library_db.read_paths(self.library_dir)
+        self.assertTrue(LibraryDB.is_db_library(pass_path))
+
+        gene = GeneAssembler.load_gene(pass_path, "ENSG00000175329")
+        self.assertEqual(sorted(gene.get_fas_dict()), ["ENSP00000311492", "ENSP00000386037"])
+        self.assertIsNone(GeneAssembler.load_gene(pass_path, "missing"))
+        with LibraryDB.open_library(self.library_dir) as db:
+            self.assertEqual(db.get_gene_ids()[0], "ENSG00000175329")
+
+        with LibraryDB.open_library(self.library_dir) as db:
+            features, paths = db.get_architecture("ENSG00000175329")
+        self.assertEqual(sorted(features), ["ENSP00000311492", "ENSP00000386037"])
+        self.assertIn("ENSP00000386037@ENSP00000311492", paths)
+
+        os.remove(pass_path["transcript_info"])
+        shutil.rmtree(pass_path["fas_architectures"])
+        library_db.export(self.library_dir, detach=True)
+        self.assertIsNone(LibraryDB.library_db_path(self.library_dir))
+        self.assertEqual(self.read_json_files(), original)
+
+    def test_architectures_written_to_database(self):
+        _, pass_path = library_db.read_paths(self.library_dir)
+        fas_data = pass_path["fas_data"]
+        architectures = pass_path["fas_architectures"]
+        with open(os.path.join(architectures, "000000000_paths.json")) as f:
+            expected_paths = json.load(f)
+        library_db.convert(self.library_dir)
+        shutil.rmtree(architectures)
+
+        restructure_anno.main(os.path.join(fas_data, "annotations.json"), architectures, library_dir=self.library_dir)
+        parse_domain_out.main(os.path.join(fas_data, "forward.domains"), os.path.join(fas_data, "reverse.domains"),
+                              architectures, architectures, workers=2, library_dir=self.library_dir)
+        self.assertFalse(os.path.exists(architectures))
+        with LibraryDB.open_library(self.library_dir) as db:
+            for gene_id, paths in expected_paths.items():
+                self.assertEqual(db.get_architecture(gene_id)[1], paths)
+
+    def test_previous_scores_from_database(self):
+        _, pass_path = library_db.read_paths(self.library_dir)
+        from_json = finish_setup.load_previous_scores(pass_path, "9606")
+        library_db.convert(self.library_dir)
+        _, pass_path = library_db.read_paths(self.library_dir)
+        os.remove(pass_path["transcript_seq"])
+        self.assertEqual(finish_setup.load_previous_scores(pass_path, "9606"), from_json)
+        self.assertTrue(from_json[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
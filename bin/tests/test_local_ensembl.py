@@ -18,10 +18,41 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program. If not, see <https://www.gnu.org/licenses/>.
 #######################################################################
+import gzip
+import os
+import tempfile
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 from Classes.API.ensembl_mod.LocalEnsembl import LocalEnsembl
 
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files of the server's directory and honours "Range: bytes=<start>-" like the Ensembl FTP site.
+    """
+
+    def do_GET(self):
+        path = os.path.join(self.server.directory, self.path.lstrip("/"))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        self.server.ranges.append((self.path, self.headers.get("Range")))
+        start = int(self.headers["Range"][len("bytes="):-1]) if self.headers.get("Range") else 0
+        if start >= len(data) > 0:
+            self.send_error(416)
+            return
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
 class TestLocalEnsembl(unittest.TestCase):
 
     # === General logic ===
@@ -209,6 +240,77 @@ class TestLocalEnsembl(unittest.TestCase):
 
 
 
+class TestLocalEnsemblDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.served = tempfile.TemporaryDirectory()
+        self.goal = tempfile.TemporaryDirectory()
+        self.gtf = "".join(f"1\tensembl\tgene\t{i}\t{i + 10}\n" for i in range(20000)).encode("utf-8")
+        self.pep = b">P1\nMKV\n>P2\nMAL\n"
+        self.archives = {"a.gtf.gz": gzip.compress(self.gtf), "a.pep.all.fa.gz": gzip.compress(self.pep)}
+        for name, data in self.archives.items():
+            with open(os.path.join(self.served.name, name), "wb") as f:
+                f.write(data)
+        self.write_checksums()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        self.server.directory = self.served.name
+        self.server.ranges = list()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.served.cleanup()
+        self.goal.cleanup()
+
+    def write_checksums(self, wrong=False):
+        lines = list()
+        for name in self.archives:
+            checksum, blocks = LocalEnsembl.bsd_sum(os.path.join(self.served.name, name))
+            lines.append(f"{(checksum + wrong) % 65536:05d} {blocks:5d} {name}")
+        with open(os.path.join(self.served.name, "CHECKSUMS"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def make_local_ensembl(self):
+        le = LocalEnsembl(raw_species="anything", goal_directory=self.goal.name, metadata_mode="placeholder")
+        le.ftp_address, le.ftp_pep_address = self.url + "a.gtf.gz", self.url + "a.pep.all.fa.gz"
+        le.local_filename, le.local_pep_filename = "a.gtf", "a.pep.all.fa"
+        return le
+
+    def test_bsd_sum(self):
+        path = os.path.join(self.goal.name, "hello")
+        with open(path, "wb") as f:
+            f.write(b"hello\n")
+        self.assertEqual(LocalEnsembl.bsd_sum(path), (36979, 1))
+        with patch("shutil.which", return_value=None):
+            self.assertEqual(LocalEnsembl.bsd_sum(path), (36979, 1))
+
+    def test_download_all(self):
+        gtf_path, pep_path = self.make_local_ensembl().download_all()
+        with open(gtf_path, "rb") as f:
+            self.assertEqual(f.read(), self.gtf)
+        with open(pep_path, "rb") as f:
+            self.assertEqual(f.read(), self.pep)
+        self.assertEqual(sorted(os.listdir(self.goal.name)), ["a.gtf", "a.pep.all.fa"])
+
+    def test_resume(self):
+        half = len(self.archives["a.gtf.gz"]) // 2
+        with open(os.path.join(self.goal.name, "a.gtf.gz.part"), "wb") as f:
+            f.write(self.archives["a.gtf.gz"][:half])
+        with open(self.make_local_ensembl().download(), "rb") as f:
+            self.assertEqual(f.read(), self.gtf)
+        self.assertIn(("/a.gtf.gz", f"bytes={half}-"), self.server.ranges)
+        self.assertNotIn(("/a.gtf.gz", None), self.server.ranges)
+
+    def test_checksum_mismatch(self):
+        self.write_checksums(wrong=True)
+        le = self.make_local_ensembl()
+        with self.assertRaises(ValueError):
+            le.download()
+        self.assertFalse(le.is_downloaded())
+        self.assertEqual(os.listdir(self.goal.name), [])
+
 
 if __name__ == "__main__":
     unittest.main()
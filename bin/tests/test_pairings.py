@@ -0,0 +1,132 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import json
+import os
+import tempfile
+import unittest
+
+from Classes.SequenceHandling.Gene import Gene
+from Classes.SequenceHandling.Protein import Protein
+from Classes.PairBoy.PairBoy import PairBoy
+import finish_setup
+import partition_pairs
+
+
+def make_gene(protein_ids):
+    gene = Gene()
+    gene.set_id("G1")
+    for protein_id in protein_ids:
+        protein = Protein()
+        protein.set_id(protein_id)
+        protein.set_id_gene("G1")
+        protein.set_id_taxon(9606)
+        protein.set_biotype("protein_coding")
+        gene.add_transcript(protein, initial_add=True)
+    return gene
+
+
+class TestPairings(unittest.TestCase):
+
+    def test_pairs_are_unique_and_ordered(self):
+        gene = make_gene(["P1", "P2", "P3", "P4"])
+        pairs = list(gene.iter_pairings())
+        self.assertEqual(pairs, [("G1|P1|9606", "G1|P2|9606"), ("G1|P1|9606", "G1|P3|9606"),
+                                 ("G1|P1|9606", "G1|P4|9606"), ("G1|P2|9606", "G1|P3|9606"),
+                                 ("G1|P2|9606", "G1|P4|9606"), ("G1|P3|9606", "G1|P4|9606")])
+        self.assertEqual(gene.make_pairings(), "\n".join("\t".join(pair) for pair in pairs))
+        self.assertEqual(make_gene(["P1"]).make_pairings(), "")
+
+    def test_pair_boy_round_trip(self):
+        genes = [make_gene(["P1", "P2", "P3"]), make_gene(["P4"]), make_gene(["P5", "P6"])]
+        for gene, gene_id in zip(genes, ["G1", "G2", "G3"]):
+            gene.set_id(gene_id)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store_path = os.path.join(tmp, "transcript_pairings.bin")
+            PairBoy.write(store_path, ((gene.get_id(),) + gene.get_pairing_indices() for gene in genes))
+            self.assertTrue(PairBoy.is_pairboy(store_path))
+
+            pair_boy = PairBoy(store_path)
+            self.assertEqual(pair_boy.get_gene_ids(), ["G1", "G2", "G3"])
+            self.assertEqual(pair_boy.get_pairs("G3"), list(genes[2].iter_pairings()))
+            self.assertEqual(pair_boy.get_pairs("G2"), [])
+            self.assertEqual([pairs for _, pairs in pair_boy], [list(gene.iter_pairings()) for gene in genes])
+
+            tsv_path = os.path.join(tmp, "G1.tsv")
+            self.assertEqual(pair_boy.write_tsv("G1", tsv_path), 3)
+            with open(tsv_path) as f:
+                self.assertEqual(f.read(), genes[0].make_pairings())
+
+            partitioned = list(partition_pairs.iter_gene_pairings(store_path, ["G2"]))
+            self.assertEqual([gene_id for gene_id, _ in partitioned], ["G1", "G3"])
+
+
+    def test_scored_pairs_are_skipped(self):
+        gene = make_gene(["P1", "P2", "P3"])
+        gene.get_fas_dict()["P1"]["P2"] = 0.8
+        gene.get_fas_dict()["P2"]["P1"] = 0.9
+        self.assertEqual(list(gene.iter_pairings()), [("G1|P1|9606", "G1|P3|9606"), ("G1|P2|9606", "G1|P3|9606")])
+
+    def test_carried_results_are_renamed(self):
+        header = "# pairID\torthoID\tseqLen\tfeature\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            previous_dir = os.path.join(tmp, "previous")
+            current_dir = os.path.join(tmp, "current")
+            os.makedirs(previous_dir)
+            os.makedirs(current_dir)
+            with open(os.path.join(previous_dir, "forward.domains"), "w") as f:
+                f.write(header + "G|A|1#G|B|1\tG|B|1\t10\tpfam_X\n" + "G|A|1#G|C|1\tG|A|1\t10\tpfam_Y\n")
+            with open(os.path.join(previous_dir, "fas.phyloprofile"), "w") as f:
+                f.write("geneID\tncbiID\torthoID\tFAS_F\tFAS_B\n" + "G|A|1\tncbi1\tG|B|1\t0.5\t0.7\n")
+
+            # Two genes of the new library share the sequences of the previous pair
+            header_map = {("G|A|1", "G|B|1"): [("H|X|1", "H|Y|1"), ("I|X|1", "I|Y|1")]}
+            finish_setup.carry_over_fas_results(previous_dir, current_dir, header_map)
+
+            with open(os.path.join(current_dir, "carried_forward.domains")) as f:
+                self.assertEqual(f.read(), header + "H|X|1#H|Y|1\tH|Y|1\t10\tpfam_X\n"
+                                 + "I|X|1#I|Y|1\tI|Y|1\t10\tpfam_X\n")
+            with open(os.path.join(current_dir, "carried_fas.phyloprofile")) as f:
+                self.assertEqual(f.read().splitlines()[1:], ["H|X|1\tncbi1\tH|Y|1\t0.5\t0.7",
+                                                             "I|X|1\tncbi1\tI|Y|1\t0.5\t0.7"])
+            self.assertFalse(os.path.exists(os.path.join(current_dir, "carried_reverse.domains")))
+
+    def test_carried_annotations(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "annotations.json"), "w") as f:
+                json.dump({"feature": {"G|A|1": {"length": 10, "pfam": {"pfam_X": {"instance": [[1, 5, 0.1]]}}},
+                                       "G|B|1": {"length": 12, "pfam": {"pfam_Z": {"instance": [[1, 5, 0.1]]}}}},
+                           "interproID": {"pfam_X": "IPR1", "pfam_Z": "IPR2"}, "clan": {},
+                           "length": {"pfam_X": 5, "pfam_Z": 5}, "count": {"pfam_X": 1, "pfam_Z": 1},
+                           "version": {"pfam": {"version": "35.0"}}}, f)
+            count = finish_setup.carry_over_annotations(tmp, tmp, {"G|A|1": "hash_a", "G|B|1": "hash_b"},
+                                                        {"hash_a": ["H|X|1", "I|X|1"]})
+            with open(os.path.join(tmp, "carried_annotations.json")) as f:
+                carried = json.load(f)
+        self.assertEqual(count, 2)
+        self.assertEqual(set(carried["feature"]), {"H|X|1", "I|X|1"})
+        self.assertEqual(carried["interproID"], {"pfam_X": "IPR1"})
+        self.assertEqual(carried["count"], {"pfam_X": 2})
+        self.assertEqual(carried["version"], {"pfam": {"version": "35.0"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+import parse_domain_out
+import restructure_anno
+from Classes.JSONBoy.JSONBoy import JSONBoy
+
+HEADER = "# pairID\torthoID\tseqLen\tfeature\tfStart\tfEnd\tfWeight\tfPath\n"
+
+
+def domain_line(seed, query, ortho, feature, start, end):
+    return f"G{seed[1]}|{seed}|9606#G{query[1]}|{query}|9606\tG{ortho[1]}|{ortho}|9606\t100\t{feature}\t{start}\t{end}\t0.5\tY\n"
+
+
+class TestParseDomainOut(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.forward = os.path.join(self.tmp.name, "forward.domains")
+        self.reverse = os.path.join(self.tmp.name, "reverse.domains")
+        self.architectures = os.path.join(self.tmp.name, "architectures")
+        anno_path = os.path.join(self.tmp.name, "annotations.json")
+        features = dict()
+        for gene, proteins in (("G1", ("P1a", "P1b")), ("G2", ("P2a", "P2b"))):
+            for protein in proteins:
+                features[f"{gene}|{protein}|9606"] = {"length": 100, "pfam": {
+                    "pfam_A": {"instance": [[10, 20, 0.1], [30, 40, 0.1]]}, "pfam_B": {"instance": [[50, 60, 0.1]]}}}
+        with open(anno_path, "w") as f:
+            JSONBoy.dump({"feature": features}, f)
+        restructure_anno.main(anno_path, self.architectures, filesize=1)
+
+        # G1 occurs in two separate blocks, as after merging partitions
+        with open(self.forward, "w") as f:
+            f.write(HEADER)
+            f.write(domain_line("P1a", "P1b", "P1a", "pfam_A", 30, 40))
+            f.write(domain_line("P2a", "P2b", "P2b", "pfam_B", 50, 60))
+            f.write(domain_line("P1a", "P1b", "P1b", "pfam_A", 10, 20))
+        with open(self.reverse, "w") as f:
+            f.write(HEADER)
+            f.write(domain_line("P1a", "P1b", "P1b", "pfam_B", 50, 60))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_paths_of_non_contiguous_genes(self):
+        index = parse_domain_out.index_domains(self.forward)
+        self.assertEqual(len(index["G1"]), 2)
+        self.assertEqual(len(index["G2"]), 1)
+
+        parse_domain_out.main(self.forward, self.reverse, self.architectures, self.architectures)
+        with open(os.path.join(self.architectures, "000000000_paths.json")) as f:
+            self.assertEqual(JSONBoy.load(f), {"G1": {"P1a@P1b": [["1"], ["0"]], "P1b@P1a": [["2"], []]}})
+        with open(os.path.join(self.architectures, "000000001_paths.json")) as f:
+            self.assertEqual(JSONBoy.load(f), {"G2": {"P2a@P2b": [[], ["2"]]}})
+
+    def test_workers_write_the_same_shards(self):
+        parse_domain_out.main(self.forward, self.reverse, self.architectures, self.architectures)
+        serial = dict()
+        for name in ("000000000_paths.json", "000000001_paths.json"):
+            with open(os.path.join(self.architectures, name)) as f:
+                serial[name] = JSONBoy.load(f)
+            os.remove(os.path.join(self.architectures, name))
+
+        parse_domain_out.main(self.forward, self.reverse, self.architectures, self.architectures, workers=2)
+        for name, paths in serial.items():
+            with open(os.path.join(self.architectures, name)) as f:
+                self.assertEqual(JSONBoy.load(f), paths)
+
+
+if __name__ == "__main__":
+    unittest.main()
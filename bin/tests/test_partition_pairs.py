@@ -0,0 +1,76 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import json
+import os
+import tempfile
+import unittest
+
+import partition_pairs
+
+
+class TestPartitionPairs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pairings_path = os.path.join(self.tmp.name, "transcript_pairings.json")
+        pairings = {
+            "G1": "G1|P1|9606\tG1|P2|9606\nG1|P1|9606\tG1|P3|9606\nG1|P2|9606\tG1|P3|9606",
+            "G2": "G2|P4|9606\tG2|P5|9606",
+            "G3": "",
+        }
+        with open(self.pairings_path, "w") as f:
+            json.dump(pairings, f, indent=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_json_object_small_chunks(self):
+        with open(self.pairings_path) as f:
+            expected = list(json.load(f).items())
+        self.assertEqual(list(partition_pairs.iter_json_object(self.pairings_path, chunk_size=7)), expected)
+
+    def test_iter_gene_pairings_excludes_genes(self):
+        genes = dict(partition_pairs.iter_gene_pairings(self.pairings_path, ["G2"]))
+        self.assertEqual(set(genes), {"G1", "G3"})
+        self.assertEqual(len(genes["G1"]), 3)
+        self.assertEqual(genes["G3"], [])
+
+    def test_lpt_partition_balances_scores(self):
+        path_counts = {"G1|P1|9606": 10, "G1|P2|9606": 1, "G1|P3|9606": 1, "G2|P4|9606": 1, "G2|P5|9606": 1}
+        stats = {"complexity": path_counts, "length": {}, "tools": {}}
+        scored = partition_pairs.score_pairs(partition_pairs.iter_gene_pairings(self.pairings_path, []), stats)
+        self.assertEqual(len(scored), 4)
+        bins, totals = partition_pairs.lpt_partition(scored, 2)
+        self.assertEqual(sum(len(b) for b in bins), 4)
+        self.assertEqual(totals, [13, 13])
+        self.assertEqual([sum(path_counts[p1] + path_counts[p2] for _, _, p1, p2 in b) for b in bins], totals)
+
+    def test_cost_models(self):
+        stats = {"complexity": {"a": 2, "b": 3}, "length": {"a": 10, "b": 20},
+                 "tools": {"a": {"pfam": 2, "seg": 1}, "b": {"pfam": 1}}}
+        self.assertEqual(partition_pairs.complexity_sum_cost("a", "b", stats), 5)
+        self.assertEqual(partition_pairs.complexity_product_cost("a", "b", stats), 6)
+        self.assertEqual(partition_pairs.length_cost("a", "b", stats), 5 * 31)
+        self.assertEqual(partition_pairs.annotation_cost("a", "b", stats), 3 * 2 + 2 * 1 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import importlib.util
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# render_plots imports the visualizers, which need the plotting dependencies of the pipeline
+HAS_PLOTTING = all(importlib.util.find_spec(name) is not None for name in ("matplotlib", "plotly"))
+
+if HAS_PLOTTING:
+    import render_plots
+    from Classes.AssemblyVisualizer.AssemblyVisualizer import ResultVisualizer
+
+
+def fake_render(job):
+    with open(job["outfile"], "w") as f:
+        f.write("<svg/>")
+
+
+@unittest.skipUnless(HAS_PLOTTING, "matplotlib and plotly are required by render_plots")
+class TestRenderPlots(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp.name, "plots")
+        self.result_dir = os.path.join(self.tmp.name, "results")
+        os.makedirs(self.result_dir)
+        self.write(os.path.join(self.result_dir, "result.csv"), "gene\t0.5\n")
+        self.maximum = os.path.join(self.tmp.name, "max_rmsd.tsv")
+        self.write(self.maximum, "geneid\tall\nG1\t0.5\n")
+        self.config_path = os.path.join(self.tmp.name, "plots.json")
+        self.write_config(["rmsd_all", "rmsd_coding"])
+
+        # The figures themselves are stubbed, only the skipping logic is tested
+        self.patches = [mock.patch.object(render_plots, "render", side_effect=fake_render),
+                        mock.patch.object(ResultVisualizer, "extract_max_rmsd_file", return_value={"G1": 0.5}),
+                        mock.patch.object(ResultVisualizer, "import_rmsd_ranks", return_value=([[0.5]], [0.5]))]
+        self.render = self.patches[0].start()
+        for patch in self.patches[1:]:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    @staticmethod
+    def write(path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def write_config(self, names):
+        self.write(self.config_path, json.dumps({"plots": [
+            {"name": name, "type": "rmsd_distribution", "input": self.result_dir, "maximum": self.maximum,
+             "category": name.split("_")[1]} for name in names]}))
+
+    def rendered_names(self):
+        return sorted(os.path.basename(call[0][0]["outfile"]) for call in self.render.call_args_list)
+
+    def test_unchanged_figures_are_skipped(self):
+        self.assertEqual(render_plots.render_plots(self.config_path, self.output_dir), 2)
+        self.assertEqual(render_plots.render_plots(self.config_path, self.output_dir), 0)
+        self.assertEqual(render_plots.render_plots(self.config_path, self.output_dir, force_flag=True), 2)
+        self.assertEqual(self.render.call_count, 4)
+
+    def test_changed_input_is_rendered(self):
+        render_plots.render_plots(self.config_path, self.output_dir)
+        self.render.reset_mock()
+        # A different size invalidates the cached file hash even within the same mtime tick
+        time.sleep(0.01)
+        self.write(self.maximum, "geneid\tall\nG1\t0.75\n")
+        self.assertEqual(render_plots.render_plots(self.config_path, self.output_dir), 2)
+
+        # A deleted figure is rendered again, the other one is kept
+        self.render.reset_mock()
+        os.remove(os.path.join(self.output_dir, "rmsd_coding.svg"))
+        self.assertEqual(render_plots.render_plots(self.config_path, self.output_dir), 1)
+        self.assertEqual(self.rendered_names(), ["rmsd_coding.svg"])
+
+    def test_index_and_manifest_follow_the_config(self):
+        render_plots.render_plots(self.config_path, self.output_dir)
+        with open(os.path.join(self.output_dir, "index.html")) as f:
+            index = f.read()
+        self.assertIn("rmsd_all.svg", index)
+        self.assertIn("rmsd_coding.svg", index)
+
+        self.write_config(["rmsd_all"])
+        self.assertEqual(render_plots.render_plots(self.config_path, self.output_dir), 0)
+        with open(os.path.join(self.output_dir, render_plots.MANIFEST_NAME)) as f:
+            self.assertEqual(list(json.load(f)["figures"]), ["rmsd_all"])
+        with open(os.path.join(self.output_dir, "index.html")) as f:
+            self.assertNotIn("rmsd_coding", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+from Classes.AssemblyVisualizer import RMSDOptimizer as rmsd_optimizer
+from Classes.AssemblyVisualizer.RMSDOptimizer import RMSDOptimizer
+from Classes.JSONBoy.JSONBoy import JSONBoy
+from Classes.PassPath.PassPath import PassPath
+
+EXAMPLE_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "assets", "test_files",
+                               "example_test_library", "spice_lib_homo_sapiens_custom_3ee")
+
+DISTANCES = {"P1": {"P1": 1.0, "P2": 0.2, "P3": 0.9},
+             "P2": {"P1": 0.4, "P2": 1.0, "P3": 0.5},
+             "P3": {"P1": 0.7, "P2": 0.5, "P3": 1.0}}
+INFO = {"transcripts": {"P1": {"tags": [], "biotype": "protein_coding"},
+                        "P2": {"tags": ["incomplete"], "biotype": "protein_coding"},
+                        "P3": {"tags": [], "biotype": "nonsense_mediated_decay"}}}
+
+
+class TestRMSDOptimizer(unittest.TestCase):
+
+    def test_filter_variants(self):
+        optimizer = RMSDOptimizer(DISTANCES, INFO, pre_ewfd_flag=True)
+        self.assertEqual([round(max_rmsd, 2) for max_rmsd in optimizer.get_max_rmsds()], [0.7, 0.2, 0.7, 0.0])
+        # Without pre_ewfd_flag the filters are not applied
+        self.assertEqual([round(max_rmsd, 2) for max_rmsd in RMSDOptimizer(DISTANCES, INFO).get_max_rmsds()],
+                         [0.7] * 4)
+
+    def test_cut_off_row_is_not_finished(self):
+        header = ["geneid"] + [name for name, _, _ in RMSDOptimizer.variants]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rmsd.tsv")
+            with open(path, "w") as f:
+                f.write("\t".join(header) + "\nG1\t0.5\t0.5\t0.5\t0.5\nG2\t0.5\t0.5\t0.5\t0.")
+            self.assertEqual(rmsd_optimizer.read_finished_genes(path)[0], {"G1"})
+            with rmsd_optimizer.open_checkpoint(path, header, []) as f:
+                f.write("G2\t0.5\t0.5\t0.5\t0.5\n")
+            finished, rows = rmsd_optimizer.read_finished_genes(path)
+            self.assertEqual(finished, {"G1", "G2"})
+            self.assertEqual(len(rows), 2)
+
+    def test_batches_are_built_lazily(self):
+        with open(os.path.join(EXAMPLE_LIBRARY, "paths.json")) as f:
+            pass_path = PassPath(dict(JSONBoy.load(f), root=EXAMPLE_LIBRARY))
+        with open(pass_path["fas_index"]) as f:
+            gene_ids = list(JSONBoy.load(f).keys())[1:]
+        tasks = rmsd_optimizer.iter_tasks(pass_path, gene_ids, True)
+        self.assertNotIsInstance(tasks, list)
+        rows = [row for batch in rmsd_optimizer.run_tasks(tasks, 2) for row in batch]
+        self.assertEqual([row[0] for row in rows], gene_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+from Classes.AssemblyVisualizer.Scatterplot import Scatterplot
+
+# Every file lacks a gene of the others, so whichever file is listed first, later genes are numbered on the fly.
+# G2 occurs twice in b.csv, G3 and G4 occur in two files only (upper median), b.csv ends with an empty line.
+RESULTS = {"a.csv": ["G1", "G2", "G3"],
+           "b.csv": ["G2", "G4", "G1", "G2", ""],
+           "c.csv": ["G4", "G3", "G1"]}
+
+
+class TestScatterplot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name, gene_ids in RESULTS.items():
+            with open(os.path.join(self.tmp.name, name), "w") as f:
+                f.write("gene_id,score\n" + "\n".join(f"{gene_id},0.5" if gene_id else "" for gene_id in gene_ids))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_median_ranks(self):
+        # G1: [0, 2, 2], G2: [0, 1, 3], G3: [1, 2], G4: [0, 1]
+        self.assertEqual(Scatterplot.extract_median_ranks(self.tmp.name), {"G1": 2, "G2": 1, "G3": 2, "G4": 1})
+
+    def test_workers_give_the_same_ranks(self):
+        self.assertEqual(Scatterplot.extract_median_ranks(self.tmp.name, workers=2),
+                         Scatterplot.extract_median_ranks(self.tmp.name, workers=1))
+
+    def test_empty_directory(self):
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertEqual(Scatterplot.extract_median_ranks(empty), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
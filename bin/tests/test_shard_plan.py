@@ -0,0 +1,117 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import restructure_anno
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.ShardPlan.ShardPlan import ShardPlan
+
+EXAMPLE_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "assets", "test_files",
+                               "example_test_library", "spice_lib_homo_sapiens_custom_3ee")
+
+GENES = [("G%03d" % i, 1) for i in range(99)]
+GENES.insert(50, ("BIG", 200))
+
+
+class TestShardPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_large_gene_gets_own_shard(self):
+        plan = ShardPlan.build(GENES, target_bytes=65536)
+        shards = plan.get_shards()
+        self.assertEqual([gene for shard in shards for gene in shard], [gene for gene, _ in GENES])
+        self.assertIn(["BIG"], shards)
+        self.assertEqual(plan.get_file_count(), len(shards) - 1)
+        # The fixed size mode keeps exactly max_genes genes per file
+        capped = ShardPlan.build(GENES, target_bytes=2 ** 32, max_genes=10)
+        self.assertEqual([len(shard) for shard in capped.get_shards()], [10] * 10)
+
+    def test_extend_keeps_assigned_shards(self):
+        path = os.path.join(self.tmp.name, "shard_plan.json")
+        ShardPlan.build(GENES[:60], target_bytes=65536).save(path)
+        plan = ShardPlan.load_or_build(path, GENES + [("NEW", 3)])
+        stored = ShardPlan.load(path)
+        self.assertTrue(all(plan.get_shard(gene) == shard for gene, shard in stored.gene_shards.items()))
+        self.assertEqual(plan.get_shard("NEW"), plan.get_file_count())
+        self.assertGreater(plan.get_shard(GENES[60][0]), stored.get_file_count())
+        # Removed genes rebuild the plan with the stored target
+        rebuilt = ShardPlan.load_or_build(path, GENES[1:])
+        self.assertNotIn(GENES[0][0], rebuilt)
+        self.assertEqual(rebuilt.target_bytes, 65536)
+
+    def test_restructure_follows_plan(self):
+        plan_path = os.path.join(self.tmp.name, "shard_plan.json")
+        anno_path = os.path.join(self.tmp.name, "annotations.json")
+        out_path = os.path.join(self.tmp.name, "architectures")
+        os.mkdir(out_path)
+        ShardPlan.build([("G1", 1), ("G2", 1), ("G3", 1)], max_genes=1).save(plan_path)
+        features = {f"{gene}|P{i}|9606": {"length": 10, "pfam": {}} for gene in ("G1", "G3") for i in range(2)}
+        with open(anno_path, "w") as f:
+            json.dump({"feature": features}, f)
+        restructure_anno.main(anno_path, out_path, shard_plan_path=plan_path)
+        with open(os.path.join(out_path, "index.json")) as f:
+            index = json.load(f)
+        self.assertEqual(index, {"genes": {"G1": 0, "G3": 2}, "#files": 2})
+        self.assertEqual(sorted(os.listdir(out_path)), ["000000000.json", "000000001.json", "000000002.json",
+                                                        "index.json"])
+
+    def test_new_genes_get_the_same_shards_for_scores_and_architectures(self):
+        library_dir = os.path.join(self.tmp.name, "library")
+        shutil.copytree(EXAMPLE_LIBRARY, library_dir)
+        plan_path = os.path.join(library_dir, "fas_data", "shard_plan.json")
+        out_path = os.path.join(self.tmp.name, "architectures")
+        isoform_counts = restructure_anno.load_isoform_counts(library_dir)
+        ShardPlan.build(isoform_counts[:3], target_bytes=1024).save(plan_path)
+
+        restructure_anno.main(os.path.join(library_dir, "fas_data", "annotations.json"), out_path,
+                              shard_plan_path=plan_path, library_dir=library_dir)
+        with open(os.path.join(out_path, "index.json")) as f:
+            architecture_shards = json.load(f)["genes"]
+        # The extended plan is saved, so later producers see the new genes
+        self.assertEqual(len(ShardPlan.load(plan_path)), len(isoform_counts))
+
+        # fas_scores shards of the same genes, written with the plan as it was before restructure_anno.py
+        with open(os.path.join(library_dir, "paths.json")) as f:
+            pass_path = PassPath(dict(json.load(f), root=library_dir))
+        gene_assembler = GeneAssembler("", "")
+        gene_assembler.load(pass_path)
+        fas_files = dict()
+        for _, index, _ in GeneAssembler.fas_to_dict_iter(gene_assembler.gene_assembly,
+                                                          ShardPlan.build(isoform_counts[:3], target_bytes=1024)):
+            fas_files.update(index)
+        self.assertGreater(len(set(fas_files.values())), 1)
+        self.assertEqual({gene_id: ShardPlan.get_shard_name(shard) + ".json"
+                          for gene_id, shard in architecture_shards.items()},
+                         {gene_id: fas_files[gene_id] for gene_id in architecture_shards})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+import split_batches
+
+DOMAINS_HEADER = "# pairID\torthoID\tseqLen\tfeature\n"
+PHYLO_HEADER = "geneID\tncbiID\torthoID\tFAS_F\tFAS_B\n"
+
+
+class TestSplitBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.batch_dir = os.path.join(self.tmp.name, "batch")
+        self.out_dir = os.path.join(self.tmp.name, "out")
+        os.makedirs(self.batch_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, header, lines):
+        with open(os.path.join(self.batch_dir, name), "w") as f:
+            f.write(header + "".join(line + "\n" for line in lines))
+
+    def read(self, gene, suffix):
+        with open(os.path.join(self.out_dir, gene, gene + suffix)) as f:
+            return f.read().splitlines()
+
+    def test_handle_pool_reopens_in_append_mode(self):
+        paths = [os.path.join(self.tmp.name, f"{i}.txt") for i in range(3)]
+        with split_batches.HandlePool(max_open=2) as pool:
+            for _ in range(2):
+                for path in paths:
+                    pool.write(path, "header\n", "line\n")
+            self.assertLessEqual(len(pool.handles), 2)
+        for path in paths:
+            with open(path) as f:
+                self.assertEqual(f.read(), "header\nline\nline\n")
+
+    def test_split_and_backfill(self):
+        g1 = "G1|P1|9606#G1|P2|9606"
+        g2 = "G2|P3|9606#G2|P4|9606"
+        self.write("merged_forward.domains", DOMAINS_HEADER, [g1 + "\tG1|P1|9606\t10\tpfam_A",
+                                                              g2 + "\tG2|P3|9606\t10\tpfam_B"])
+        self.write("merged_reverse.domains", DOMAINS_HEADER, [g1 + "\tG1|P2|9606\t10\tpfam_A"])
+        self.write("merged.phyloprofile", PHYLO_HEADER, ["G1|P1|9606\tncbi9606\tG1|P2|9606\t1.0\t1.0",
+                                                         "G3|P5|9606\tncbi9606\tG3|P6|9606\t0.5\t0.5"])
+
+        split_batches.main(self.batch_dir, self.out_dir, max_open_files=1)
+
+        self.assertEqual(self.read("G1", "_forward.domains")[0], DOMAINS_HEADER.rstrip("\n"))
+        self.assertEqual(len(self.read("G1", "_forward.domains")), 3)
+        self.assertEqual(self.read("G2", "_reverse.domains"), [DOMAINS_HEADER.rstrip("\n")])
+        self.assertEqual(self.read("G3", "_forward.domains"), [DOMAINS_HEADER.rstrip("\n")])
+        self.assertEqual(len(self.read("G3", ".phyloprofile")), 2)
+
+    def test_route_partitions(self):
+        self.write("partition_0_forward.domains", DOMAINS_HEADER, ["G1|P1|9606#G1|P2|9606\tG1|P1|9606\t10\tpfam_A"])
+        self.write("partition_1_forward.domains", DOMAINS_HEADER, ["G2|P3|9606#G2|P4|9606\tG2|P3|9606\t10\tpfam_B",
+                                                                   "G1|P2|9606#G1|P1|9606\tG1|P2|9606\t10\tpfam_A"])
+        self.write("partition_0_reverse.domains", DOMAINS_HEADER, [])
+        self.write("partition_0.phyloprofile", PHYLO_HEADER, ["G1|P1|9606\tncbi9606\tG1|P2|9606\t1.0\t1.0"])
+        self.write("partition_1.phyloprofile", PHYLO_HEADER, ["G2|P3|9606\tncbi9606\tG2|P4|9606\t0.5\t0.5"])
+        merged_dir = os.path.join(self.tmp.name, "merged")
+
+        genes = split_batches.route_partitions(self.batch_dir, merged_dir, self.out_dir)
+
+        self.assertEqual(genes, {"G1", "G2"})
+        with open(os.path.join(merged_dir, "forward.domains")) as f:
+            forward = f.read().splitlines()
+        self.assertEqual(forward[0], DOMAINS_HEADER.rstrip("\n"))
+        self.assertEqual(len(forward), 4)
+        with open(os.path.join(merged_dir, "fas.phyloprofile")) as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+        self.assertEqual(len(self.read("G1", "_forward.domains")), 3)
+        self.assertEqual(self.read("G2", "_reverse.domains"), [DOMAINS_HEADER.rstrip("\n")])
+
+    def test_route_partitions_empty_first_file(self):
+        # cached_* sorts before partition_*, the first file is empty and the second has no header
+        self.write("cached_forward.domains", "", [])
+        self.write("cached_reverse.domains", "", ["G1|P1|9606#G1|P2|9606\tG1|P2|9606\t10\tpfam_A"])
+        self.write("partition_0_forward.domains", DOMAINS_HEADER, ["G1|P1|9606#G1|P2|9606\tG1|P1|9606\t10\tpfam_A"])
+        self.write("partition_0_reverse.domains", DOMAINS_HEADER, [])
+        self.write("partition_0.phyloprofile", PHYLO_HEADER, ["G1|P1|9606\tncbi9606\tG1|P2|9606\t1.0\t1.0"])
+        merged_dir = os.path.join(self.tmp.name, "merged")
+
+        split_batches.route_partitions(self.batch_dir, merged_dir, self.out_dir)
+
+        for name in ("forward.domains", "reverse.domains"):
+            with open(os.path.join(merged_dir, name)) as f:
+                self.assertEqual(f.read().splitlines(), [DOMAINS_HEADER.rstrip("\n"),
+                                                         "G1|P1|9606#G1|P2|9606\tG1|P%d|9606\t10\tpfam_A"
+                                                         % (1 if name.startswith("forward") else 2)])
+        self.assertEqual(self.read("G1", "_reverse.domains")[0], DOMAINS_HEADER.rstrip("\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
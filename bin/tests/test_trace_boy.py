@@ -0,0 +1,69 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2025 Felix Haidle
+#
+# This file is part of spice_library_pipeline.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.
+#######################################################################
+import os
+import tempfile
+import unittest
+
+from Classes.TraceBoy.TraceBoy import TraceBoy
+import evaluate_partitions
+
+TRACE_HEADER = "task_id\thash\tnative_id\tname\tstatus\texit\tsubmit\tduration\trealtime\n"
+PREFIX = "BIONF_SPICE_LIBRARY_PIPELINE:SPICE_LIBRARY_PIPELINE:"
+
+
+class TestTraceBoy(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.trace_path = os.path.join(self.tmp.name, "execution_trace.txt")
+        rows = [
+            ("1", PREFIX + "SEED_PARALLELIZATION", "COMPLETED", "5s"),
+            ("2", PREFIX + "FAS_SCORING (partition_0)", "COMPLETED", "1m 30s"),
+            ("3", PREFIX + "FAS_SCORING (partition_1)", "FAILED", "2s"),
+            ("4", PREFIX + "FAS_SCORING (partition_1)", "COMPLETED", "45s"),
+            ("5", PREFIX + "FAS_SCORING (partition_2)", "CACHED", "500ms"),
+        ]
+        with open(self.trace_path, "w") as f:
+            f.write(TRACE_HEADER)
+            for task_id, name, status, realtime in rows:
+                f.write(f"{task_id}\tab/cdef\t1\t{name}\t{status}\t0\t-\t-\t{realtime}\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_duration(self):
+        self.assertEqual(TraceBoy.parse_duration("1h 2m 3s"), 3723.0)
+        self.assertAlmostEqual(TraceBoy.parse_duration("688ms"), 0.688)
+        self.assertIsNone(TraceBoy.parse_duration("-"))
+
+    def test_task_runtimes(self):
+        runtimes = TraceBoy(self.trace_path).get_task_runtimes("FAS_SCORING")
+        self.assertEqual(runtimes, {"partition_0": 90.0, "partition_1": 45.0, "partition_2": 0.5})
+
+    def test_compare_with_predicted_loads(self):
+        observed = TraceBoy(self.trace_path).get_task_runtimes("FAS_SCORING")
+        rows = evaluate_partitions.compare({"partition_0": 20, "partition_1": 10, "partition_3": 5}, observed)
+        self.assertEqual(rows, [("partition_0", 20, 90.0), ("partition_1", 10, 45.0)])
+        self.assertAlmostEqual(evaluate_partitions.pearson([20, 10, 1], [90.0, 45.0, 4.5]), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
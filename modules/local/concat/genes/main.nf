@@ -6,9 +6,11 @@ process CONCAT_GENES {
 
 
     input:
-    path fas_scores_dir
+    path merged_fas_dir
     path spice_library
     val outdir
+    val fas_cache
+    val score_options
 
     output:
     path "${spice_library}"       , emit: finished_library
@@ -23,68 +25,17 @@ process CONCAT_GENES {
 
     """
 
-    # Convert fas_scores_dir input (which could be multiple paths) into a bash array
-    fas_dirs=(${fas_scores_dir})
-
-
-    # Find the first valid .phyloprofile file
-    echo "Looking for a .phyloprofile file in gene directories..."
-
-    found_header=0  # Flag to track if the header was found
-
-    for subdir in "\${fas_dirs[@]}"; do
-        # Extract gene directory name (basename)
-        gene_id=\$(basename "\${subdir}")
-
-        # Construct the expected .phyloprofile file path
-        phyloprofile_file="\${subdir}/\${gene_id}.phyloprofile"
-
-        if [[ -f "\${phyloprofile_file}" ]]; then
-            echo "Found .phyloprofile file: \${phyloprofile_file}"
-
-            # Extract the first line (header)
-            header=\$(head -n 1 "\${phyloprofile_file}")
-
-            # Ensure the output directory exists
-            mkdir -p "${spice_library}/fas_data/"
-
-            # Write the header to fas.phyloprofile
-            echo "\${header}" > "${spice_library}/fas_data/fas.phyloprofile"
-
-            echo "Extracted header and saved to ${spice_library}/fas_data/fas.phyloprofile"
-            found_header=1
-            break  # Stop searching after the first valid file is found
+    # Move the library-wide FAS outputs into the library
+    mkdir -p "${spice_library}/fas_data/"
+    for fas_file in fas.phyloprofile forward.domains reverse.domains; do
+        cp "${merged_fas_dir}/\${fas_file}" "${spice_library}/fas_data/\${fas_file}"
+        # Append results carried over from a previous library (finish_setup.py --previous_library)
+        if [ -f "${spice_library}/fas_data/carried_\${fas_file}" ]; then
+            tail -n +2 "${spice_library}/fas_data/carried_\${fas_file}" >> "${spice_library}/fas_data/\${fas_file}"
+            rm "${spice_library}/fas_data/carried_\${fas_file}"
         fi
     done
 
-    # Check if we successfully found a .phyloprofile file
-    if [[ \$found_header -eq 0 ]]; then
-        echo "Warning: No .phyloprofile file found in any gene directory!"
-    fi
-
-    # Count how many directories we have
-    total=\${#fas_dirs[@]}
-    count=0
-
-    for subdir in "\${fas_dirs[@]}"; do
-        # Increment the counter
-        count=\$((count + 1))
-
-        # Extract the name of the subdirectory
-        gene_id=\${subdir}
-
-        echo "[\$count/\$total] Starting: Concatenation for gene \${gene_id}"
-
-
-        FASResultHandler.py \
-            --mode concat \
-            --gene_id "\${gene_id}" \
-            --out_dir "\${gene_id}" \
-            --anno_dir "${spice_library}/fas_data/"
-
-        echo "[\$count/\$total] Finished: Concatenation for gene \${gene_id}"
-    done
-
     echo "Starting FAS score integration"
 
         FASResultHandler.py \
@@ -94,12 +45,22 @@ process CONCAT_GENES {
 
         echo "FAS score integration completed."
 
-    echo "Processing complete. All \$total genes processed."
+    echo "Processing complete."
     parse_domain_out.py \
     -f "${spice_library}/fas_data/forward.domains" \
     -r "${spice_library}/fas_data/reverse.domains" \
     -m "${spice_library}/fas_data/architectures" \
-    -o "${spice_library}/fas_data/architectures/"
+    -o "${spice_library}/fas_data/architectures/" \
+    -w ${task.cpus} \
+    -l "${spice_library}"
+
+    if [ -n "${fas_cache}" ]; then
+        # Make the results of this library available to later builds
+        fas_cache.py \
+            --library_dir "${spice_library}" \
+            --cache "${fas_cache}" \
+            --score_options '${score_options}'
+    fi
 
 
     cat <<-END_VERSIONS > versions.yml
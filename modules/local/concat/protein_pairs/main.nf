@@ -11,7 +11,7 @@ process CONCAT_PROTEIN_PAIRS {
 
 
     output:
-    path "merged_genes/*"         , emit: genes_directorys
+    path "merged_fas"             , emit: merged_fas_dir
     path "versions.yml"           , emit: versions
 
     when:
@@ -23,23 +23,9 @@ process CONCAT_PROTEIN_PAIRS {
 
     """
 
-    mkdir -p merged_tmp
-    mkdir -p merged_genes
-
-    # Merge forward.domains safely
-    head -n 1 \$(ls *_forward.domains | head -n 1) > merged_tmp/merged_forward.domains
-    tail -n +2 -q *_forward.domains >> merged_tmp/merged_forward.domains
-
-    # Merge reverse.domains safely
-    head -n 1 \$(ls *_reverse.domains | head -n 1) > merged_tmp/merged_reverse.domains
-    tail -n +2 -q *_reverse.domains >> merged_tmp/merged_reverse.domains
-
-    # Merge phyloprofile safely
-    head -n 1 \$(ls *.phyloprofile | head -n 1) > merged_tmp/merged.phyloprofile
-    tail -n +2 -q *.phyloprofile >> merged_tmp/merged.phyloprofile
-
-    # Now run the Python script
-    split_batches.py --batch_dir merged_tmp --output_base merged_genes
+    # Stream all partition outputs once into the library-wide
+    # forward.domains, reverse.domains and fas.phyloprofile files
+    split_batches.py --partition_dir . --merged_dir merged_fas
 
 
     cat <<-END_VERSIONS > versions.yml
@@ -9,6 +9,7 @@ process FAS_ANNOTATION {
     path anno_tools         // Path: Path to annotation tools folder
     path spice_library_dir  // Path: Library generated by spice_library.py
     path anno_tools_file    // Path: Path to annotation tools file
+    val anno_cache          // String: Annotation cache SQLite file, empty to annotate all sequences
 
 
     output:
@@ -27,14 +28,63 @@ process FAS_ANNOTATION {
     # run the annotaion
     source "${anno_tools}/fas.profile"
 
-    fas.doAnno \
-        -i "${spice_library_dir}/transcript_data/transcript_set.fasta" \
-        -o "${spice_library_dir}/fas_data/" \
-        -t "${anno_tools}" \
-        --annoToolFile "${anno_tools_file}" \
-        -n annotations \
-        --cpus ${task.cpus} \
-        ${args}
+    carried="${spice_library_dir}/fas_data/carried_annotations.json"
+    if [ -n "${anno_cache}" ] || [ -f "\${carried}" ]; then
+        # annotate the first sequence to learn the installed tool versions, they are part of the cache key
+        awk '/^>/ {n++} n == 1' "${spice_library_dir}/transcript_data/transcript_set.fasta" > probe.fasta
+        fas.doAnno \
+            -i probe.fasta \
+            -o probe_annotations/ \
+            -t "${anno_tools}" \
+            --annoToolFile "${anno_tools_file}" \
+            -n annotations \
+            --cpus 1 \
+            ${args}
+
+        # only annotate sequences that are neither in the annotation cache nor carried over from a previous library
+        annotation_cache.py prepare \
+            --fasta "${spice_library_dir}/transcript_data/transcript_set.fasta" \
+            --cache "${anno_cache}" \
+            --anno_tools_file "${anno_tools_file}" \
+            --options="${args}" \
+            --versions_json probe_annotations/annotations.json \
+            --carried_json "\${carried}" \
+            --reduced_fasta reduced.fasta \
+            --cached_json cached_annotations.json
+
+        if [ -s reduced.fasta ]; then
+            fas.doAnno \
+                -i reduced.fasta \
+                -o fresh_annotations/ \
+                -t "${anno_tools}" \
+                --annoToolFile "${anno_tools_file}" \
+                -n annotations \
+                --cpus ${task.cpus} \
+                ${args}
+        fi
+
+        annotation_cache.py merge \
+            --fasta "${spice_library_dir}/transcript_data/transcript_set.fasta" \
+            --cache "${anno_cache}" \
+            --anno_tools_file "${anno_tools_file}" \
+            --options="${args}" \
+            --versions_json probe_annotations/annotations.json \
+            --cached_json cached_annotations.json \
+            --fresh_json fresh_annotations/annotations.json \
+            --output "${spice_library_dir}/fas_data/annotations.json"
+
+        # the carried annotations are part of annotations.json now
+        rm -f "\${carried}"
+    else
+        fas.doAnno \
+            -i "${spice_library_dir}/transcript_data/transcript_set.fasta" \
+            -o "${spice_library_dir}/fas_data/" \
+            -t "${anno_tools}" \
+            --annoToolFile "${anno_tools_file}" \
+            -n annotations \
+            --cpus ${task.cpus} \
+            ${args}
+    fi
 
 
     cat <<-END_VERSIONS > versions.yml
@@ -1,4 +1,5 @@
 process FAS_SCORING {
+    tag "${protein_pair.baseName}"
     label 'fas_scoring'
 
     input:
@@ -15,6 +15,7 @@ process LIBRARY_INITIALIZATION {
     path anno_tools
     val taxon_id
     val exclude_genes
+    val previous_library
 
     output:
     path 'spice_lib_*'                          , emit: library_dir
@@ -37,7 +38,8 @@ process LIBRARY_INITIALIZATION {
     --species ${species} \
     --release ${release} \
     --modefas ${anno_tools} \
-    --taxon_id ${taxon_id}
+    --taxon_id ${taxon_id} \
+    ${args}
 
 
     filter_library.py \
@@ -46,7 +48,8 @@ process LIBRARY_INITIALIZATION {
 
     finish_setup.py \
     --library_dir spice_lib_* \
-    --force_gene_ids "${exclude_genes}"
+    --force_gene_ids "${exclude_genes}" \
+    ${previous_library ? "--previous_library ${previous_library}" : ''}
 
 
     cat <<-END_VERSIONS > versions.yml
@@ -20,13 +20,13 @@ process LIBRARY_RESTRUCTURE {
 
 
     """
-    get_domain_importance.py \
-    -i "${annotated_library}/fas_data/annotations.json" \
-    -o "${annotated_library}/fas_data/"
-
+    # Architecture shards and important_features.json in one pass over annotations.json
     restructure_anno.py \
     -i "${annotated_library}/fas_data/annotations.json" \
-    -o "${annotated_library}/fas_data/architectures"
+    -o "${annotated_library}/fas_data/architectures" \
+    -p "${annotated_library}/fas_data/shard_plan.json" \
+    -d "${annotated_library}/fas_data/" \
+    -l "${annotated_library}"
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -10,10 +10,15 @@ process SEED_PARALLELIZATION {
     path spice_library
     val available_cpus
     val exclude_genes
+    val fas_cache
+    val score_options
+    val cost_model_json
 
     output:
     path 'partition_*'          , emit: partition_ch
     path 'partition_*/*'        , emit: protein_pairings_ch
+    path 'predicted_loads.tsv'  , emit: predicted_loads, optional: true
+    path 'cached_fas/*'         , emit: cached_fas, optional: true
 
     path "versions.yml"           , emit: versions
 
@@ -26,17 +31,16 @@ process SEED_PARALLELIZATION {
 
     """
 
-    mkdir protein_pairings
-
-
-
     partition_pairs.py \
-        --pairings_json ${spice_library}/transcript_data/transcript_pairings.json\
+        --pairings ${spice_library}/transcript_data/transcript_pairings.bin \
         --paths_file ${complexity_txt}\
-        --tmp_dir protein_pairings \
         --partitions ${available_cpus} \
         --exclude_gene_ids "${exclude_genes}" \
-
+        --annotations ${spice_library}/fas_data/annotations.json \
+        --load_report predicted_loads.tsv \
+        ${fas_cache ? "--fas_cache ${fas_cache} --library_dir ${spice_library} --score_options '${score_options}'" : ''} \
+        ${cost_model_json ? "--cost_model_json ${cost_model_json}" : ''} \
+        ${args}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
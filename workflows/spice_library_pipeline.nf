@@ -130,14 +130,18 @@ workflow SPICE_LIBRARY_PIPELINE {
             prefixes,
             anno_tools_ch,
             metadata_ch.taxon_id,
-            params.exclude_genes
+            params.exclude_genes,
+            params.previous_library ? file(params.previous_library).toString() : ''
         )
         ch_versions = ch_versions.mix(LIBRARY_INITIALIZATION.out.versions)
 
+        anno_cache = params.anno_cache ? file(params.anno_cache).toString() : ''
+
         annotated_library = FAS_ANNOTATION(
             anno_tools,
             create_library.library_dir,
-            anno_tools_ch
+            anno_tools_ch,
+            anno_cache
         )
 
         ch_versions = ch_versions.mix(FAS_ANNOTATION.out.versions)
@@ -157,12 +161,24 @@ workflow SPICE_LIBRARY_PIPELINE {
         )
         ch_versions = ch_versions.mix(COMPLEXITY.out.versions)
 
+        // FAS scoring options that change the scores, part of the FAS cache key
+        fas_score_options = params
+            .findAll { key, value -> key.startsWith('fas_run_') && value }
+            .sort()
+            .collect { key, value -> "${key}=${value}" }
+            .join(';')
+        fas_cache = params.fas_cache ? file(params.fas_cache).toString() : ''
+        fas_cost_model_json = params.fas_cost_model_json ? file(params.fas_cost_model_json).toString() : ''
+
         protein_pairs = SEED_PARALLELIZATION(
             create_library.genes_txt_ch,
             complexity_ch.complexity,
             domain_importance_library.domain_importance_library_ch,
             params.fas_partitions,
-            params.exclude_genes
+            params.exclude_genes,
+            fas_cache,
+            fas_score_options,
+            fas_cost_model_json
         )
         ch_versions = ch_versions.mix(SEED_PARALLELIZATION.out.versions)
 
@@ -185,7 +201,10 @@ workflow SPICE_LIBRARY_PIPELINE {
 
 
 
-        fas_scores_ch = fas_scores.fas_scored_directories.collect()
+        // Results reused from the FAS cache are merged like the outputs of a partition
+        fas_scores_ch = fas_scores.fas_scored_directories
+            .mix(protein_pairs.cached_fas.flatten())
+            .collect()
 
         merged_fas_scores = CONCAT_PROTEIN_PAIRS (
             create_library.genes_txt_ch,
@@ -195,9 +214,11 @@ workflow SPICE_LIBRARY_PIPELINE {
 
 
         concatenated_fas_scores_library = CONCAT_GENES (
-            merged_fas_scores.genes_directorys,
+            merged_fas_scores.merged_fas_dir,
             domain_importance_library.domain_importance_library_ch,
-            outdir
+            outdir,
+            fas_cache,
+            fas_score_options
         )
 
         ch_versions = ch_versions.mix(CONCAT_GENES.out.versions)